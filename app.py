@@ -1,23 +1,44 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context, g, make_response
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
+from werkzeug.utils import secure_filename
 from flask_migrate import Migrate
+import hashlib
+import json
 import os
-import openrouteservice
-from geopy.distance import geodesic
-import requests
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+import click
 from dotenv import load_dotenv
+from checkpoints import distancias_tramos, generar_checkpoints
+from cache import CacheClima, CacheGeocodificacion, CacheLRU, CacheRender, CacheRutas, celdas_cercanas, geohash, normalizar_consulta
+from proveedores import ClienteORS, SesionProveedor
+from pois import AlmacenPOIs
+import polilinea
+from trabajos import ColaTrabajos
+from enrutamiento import BackendORS, GrafoLocal
+from enriquecimiento import enriquecer_checkpoints
+import exportacion
+import importacion
+from similitud import elegir_similar
+from metricas import cabecera_server_timing, registro
+from config import obtener_configuracion
 
 # Cargar variables de entorno desde el archivo .env
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = "clave_secreta"
+app = Flask(__name__, template_folder="Templates")  # La carpeta del repo va con mayúscula
+app.config.from_object(obtener_configuracion())
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(BASE_DIR, "database.db")}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
@@ -28,11 +49,161 @@ bcrypt = Bcrypt(app)
 # Reemplazar las claves de OpenWeatherMap y OpenRouteService con variables de entorno
 ORS_API_KEY = os.getenv("ORS_API_KEY")  # Asegúrate de definir esta variable en tu archivo .env
 OWM_API_KEY = os.getenv("OWM_API_KEY")  # Asegúrate de definir esta variable en tu archivo .env
-client = openrouteservice.Client(key=ORS_API_KEY)
+
+# URLs base de los proveedores (se pueden apuntar a servidores simulados, ver benchmarks/)
+ORS_BASE_URL = os.getenv("ORS_BASE_URL", "https://api.openrouteservice.org")
+OWM_BASE_URL = os.getenv("OWM_BASE_URL", "http://api.openweathermap.org")
+NOMINATIM_BASE_URL = os.getenv("NOMINATIM_BASE_URL", "https://nominatim.openstreetmap.org")
+
+# Sesiones HTTP compartidas por proveedor (keep-alive, límite de tasa, reintentos y circuit breaker)
+sesiones = {
+    "openrouteservice": SesionProveedor(
+        "openrouteservice",
+        tasa=float(os.getenv("ORS_RATE", 40 / 60)),  # Límite del plan gratuito de ORS: 40 solicitudes/min
+        capacidad=int(os.getenv("ORS_BURST", 5))
+    ),
+    "openweathermap": SesionProveedor(
+        "openweathermap",
+        tasa=float(os.getenv("OWM_RATE", 1)),
+        capacidad=int(os.getenv("OWM_BURST", 5))
+    ),
+    "nominatim": SesionProveedor(
+        "nominatim",
+        tasa=float(os.getenv("NOMINATIM_RATE", 1)),  # Política de uso de Nominatim: 1 solicitud/s
+        capacidad=1,
+        headers={"User-Agent": "GPStest/1.0"}
+    ),
+}
+
+# El cliente de ORS usa la sesión compartida, que ya reintenta y limita la tasa
+client = ClienteORS(sesiones["openrouteservice"], key=ORS_API_KEY, base_url=ORS_BASE_URL)
+
+# Caché de geocodificación (memoria + SQLite compartido entre procesos)
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(BASE_DIR, "cache.db"))
+geocodificador = CacheGeocodificacion(
+    client,
+    CACHE_DB_PATH,
+    ttl=int(os.getenv("GEOCODING_CACHE_TTL", 7 * 24 * 3600))
+)
+
+# Backend de enrutamiento: OpenRouteService (remoto) o un grafo vial local (.osm o CSV de aristas)
+ROUTING_BACKEND = os.getenv("ROUTING_BACKEND", "ors")
+if ROUTING_BACKEND == "local":
+    backend_rutas = GrafoLocal.desde_archivo(os.getenv("ROUTING_GRAPH_PATH", os.path.join(BASE_DIR, "grafo.csv")))
+else:
+    backend_rutas = BackendORS(client)
+
+# Caché de direcciones indexada por coordenadas redondeadas, perfil y backend
+cache_rutas = CacheRutas(
+    backend_rutas,
+    CACHE_DB_PATH,
+    precision=int(os.getenv("ROUTE_CACHE_PRECISION", 4)),
+    ttl=int(os.getenv("ROUTE_CACHE_TTL", 30 * 24 * 3600)),
+    max_entradas=int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", 5000))
+)
+
+# Consultas concurrentes a proveedores externos (clima y POIs)
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", 5))  # Tiempo máximo por llamada (segundos)
+PROVIDER_DEADLINE = float(os.getenv("PROVIDER_DEADLINE", 8))  # Tiempo máximo para todas las llamadas de una vista
+proveedores_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PROVIDER_POOL_SIZE", 8)),
+    thread_name_prefix="proveedores"
+)
+
+# Paginación y geometría resumida en el listado de rutas
+RUTAS_POR_PAGINA = int(os.getenv("RUTAS_POR_PAGINA", 20))
+
+# SQLite no aplica claves foráneas (ni ON DELETE CASCADE) si no se activan en cada conexión.
+# WAL permite lecturas concurrentes mientras un worker escribe; con WAL, synchronous=NORMAL
+# sigue siendo seguro ante caídas del proceso y evita un fsync por cada commit.
+@event.listens_for(Engine, "connect")
+def configurar_sqlite(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+# Filas que trae cada lote del cursor al exportar (las rutas llevan su geometría completa)
+EXPORT_ROUTE_BATCH_SIZE = int(os.getenv("EXPORT_ROUTE_BATCH_SIZE", 50))
+EXPORT_CHECKPOINT_BATCH_SIZE = int(os.getenv("EXPORT_CHECKPOINT_BATCH_SIZE", 1000))
+
+# Importación de GPX/GeoJSON: rutas por transacción y procesos que preparan los archivos
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 200))
+IMPORT_PROCESSES = int(os.getenv("IMPORT_PROCESSES", os.cpu_count() or 1))
+IMPORT_UPLOAD_PROCESSES = int(os.getenv("IMPORT_UPLOAD_PROCESSES", 1))  # Desde la web, dentro de un hilo de la cola
+
+# Decimales de la polilínea codificada que guarda la geometría de cada ruta (5 ≈ 1 m)
+GEOMETRY_PRECISION = int(os.getenv("GEOMETRY_PRECISION", 5))
+
+# Reutilización de rutas guardadas con extremos a menos de ROUTE_REUSE_TOLERANCE_M metros.
+# Solo se reutilizan rutas de las últimas ROUTE_REUSE_MAX_AGE_HOURS horas (0 desactiva la
+# reutilización); cambiar ROUTE_REUSE_CELL_PRECISION exige `flask indexar-extremos`.
+ROUTE_REUSE_TOLERANCE_M = float(os.getenv("ROUTE_REUSE_TOLERANCE_M", 300))
+ROUTE_REUSE_MAX_AGE_HOURS = float(os.getenv("ROUTE_REUSE_MAX_AGE_HOURS", 7 * 24))
+ROUTE_REUSE_CELL_PRECISION = int(os.getenv("ROUTE_REUSE_CELL_PRECISION", 6))  # Celdas de ~1,2 x 0,6 km
+ROUTE_REUSE_CANDIDATES = int(os.getenv("ROUTE_REUSE_CANDIDATES", 20))
+
+# Geometrías decodificadas y simplificadas por zoom que se reutilizan entre vistas del mapa
+geometrias_cache = CacheLRU(max_entradas=int(os.getenv("GEOMETRY_CACHE_SIZE", 256)), ttl=3600)
+
+# Fragmentos renderizados de las rutas guardadas (detalle, geometría y checkpoints no cambian).
+# Con RENDER_CACHE_DISK=1 se comparten entre workers en la base de la caché.
+cache_render = CacheRender(
+    CACHE_DB_PATH if os.getenv("RENDER_CACHE_DISK", "1") == "1" else None,
+    ttl=int(os.getenv("RENDER_CACHE_TTL", 7 * 24 * 3600)),
+    ttl_memoria=int(os.getenv("RENDER_CACHE_MEMORY_TTL", 60)),
+    max_entradas=int(os.getenv("RENDER_CACHE_SIZE", 512))
+)
+
+def _version_plantillas(*nombres):
+    """Huella de las plantillas: al cambiarlas cambian las claves de la caché de render y los ETags."""
+    huella = hashlib.sha1()
+    for nombre in nombres:
+        with open(os.path.join(app.root_path, app.template_folder, nombre), "rb") as archivo:
+            huella.update(archivo.read())
+    return huella.hexdigest()[:8]
+
+VERSION_RENDER = _version_plantillas("base.html", "ver_ruta.html", "_detalle_ruta.html", "mis_rutas.html")
+
+def clave_render(tipo, route_id):
+    return f"{tipo}:{VERSION_RENDER}:{route_id}"
+
+def invalidar_caches_ruta(*route_ids):
+    """Descarta las geometrías y los fragmentos renderizados de rutas eliminadas.
+
+    La caché de render valida cada acierto en memoria contra la tabla compartida, así que
+    la invalidación llega también a los demás workers.
+    """
+    ids = set(route_ids)
+    if not ids:
+        return
+    geometrias_cache.eliminar_donde(lambda clave: clave[0] in ids)
+    cache_render.invalidar(*(clave_render(tipo, route_id) for route_id in ids for tipo in ("ver_ruta",)))
+
+# Cola de trabajos para el cálculo asíncrono de rutas (estado compartido en SQLite)
+cola_trabajos = ColaTrabajos(
+    CACHE_DB_PATH,
+    max_workers=int(os.getenv("ROUTE_JOB_WORKERS", 2)),
+    envoltorio=app.app_context
+)
+
+# Planificación de rutas en lote
+LOTE_MAX_RUTAS = int(os.getenv("LOTE_MAX_RUTAS", 100))
+LOTE_CONCURRENCIA = int(os.getenv("LOTE_CONCURRENCIA", 4))  # Llamadas simultáneas a geocodificación/direcciones
+
+# Instrumentación: cabecera Server-Timing opcional y token opcional para /metrics
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
 # Inicializar Flask-Migrate
 migrate = Migrate(app, db)
 
+def ahora_utc():
+    """Fecha y hora actual en UTC sin zona horaria, como se guarda en la base."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 # Modelo de usuario
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -42,34 +213,170 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True)  # Estado de la cuenta (activa o bloqueada)
 
 class Route(db.Model):
+    __table_args__ = (
+        db.Index('ix_route_user_id_fecha_creacion', 'user_id', 'fecha_creacion'),  # Listado de mis_rutas
+        db.Index('ix_route_celdas_extremos', 'celda_origen', 'celda_destino', 'fecha_creacion'),  # Rutas similares
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Relación con el usuario
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)  # Relación con el usuario
     origen = db.Column(db.String(150), nullable=False)
     destino = db.Column(db.String(150), nullable=False)
     distancia_total = db.Column(db.Float, nullable=False)  # Distancia total en km
-    fecha_creacion = db.Column(db.DateTime, default=db.func.current_timestamp())  # Fecha de creación
-    checkpoints = db.relationship('Checkpoint', backref='route', lazy=True)  # Relación con los checkpoints
+    # Fecha de creación en UTC, escrita desde Python para que siempre tenga el mismo formato de
+    # texto que los valores enlazados (CURRENT_TIMESTAMP omite los microsegundos y rompía el cursor)
+    fecha_creacion = db.Column(db.DateTime, default=ahora_utc)
+    geometria = db.deferred(db.Column(db.Text, nullable=True))  # Geometría completa como polilínea codificada
+    precision_geometria = db.Column(db.Integer, nullable=True)  # Decimales usados al codificar la geometría
+    # Extremos geocodificados y sus celdas geohash, para encontrar rutas guardadas parecidas
+    origen_lat = db.Column(db.Float, nullable=True)
+    origen_lon = db.Column(db.Float, nullable=True)
+    destino_lat = db.Column(db.Float, nullable=True)
+    destino_lon = db.Column(db.Float, nullable=True)
+    celda_origen = db.Column(db.String(12), nullable=True)
+    celda_destino = db.Column(db.String(12), nullable=True)
+    # La geometría se copió de otra ruta guardada: no se indexa para reutilizar, porque sus
+    # extremos no coinciden con los pedidos y su fecha no es la de la geometría
+    geometria_reutilizada = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    checkpoints = db.relationship(
+        'Checkpoint', backref='route', lazy=True, order_by='Checkpoint.kilometro',
+        cascade='all, delete-orphan', passive_deletes=True  # La base de datos borra los checkpoints en cascada
+    )  # Relación con los checkpoints
+
+    def obtener_coordenadas(self):
+        """Decodifica la geometría guardada como lista de [lon, lat]; vacía si la ruta no la tiene."""
+        if not self.geometria:
+            return []
+        return polilinea.decodificar(self.geometria, self.precision_geometria or 5)
 
 
 class Checkpoint(db.Model):
+    __table_args__ = (
+        db.Index('ix_checkpoint_route_id_kilometro', 'route_id', 'kilometro'),  # Checkpoints de una ruta en orden
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    route_id = db.Column(db.Integer, db.ForeignKey('route.id'), nullable=False)  # Relación con la ruta
+    route_id = db.Column(db.Integer, db.ForeignKey('route.id', ondelete='CASCADE'), nullable=False)  # Relación con la ruta
     lat = db.Column(db.Float, nullable=False)  # Latitud
     lon = db.Column(db.Float, nullable=False)  # Longitud
     kilometro = db.Column(db.Float, nullable=False)  # Distancia acumulada en km
     tiempo_estimado = db.Column(db.Float, nullable=False)  # Tiempo estimado en horas
 
+@app.before_request
+def iniciar_medicion():
+    g.inicio_solicitud = time.perf_counter()
+
+@app.after_request
+def registrar_medicion(response):
+    """Registra la duración de cada solicitud y agrega la cabecera Server-Timing si está activa."""
+    inicio = g.pop("inicio_solicitud", None)
+    if inicio is None:
+        return response
+    duracion = time.perf_counter() - inicio
+    endpoint = request.endpoint or "desconocido"
+    registro.observar("http_solicitud_duracion_segundos", duracion, endpoint=endpoint)
+    registro.contar("http_solicitudes_total", endpoint=endpoint, estado=response.status_code)
+    if SERVER_TIMING:
+        tiempos = g.get("server_timing", []) + [("total", duracion)]
+        response.headers["Server-Timing"] = cabecera_server_timing(tiempos)
+    return response
+
 # Cargar usuario
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
+def agregar_ruta(user_id, origen, destino, distancia_total, route_points, coordinates=None, extremos=None,
+                 reutilizada=False):
+    """Agrega una ruta y sus checkpoints a la transacción en curso, sin confirmarla.
+
+    `extremos` son los puntos [lon, lat] de origen y destino que indexan la ruta para
+    reutilizarla; si no se indican se toman los extremos de `coordinates`. Con `reutilizada`
+    (la geometría se copió de otra ruta) no se indexa, para que las reutilizaciones no se
+    encadenen alejándose de la geometría original.
+    Los checkpoints se insertan con un solo INSERT en lote (executemany).
+    """
+    route = Route(
+        user_id=user_id, origen=origen, destino=destino, distancia_total=distancia_total,
+        geometria_reutilizada=reutilizada
+    )
+    if coordinates:
+        route.geometria = polilinea.codificar(coordinates, GEOMETRY_PRECISION)
+        route.precision_geometria = GEOMETRY_PRECISION
+        if not reutilizada:
+            indexar_extremos(route, *(extremos or (coordinates[0], coordinates[-1])))
+    db.session.add(route)
+    db.session.flush()  # Obtener el id de la ruta sin confirmar la transacción
+    if route_points:
+        db.session.execute(
+            db.insert(Checkpoint),
+            [dict(punto, route_id=route.id) for punto in route_points]
+        )
+    return route
+
+def indexar_extremos(route, origen, destino):
+    """Guarda en la ruta sus extremos [lon, lat] y las celdas que usa `buscar_ruta_similar`."""
+    route.origen_lon, route.origen_lat = origen[0], origen[1]
+    route.destino_lon, route.destino_lat = destino[0], destino[1]
+    route.celda_origen = geohash(origen[1], origen[0], ROUTE_REUSE_CELL_PRECISION)
+    route.celda_destino = geohash(destino[1], destino[0], ROUTE_REUSE_CELL_PRECISION)
+
+def consulta_similares(celdas_origen, celdas_destino, desde):
+    """Rutas con geometría creadas desde `desde` cuyos extremos caen en las celdas dadas."""
+    return (
+        Route.query
+        .with_entities(
+            Route.id, Route.geometria, Route.precision_geometria,
+            Route.origen_lat, Route.origen_lon, Route.destino_lat, Route.destino_lon
+        )
+        .filter(
+            Route.celda_origen.in_(celdas_origen),
+            Route.celda_destino.in_(celdas_destino),
+            Route.fecha_creacion >= desde,
+            Route.geometria.isnot(None)
+        )
+        .order_by(Route.fecha_creacion.desc())
+        .limit(ROUTE_REUSE_CANDIDATES)
+    )
+
+def buscar_ruta_similar(origen_coords, destino_coords):
+    """Ruta guardada y vigente con ambos extremos a menos de ROUTE_REUSE_TOLERANCE_M, o None."""
+    if ROUTE_REUSE_MAX_AGE_HOURS <= 0:
+        return None
+    tolerancia_km = ROUTE_REUSE_TOLERANCE_M / 1000
+    desde = ahora_utc() - timedelta(hours=ROUTE_REUSE_MAX_AGE_HOURS)
+    candidatas = consulta_similares(
+        celdas_cercanas(origen_coords[1], origen_coords[0], tolerancia_km, ROUTE_REUSE_CELL_PRECISION),
+        celdas_cercanas(destino_coords[1], destino_coords[0], tolerancia_km, ROUTE_REUSE_CELL_PRECISION),
+        desde
+    ).all()
+    return elegir_similar(candidatas, origen_coords, destino_coords, tolerancia_km)
+
+def guardar_ruta(user_id, origen, destino, distancia_total, route_points, coordinates=None, extremos=None,
+                 reutilizada=False):
+    """Guarda una ruta, su geometría y todos sus checkpoints en una única transacción.
+
+    Si algo falla se revierte todo y no queda una ruta a medio guardar.
+    """
+    try:
+        route = agregar_ruta(
+            user_id, origen, destino, distancia_total, route_points, coordinates, extremos, reutilizada
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return route
+
+def _sin_clave_owm(texto):
+    """Oculta la clave de OpenWeatherMap en un mensaje (los errores de requests incluyen la URL)."""
+    return str(texto).replace(OWM_API_KEY, "***") if OWM_API_KEY else str(texto)
+
 def obtener_clima(lat, lon):
     """Obtiene el clima actual para las coordenadas dadas."""
-    url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OWM_API_KEY}&units=metric&lang=es"
+    url = f"{OWM_BASE_URL}/data/2.5/weather?lat={lat}&lon={lon}&appid={OWM_API_KEY}&units=metric&lang=es"
     try:
-        response = requests.get(url)
-        print(f"URL de la solicitud: {url}")  # Agregar para depuración
+        response = sesiones["openweathermap"].get(url, timeout=PROVIDER_TIMEOUT)
         if response.status_code == 200:
             data = response.json()
             return {
@@ -84,57 +391,134 @@ def obtener_clima(lat, lon):
             print(f"Error en la API: {response.status_code}, {response.text}")
             return {"error": f"Error en la API: {response.status_code}"}
     except Exception as e:
-        print(f"Excepción al obtener el clima: {e}")
+        print(f"Excepción al obtener el clima: {_sin_clave_owm(e)}")
         return {"error": str(e)}
 
-def obtener_pois(lat, lon, categoria="restaurant", radio=1000):
-    """Obtiene puntos de interés cercanos a las coordenadas dadas usando OpenStreetMap Nominatim."""
-    url = f"https://nominatim.openstreetmap.org/search?format=json&q={categoria}&lat={lat}&lon={lon}&radius={radio}"
+# Caché del clima por celda geohash (~5 km con precisión 5) con TTL corto
+cache_clima = CacheClima(
+    obtener_clima,
+    CACHE_DB_PATH,
+    precision=int(os.getenv("WEATHER_CACHE_PRECISION", 5)),
+    ttl=int(os.getenv("WEATHER_CACHE_TTL", 600))
+)
+
+def obtener_pois_en_caja(categoria, caja):
+    """Descarga de Nominatim los POIs de una categoría dentro de la caja (sur, oeste, norte, este)."""
+    sur, oeste, norte, este = caja
+    url = (
+        f"{NOMINATIM_BASE_URL}/search?format=json&q={categoria}"
+        f"&viewbox={oeste},{norte},{este},{sur}&bounded=1&limit=50"
+    )
+    response = sesiones["nominatim"].get(url, timeout=PROVIDER_TIMEOUT)
+    response.raise_for_status()
+    return [
+        {
+            "nombre": poi.get("display_name", "Sin nombre"),
+            "lat": float(poi["lat"]),
+            "lon": float(poi["lon"])
+        }
+        for poi in response.json()
+    ]
+
+# Las descargas de celdas de POIs esperan el límite de Nominatim (~1 solicitud/s), así que
+# tienen su propio pool pequeño y no ocupan los hilos que consultan el clima de otras vistas
+pois_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("POI_REFRESH_WORKERS", 2)),
+    thread_name_prefix="pois"
+)
+POI_MAX_DESCARGAS = int(os.getenv("POI_MAX_TILE_DOWNLOADS", 6))  # Descargas nuevas por solicitud
+
+# Almacén local de POIs con índice R-tree, poblado por celdas geohash (~156 km con precisión 3)
+almacen_pois = AlmacenPOIs(
+    CACHE_DB_PATH,
+    obtener_pois_en_caja,
+    pois_executor,
+    precision=int(os.getenv("POI_TILE_PRECISION", 3)),
+    ttl=int(os.getenv("POI_TILE_TTL", 7 * 24 * 3600)),
+    max_en_curso=int(os.getenv("POI_REFRESH_QUEUE", 24))
+)
+POI_RADIUS_KM = float(os.getenv("POI_RADIUS_KM", 50))
+POI_LIMIT = int(os.getenv("POI_LIMIT", 10))
+CATEGORIAS_DESTINO = ["turismo", "comida", "panoramas"]
+
+def obtener_datos_destino(lat, lon, categorias, deadline=PROVIDER_DEADLINE):
+    """Obtiene el clima y los POIs más cercanos por categoría para un punto.
+
+    El clima se consulta en paralelo mientras los POIs se leen del índice local; la
+    latencia total queda acotada por `deadline` y lo que no haya respondido a tiempo
+    se reemplaza por un valor vacío para que la vista pueda renderizarse igual.
+    """
+    inicio = time.monotonic()
+    futuro_clima = proveedores_executor.submit(cache_clima.obtener, lat, lon)
+    try:
+        with registro.medir("pois"):
+            pois = almacen_pois.cercanos_por_categorias(
+                lat, lon, categorias, radio_km=POI_RADIUS_KM, k=POI_LIMIT, espera=deadline,
+                max_descargas=POI_MAX_DESCARGAS
+            )
+    except Exception as e:
+        registro.contar("errores_total", etapa="pois")
+        print(f"Excepción al consultar POIs locales: {e}")
+        pois = {categoria: [] for categoria in categorias}
+    with registro.medir("clima"):
+        wait([futuro_clima], timeout=max(0, deadline - (time.monotonic() - inicio)))
+
+    clima = _resultado_o(futuro_clima, {"error": "El servicio de clima no respondió a tiempo."})
+    return clima, pois
+
+def _resultado_o(futuro, defecto):
+    """Devuelve el resultado de un futuro terminado o `defecto` si aún no termina o falló."""
+    if not futuro.done():
+        futuro.cancel()
+        registro.contar("errores_total", etapa="plazo_proveedor")
+        print("Proveedor externo sin respuesta dentro del plazo.")
+        return defecto
+    try:
+        return futuro.result()
+    except Exception as e:
+        registro.contar("errores_total", etapa="proveedor")
+        print(f"Excepción en proveedor externo: {e}")
+        return defecto
+
+def obtener_pronostico(lat, lon):
+    """Obtiene el pronóstico cada 3 horas de los próximos 5 días para las coordenadas dadas."""
+    url = f"{OWM_BASE_URL}/data/2.5/forecast?lat={lat}&lon={lon}&appid={OWM_API_KEY}&units=metric&lang=es"
     try:
-        response = requests.get(url, headers={"User-Agent": "GPStest/1.0"})
+        response = sesiones["openweathermap"].get(url, timeout=PROVIDER_TIMEOUT)
         if response.status_code == 200:
-            data = response.json()
-            pois = []
-            for poi in data:
-                pois.append({
-                    "nombre": poi.get("display_name", "Sin nombre"),
-                    "lat": float(poi["lat"]),
-                    "lon": float(poi["lon"])
-                })
-            return pois
-        else:
-            print(f"Error al obtener POIs: {response.status_code}, {response.text}")
-            return []
+            return {
+                "pronostico": [
+                    {
+                        "dt": entrada["dt"],
+                        "temperatura": entrada["main"]["temp"],
+                        "descripcion": entrada["weather"][0]["description"],
+                        "icono": entrada["weather"][0]["icon"]
+                    }
+                    for entrada in response.json()["list"]
+                ]
+            }
+        print(f"Error en la API de pronóstico: {response.status_code}, {response.text}")
+        return {"error": f"Error en la API: {response.status_code}"}
     except Exception as e:
-        print(f"Excepción al obtener POIs: {e}")
-        return []
-
-def obtener_pois_por_categorias(lat, lon, categorias, radio=100000):
-    """Obtiene puntos de interés cercanos a las coordenadas dadas, agrupados por categorías."""
-    pois_por_categoria = {}
-    for categoria in categorias:
-        url = f"https://nominatim.openstreetmap.org/search?format=json&q={categoria}&lat={lat}&lon={lon}&radius={radio}"
-        try:
-            print(f"Consultando POIs para categoría '{categoria}' con URL: {url}")  # Depuración
-            response = requests.get(url, headers={"User-Agent": "GPStest/1.0"})
-            if response.status_code == 200:
-                data = response.json()
-                print(f"Respuesta de la API para '{categoria}': {data}")  # Depuración
-                pois = []
-                for poi in data:
-                    pois.append({
-                        "nombre": poi.get("display_name", "Sin nombre"),
-                        "lat": float(poi["lat"]),
-                        "lon": float(poi["lon"])
-                    })
-                pois_por_categoria[categoria] = pois
-            else:
-                print(f"Error al obtener POIs para {categoria}: {response.status_code}, {response.text}")
-                pois_por_categoria[categoria] = []
-        except Exception as e:
-            print(f"Excepción al obtener POIs para {categoria}: {e}")
-            pois_por_categoria[categoria] = []
-    return pois_por_categoria
+        print(f"Excepción al obtener el pronóstico: {_sin_clave_owm(e)}")
+        return {"error": str(e)}
+
+# Clima y POIs a lo largo de la ruta: una consulta por celda geohash (~39 x 20 km con precisión 4)
+RUTA_CELDA_PRECISION = int(os.getenv("ROUTE_ENRICHMENT_PRECISION", 4))
+POI_RUTA_RADIUS_KM = float(os.getenv("POI_ROUTE_RADIUS_KM", 10))
+POI_RUTA_LIMIT = int(os.getenv("POI_ROUTE_LIMIT", 3))
+cache_pronostico = CacheClima(
+    obtener_pronostico,
+    CACHE_DB_PATH,
+    precision=RUTA_CELDA_PRECISION,
+    ttl=int(os.getenv("FORECAST_CACHE_TTL", 3600)),
+    tabla="pronostico"
+)
+# Pool propio para no ocupar el de las vistas; su tamaño acota las consultas simultáneas al proveedor
+enriquecimiento_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ROUTE_ENRICHMENT_CONCURRENCY", 4)),
+    thread_name_prefix="enriquecimiento"
+)
 
 @app.route("/")
 @login_required
@@ -204,8 +588,10 @@ def delete_user(user_id):
         return redirect(url_for("admin_users"))
 
     user = User.query.get_or_404(user_id)
+    route_ids = [route_id for (route_id,) in db.session.query(Route.id).filter_by(user_id=user.id)]
     db.session.delete(user)
     db.session.commit()
+    invalidar_caches_ruta(*route_ids)
     flash("Usuario eliminado exitosamente.")
     return redirect(url_for("admin_users"))
 
@@ -249,6 +635,55 @@ def toggle_user(user_id):
     flash(f"El estado de la cuenta de {user.username} ha sido cambiado.")
     return redirect(url_for("admin_users"))
 
+@app.route("/admin/cache")
+@login_required
+def admin_cache():
+    """Devuelve las estadísticas de las cachés de proveedores externos."""
+    if not current_user.is_admin:
+        return jsonify({"error": "No autorizado"}), 403
+
+    return jsonify({
+        "geocodificacion": geocodificador.estadisticas(),
+        "rutas": cache_rutas.estadisticas(),
+        "clima": cache_clima.estadisticas(),
+        "pronostico": cache_pronostico.estadisticas(),
+        "render": cache_render.estadisticas(),
+        "proveedores": {nombre: sesion.estadisticas() for nombre, sesion in sesiones.items()}
+    })
+
+def _metricas_cache():
+    """Medidores de las cachés y los circuit breakers para /metrics."""
+    muestras = []
+    for nombre, cache in (("geocodificacion", geocodificador), ("rutas", cache_rutas), ("clima", cache_clima),
+                          ("pronostico", cache_pronostico), ("render", cache_render)):
+        for clave, valor in cache.estadisticas().items():
+            muestras.append((f"cache_{clave}", {"cache": nombre}, valor))
+    for nombre, sesion in sesiones.items():
+        muestras.append(("proveedor_circuito_abierto", {"proveedor": nombre}, int(sesion.breaker.estado == "abierto")))
+    return muestras
+
+registro.agregar_colector(_metricas_cache)
+
+@app.route("/metrics")
+def metrics():
+    """Métricas del proceso en formato Prometheus."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response("No autorizado\n", status=401, mimetype="text/plain")
+    return Response(registro.exportar(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/admin/cache/rutas/invalidar", methods=["POST"])
+@login_required
+def invalidar_cache_rutas():
+    """Descarta las rutas en caché, todas o solo las anteriores a `max_edad_horas`."""
+    if not current_user.is_admin:
+        return jsonify({"error": "No autorizado"}), 403
+
+    max_edad_horas = request.form.get("max_edad_horas", type=float)
+    if max_edad_horas is None:
+        cache_rutas.limpiar()
+        return jsonify({"invalidadas": "todas"})
+    return jsonify({"invalidadas": cache_rutas.invalidar_anteriores(max_edad_horas * 3600)})
+
 @app.route("/calcular_ruta", methods=["GET", "POST"])
 @login_required
 def calcular_ruta():
@@ -261,102 +696,311 @@ def calcular_ruta():
     destino = data.get("destino")
     intervalo_km = float(data.get("intervalo_km", 10))  # Distancia entre checkpoints (por defecto: 10 km)
     velocidad_promedio = float(data.get("velocidad_promedio", 60))  # Velocidad promedio en km/h
+    reutilizar = data.get("recalcular") != "1"  # Con recalcular=1 no se reutilizan rutas similares
+
+    # Modo asíncrono: encolar el cálculo y responder de inmediato con el id del trabajo
+    if data.get("async") == "1":
+        clave = "|".join([
+            str(current_user.id), normalizar_consulta(origen), normalizar_consulta(destino),
+            str(intervalo_km), str(velocidad_promedio), str(reutilizar)
+        ])
+        job_id, _ = cola_trabajos.encolar(
+            clave, current_user.id, _trabajo_calcular_ruta,
+            current_user.id, origen, destino, intervalo_km, velocidad_promedio, reutilizar
+        )
+        return jsonify({"job_id": job_id, "estado_url": url_for("estado_trabajo", job_id=job_id)}), 202
 
     try:
-        # Geocodificar las ubicaciones
-        origen_coords = client.pelias_search(origen)["features"][0]["geometry"]["coordinates"]
-        destino_coords = client.pelias_search(destino)["features"][0]["geometry"]["coordinates"]
-
-        # Calcular la ruta
-        route = client.directions(
-            coordinates=[origen_coords, destino_coords],
-            profile="driving-car",
-            format="geojson"
+        new_route, coordinates, route_points = calcular_y_guardar_ruta(
+            current_user.id, origen, destino, intervalo_km, velocidad_promedio, reutilizar=reutilizar
         )
 
-        # Extraer puntos de la ruta
-        coordinates = route["features"][0]["geometry"]["coordinates"]
-        distance_km = route["features"][0]["properties"]["segments"][0]["distance"] / 1000
+        # Renderizar la plantilla con el mapa y los puntos calculados (queda en caché para ver_ruta)
+        entrada = fragmento_ruta(new_route, coordinates, route_points)
+        return render_template("ver_ruta.html", fragmento=entrada["html"])
+    except Exception as e:
+        registro.contar("errores_total", etapa="calcular_ruta")
+        flash(f"Error al calcular la ruta: {str(e)}")
+        return redirect(url_for("calcular_ruta"))
+
+def calcular_y_guardar_ruta(user_id, origen, destino, intervalo_km, velocidad_promedio, reportar=None,
+                            reutilizar=True):
+    """Geocodifica, calcula la ruta, genera los checkpoints y lo guarda todo.
+
+    Si hay una ruta guardada reciente con extremos cercanos (ver `buscar_ruta_similar`) y
+    `reutilizar` es verdadero, se usa su geometría en lugar de pedir las direcciones.
+    Devuelve (ruta, coordenadas, checkpoints). `reportar(mensaje)` recibe el avance de cada etapa.
+    """
+    reportar = reportar or (lambda mensaje: None)
+
+    # Geocodificar las ubicaciones
+    reportar("Geocodificando origen y destino")
+    with registro.medir("geocodificacion"):
+        origen_coords = geocodificador.geocodificar(origen)
+        destino_coords = geocodificador.geocodificar(destino)
+
+    # Un acierto exacto en la caché de direcciones es lo más barato; si no lo hay, se busca
+    # una ruta guardada con extremos cercanos antes de pedir las direcciones al backend
+    route = cache_rutas.obtener(origen_coords, destino_coords, profile="driving-car")
+    reutilizada = False
+    if route is None and reutilizar:
+        with registro.medir("rutas_similares"):
+            similar = buscar_ruta_similar(origen_coords, destino_coords)
+        if similar is not None:
+            # Es una aproximación (extremos hasta la tolerancia de distancia), así que no se
+            # guarda en la caché de direcciones, que solo tiene resultados exactos
+            reportar("Reutilizando una ruta guardada similar")
+            registro.contar("rutas_reutilizadas_total")
+            coordinates = polilinea.decodificar(similar.geometria, similar.precision_geometria or 5)
+            route = {"coordinates": coordinates, "distancia": float(distancias_tramos(coordinates).sum()) * 1000}
+            reutilizada = True
 
-        # Crear la ruta en la base de datos
-        new_route = Route(
-            user_id=current_user.id,
-            origen=origen,
-            destino=destino,
-            distancia_total=distance_km
+    if route is None:
+        reportar("Calculando la ruta")
+        with registro.medir("direcciones"):
+            route = cache_rutas.direcciones(origen_coords, destino_coords, profile="driving-car")
+
+    # Extraer puntos de la ruta; los checkpoints se generan siempre para el intervalo pedido
+    coordinates = route["coordinates"]
+    distance_km = route["distancia"] / 1000
+
+    # Generar checkpoints y calcular ETA
+    reportar("Generando checkpoints")
+    with registro.medir("checkpoints"):
+        route_points = generar_checkpoints(coordinates, intervalo_km, velocidad_promedio)
+
+    # Guardar la ruta y sus checkpoints en una sola transacción
+    reportar("Guardando la ruta")
+    with registro.medir("guardado_db"):
+        new_route = guardar_ruta(
+            user_id, origen, destino, distance_km, route_points, coordinates, (origen_coords, destino_coords),
+            reutilizada
         )
-        db.session.add(new_route)
-        db.session.commit()
+    return new_route, coordinates, route_points
 
-        # Generar checkpoints y calcular ETA
-        route_points = []
-        acumulado_km = 0
-        tiempo_acumulado = 0  # Tiempo acumulado en horas
-        for i in range(len(coordinates) - 1):
-            start = coordinates[i]
-            end = coordinates[i + 1]
-            tramo_km = geodesic((start[1], start[0]), (end[1], end[0])).kilometers
-
-            if acumulado_km + tramo_km >= intervalo_km:
-                # Calcular el punto exacto donde se cumple el intervalo
-                exceso_km = (acumulado_km + tramo_km) - intervalo_km
-                factor = (tramo_km - exceso_km) / tramo_km
-                punto_intermedio = [
-                    start[0] + factor * (end[0] - start[0]),
-                    start[1] + factor * (end[1] - start[1])
-                ]
+def _trabajo_calcular_ruta(reportar, user_id, origen, destino, intervalo_km, velocidad_promedio, reutilizar=True):
+    """Versión de `calcular_y_guardar_ruta` para la cola de trabajos."""
+    new_route, _, route_points = calcular_y_guardar_ruta(
+        user_id, origen, destino, intervalo_km, velocidad_promedio, reportar, reutilizar
+    )
+    return {"route_id": new_route.id, "checkpoints": len(route_points)}
 
-                tiempo_acumulado += intervalo_km / velocidad_promedio  # Tiempo estimado en horas
-                checkpoint = Checkpoint(
-                    route_id=new_route.id,
-                    lat=punto_intermedio[1],
-                    lon=punto_intermedio[0],
-                    kilometro=round(acumulado_km + tramo_km, 1),
-                    tiempo_estimado=round(tiempo_acumulado, 2)
-                )
-                db.session.add(checkpoint)
-                route_points.append({
-                    "lat": punto_intermedio[1],
-                    "lon": punto_intermedio[0],
-                    "kilometro": round(acumulado_km + tramo_km, 1),
-                    "tiempo_estimado": round(tiempo_acumulado, 2)
-                })
-
-                # Reiniciar el acumulado y continuar desde el punto intermedio
-                acumulado_km = exceso_km
-                coordinates.insert(i + 1, punto_intermedio)
-            else:
-                acumulado_km += tramo_km
+@app.route("/api/rutas/lote", methods=["POST"])
+@login_required
+def calcular_rutas_lote():
+    """Calcula y guarda varias rutas a la vez y devuelve los resultados como NDJSON.
 
-        db.session.commit()
+    Cuerpo: {"rutas": [{"origen", "destino", "intervalo_km"?, "velocidad_promedio"?}, ...]}.
+    Cada línea de la respuesta corresponde a una ruta en el orden en que termina; la
+    última línea resume el lote. Todas las rutas se guardan en una sola transacción; cada
+    una va en su propio savepoint, así que una ruta que falla al guardarse solo marca su línea.
+    """
+    pares = (request.get_json(silent=True) or {}).get("rutas")
+    if not isinstance(pares, list) or not pares:
+        return jsonify({"error": "Se esperaba una lista 'rutas' con pares origen/destino."}), 400
+    if len(pares) > LOTE_MAX_RUTAS:
+        return jsonify({"error": f"El lote admite como máximo {LOTE_MAX_RUTAS} rutas."}), 400
 
-        # Renderizar la plantilla con el mapa y los puntos calculados
-        return render_template("ver_ruta.html", route=new_route, coordinates=coordinates, route_points=route_points)
-    except Exception as e:
-        flash(f"Error al calcular la ruta: {str(e)}")
-        return redirect(url_for("calcular_ruta"))
+    solicitudes = []
+    for indice, par in enumerate(pares):
+        try:
+            solicitudes.append({
+                "indice": indice,
+                "origen": str(par["origen"]),
+                "destino": str(par["destino"]),
+                "intervalo_km": float(par.get("intervalo_km", 10)),
+                "velocidad_promedio": float(par.get("velocidad_promedio", 60))
+            })
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": f"La ruta {indice} no es válida."}), 400
+
+    user_id = current_user.id
+    return Response(
+        stream_with_context(_procesar_lote(user_id, solicitudes)),
+        mimetype="application/x-ndjson"
+    )
+
+def iniciar_transaccion():
+    """Abre ya la transacción de la sesión, antes de usar savepoints.
+
+    pysqlite solo emite BEGIN antes del primer INSERT/UPDATE; un SAVEPOINT emitido antes
+    abriría la transacción él mismo y liberarlo la confirmaría.
+    """
+    conexion = db.session.connection()
+    if conexion.dialect.name == "sqlite" and not conexion.connection.dbapi_connection.in_transaction:
+        conexion.exec_driver_sql("BEGIN")
+
+def _procesar_lote(user_id, solicitudes):
+    """Generador con las líneas NDJSON de `calcular_rutas_lote`."""
+    with ThreadPoolExecutor(max_workers=LOTE_CONCURRENCIA, thread_name_prefix="lote") as executor:
+        # Geocodificar una sola vez cada lugar distinto del lote
+        lugares = {}
+        for solicitud in solicitudes:
+            for campo in ("origen", "destino"):
+                lugares.setdefault(normalizar_consulta(solicitud[campo]), solicitud[campo])
+        futuros_lugares = {clave: executor.submit(geocodificador.geocodificar, texto) for clave, texto in lugares.items()}
+
+        def direcciones(solicitud):
+            origen_coords = futuros_lugares[normalizar_consulta(solicitud["origen"])].result()
+            destino_coords = futuros_lugares[normalizar_consulta(solicitud["destino"])].result()
+            return cache_rutas.direcciones(origen_coords, destino_coords, profile="driving-car")
+
+        futuros = {executor.submit(direcciones, solicitud): solicitud for solicitud in solicitudes}
+        guardadas = errores = 0
+        try:
+            iniciar_transaccion()
+            for futuro in as_completed(futuros):
+                solicitud = futuros[futuro]
+                linea = {"indice": solicitud["indice"], "origen": solicitud["origen"], "destino": solicitud["destino"]}
+                try:
+                    route = futuro.result()
+                    route_points = generar_checkpoints(
+                        route["coordinates"], solicitud["intervalo_km"], solicitud["velocidad_promedio"]
+                    )
+                    with db.session.begin_nested():
+                        new_route = agregar_ruta(
+                            user_id, solicitud["origen"], solicitud["destino"],
+                            route["distancia"] / 1000, route_points, route["coordinates"]
+                        )
+                    guardadas += 1
+                    linea.update({
+                        "route_id": new_route.id,
+                        "distancia_total": new_route.distancia_total,
+                        "checkpoints": route_points
+                    })
+                except Exception as e:
+                    errores += 1
+                    linea["error"] = str(e)
+                yield json.dumps(linea) + "\n"
+
+            db.session.commit()
+            yield json.dumps({"resumen": {"guardadas": guardadas, "errores": errores, "confirmado": True}}) + "\n"
+        except Exception as e:
+            db.session.rollback()
+            for futuro in futuros:
+                futuro.cancel()
+            yield json.dumps({"resumen": {"guardadas": 0, "errores": len(solicitudes), "confirmado": False, "error": str(e)}}) + "\n"
+
+@app.route("/rutas/jobs/<job_id>")
+@login_required
+def estado_trabajo(job_id):
+    """Devuelve el estado de un trabajo encolado (cálculo de ruta o importación)."""
+    trabajo = cola_trabajos.obtener(job_id)
+    if trabajo is None or trabajo["usuario_id"] != current_user.id:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+
+    respuesta = {
+        "job_id": trabajo["id"],
+        "estado": trabajo["estado"],
+        "progreso": trabajo["progreso"],
+        "error": trabajo["error"]
+    }
+    if trabajo["estado"] == "completado" and "route_id" in trabajo["resultado"]:
+        respuesta["route_id"] = trabajo["resultado"]["route_id"]
+        respuesta["url"] = url_for("ver_ruta", route_id=trabajo["resultado"]["route_id"])
+    elif trabajo["estado"] == "completado":
+        respuesta["resultado"] = trabajo["resultado"]  # Resumen de una importación
+    return jsonify(respuesta)
+
+def clave_geometria(route, zoom):
+    # La fecha de creación distingue una ruta nueva que reutiliza el id de una eliminada,
+    # cuya geometría puede seguir en la caché de otro worker
+    return (route.id, route.fecha_creacion, zoom)
+
+def coordenadas_ruta(route):
+    """Coordenadas completas de una ruta guardada (geometría o, si no existe, sus checkpoints)."""
+    clave = clave_geometria(route, None)
+    coordinates = geometrias_cache.obtener(clave)
+    if coordinates is None:
+        coordinates = route.obtener_coordenadas() or [
+            [checkpoint.lon, checkpoint.lat] for checkpoint in route.checkpoints
+        ]
+        geometrias_cache.guardar(clave, coordinates)
+    return coordinates
+
+def simplificar_para_mapa(coordinates, zoom=None, route=None):
+    """Simplifica la geometría para el zoom dado (o el que encuadra la ruta completa).
+
+    Devuelve (coordenadas, zoom). Con `route` el resultado se guarda en caché.
+    """
+    if zoom is None:
+        zoom = polilinea.zoom_para_caja(coordinates)
+    clave = clave_geometria(route, zoom) if route is not None else None
+    simplificadas = geometrias_cache.obtener(clave) if clave else None
+    if simplificadas is None:
+        simplificadas = polilinea.simplificar(coordinates, polilinea.tolerancia_zoom(zoom))
+        if clave:
+            geometrias_cache.guardar(clave, simplificadas)
+    return simplificadas, zoom
+
+def _leer_cursor(valor):
+    """Interpreta el cursor de paginación `<fecha ISO>_<id>`; devuelve None si es inválido."""
+    if not valor:
+        return None
+    try:
+        fecha, route_id = valor.rsplit("_", 1)
+        return datetime.fromisoformat(fecha), int(route_id)
+    except ValueError:
+        return None
 
 @app.route("/mis_rutas")
 @login_required
 def mis_rutas():
-    """Muestra las rutas guardadas por el usuario."""
-    routes = Route.query.filter_by(user_id=current_user.id).all()
-
-    # Convertir las rutas a un formato JSON para el frontend
-    routes_data = []
-    for route in routes:
-        checkpoints = Checkpoint.query.filter_by(route_id=route.id).all()
-        coordinates = [[checkpoint.lon, checkpoint.lat] for checkpoint in checkpoints]
-        routes_data.append({
+    """Muestra las rutas guardadas por el usuario, paginadas por fecha de creación.
+
+    La paginación es por cursor (`antes=<fecha>_<id>`). La tabla solo muestra los datos
+    de cada ruta, así que no se cargan sus checkpoints.
+    """
+    query = (
+        Route.query
+        .filter_by(user_id=current_user.id)
+        .order_by(Route.fecha_creacion.desc(), Route.id.desc())
+    )
+
+    cursor = _leer_cursor(request.args.get("antes"))
+    if cursor:
+        fecha, route_id = cursor
+        query = query.filter(
+            db.or_(
+                Route.fecha_creacion < fecha,
+                db.and_(Route.fecha_creacion == fecha, Route.id < route_id)
+            )
+        )
+
+    routes = query.limit(RUTAS_POR_PAGINA + 1).all()
+    hay_mas = len(routes) > RUTAS_POR_PAGINA
+    routes = routes[:RUTAS_POR_PAGINA]
+
+    siguiente = None
+    if hay_mas:
+        ultima = routes[-1]
+        siguiente = f"{ultima.fecha_creacion.isoformat()}_{ultima.id}"
+
+    # Las filas de una ruta no cambian: la página solo cambia si cambia el conjunto de rutas
+    etag = hashlib.sha1("|".join(
+        [VERSION_RENDER, str(siguiente)]
+        + [f"{route.id}:{route.fecha_creacion.isoformat()}" for route in routes]
+    ).encode("utf-8")).hexdigest()[:20]
+    no_modificado = _no_modificado(etag)
+    if no_modificado:
+        return no_modificado
+
+    routes_data = [
+        {
             "id": route.id,
             "origen": route.origen,
             "destino": route.destino,
             "distancia_total": route.distancia_total,
             "fecha_creacion": route.fecha_creacion.strftime('%Y-%m-%d'),  # Aquí se convierte en cadena
-            "coordinates": coordinates
-        })
-
-    return render_template("mis_rutas.html", routes=routes_data)
+        }
+        for route in routes
+    ]
+    response = make_response(
+        render_template("mis_rutas.html", routes=routes_data, siguiente=siguiente)
+    )
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 @app.route("/eliminar_ruta/<int:route_id>", methods=["POST"])
 @login_required
@@ -367,66 +1011,457 @@ def eliminar_ruta(route_id):
         flash("No tienes permiso para eliminar esta ruta.")
         return redirect(url_for("mis_rutas"))
 
-    # Eliminar los checkpoints asociados
-    Checkpoint.query.filter_by(route_id=route.id).delete()
+    # Los checkpoints asociados se eliminan en cascada (ON DELETE CASCADE)
     db.session.delete(route)
     db.session.commit()
+    invalidar_caches_ruta(route_id)
     flash("Ruta eliminada exitosamente.")
     return redirect(url_for("mis_rutas"))
 
+def fragmento_ruta(route, coordinates=None, route_points=None):
+    """Renderiza la parte inmutable de ver_ruta y la guarda en la caché de render.
+
+    Devuelve {"usuario_id", "destino", "html", "etag"}, o None si la ruta no tiene coordenadas.
+    """
+    if coordinates is None:
+        coordinates = coordenadas_ruta(route)
+    if not coordinates:
+        return None
+    if route_points is None:
+        route_points = [
+            {
+                "lat": checkpoint.lat,
+                "lon": checkpoint.lon,
+                "kilometro": checkpoint.kilometro,
+                "tiempo_estimado": checkpoint.tiempo_estimado
+            }
+            for checkpoint in route.checkpoints
+        ]
+
+    # Enviar solo el nivel de detalle que se ve al encuadrar la ruta; el mapa pide más al acercarse
+    coordinates_mapa, _ = simplificar_para_mapa(coordinates, route=route)
+    html = render_template("_detalle_ruta.html", route=route, coordinates=coordinates_mapa, route_points=route_points)
+    entrada = {
+        "usuario_id": route.user_id,
+        "destino": list(coordinates[-1]),
+        "html": html,
+        "etag": hashlib.sha1(f"{VERSION_RENDER}:{html}".encode("utf-8")).hexdigest()[:20],
+    }
+    cache_render.guardar(clave_render("ver_ruta", route.id), entrada)
+    return entrada
+
+def _no_modificado(etag):
+    """Respuesta 304 si el navegador ya tiene la versión `etag`; None en otro caso."""
+    if not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
 @app.route("/ver_ruta/<int:route_id>")
 @login_required
 def ver_ruta(route_id):
-    """Muestra los detalles de una ruta específica con información del clima y POIs solo para el destino."""
-    route = Route.query.get_or_404(route_id)
-    if route.user_id != current_user.id:
-        flash("No tienes permiso para ver esta ruta.")
-        return redirect(url_for("mis_rutas"))
+    """Muestra los detalles de una ruta específica; el clima y los POIs del destino se piden aparte.
 
-    # Obtener los checkpoints de la ruta
-    checkpoints = Checkpoint.query.filter_by(route_id=route.id).all()
-    coordinates = [[checkpoint.lon, checkpoint.lat] for checkpoint in checkpoints] if checkpoints else []
+    La página sale de la caché de render y, si el navegador envía un ETag vigente
+    (`If-None-Match`), se responde 304 sin consultar la base de datos.
+    """
+    entrada = cache_render.obtener(clave_render("ver_ruta", route_id))
+    if entrada is None:
+        with registro.medir("consulta_db"):
+            route = Route.query.get_or_404(route_id)
+        if route.user_id != current_user.id:
+            flash("No tienes permiso para ver esta ruta.")
+            return redirect(url_for("mis_rutas"))
+        with registro.medir("render"):
+            entrada = fragmento_ruta(route)
 
-    # Validar que existan coordenadas
-    if not coordinates:
-        flash("No se encontraron coordenadas para esta ruta.")
+        # Validar que existan coordenadas
+        if entrada is None:
+            flash("No se encontraron coordenadas para esta ruta.")
+            return redirect(url_for("mis_rutas"))
+
+    if entrada["usuario_id"] != current_user.id:
+        flash("No tienes permiso para ver esta ruta.")
         return redirect(url_for("mis_rutas"))
 
-    # Obtener el clima en el destino
-    clima_destino = obtener_clima(coordinates[-1][1], coordinates[-1][0]) if coordinates else {}
+    no_modificado = _no_modificado(entrada["etag"])
+    if no_modificado:
+        return no_modificado
 
-    # Categorías de POIs
-    categorias = ["turismo", "comida", "panoramas"]
+    response = make_response(render_template("ver_ruta.html", fragmento=entrada["html"]))
+    response.set_etag(entrada["etag"])
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
-    # Obtener POIs agrupados por categorías solo para el destino
-    pois_destino = obtener_pois_por_categorias(coordinates[-1][1], coordinates[-1][0], categorias) if coordinates else {}
+@app.route("/api/rutas/<int:route_id>/destino")
+@login_required
+def datos_destino_ruta(route_id):
+    """Devuelve el clima y los POIs actuales del destino de una ruta (la parte variable de ver_ruta)."""
+    entrada = cache_render.obtener(clave_render("ver_ruta", route_id))
+    if entrada is None:
+        route = Route.query.get_or_404(route_id)
+        if route.user_id != current_user.id:
+            return jsonify({"error": "No tienes permiso para ver esta ruta."}), 403
+        entrada = fragmento_ruta(route)
+        if entrada is None:
+            return jsonify({"clima": {}, "pois": {}})
+    elif entrada["usuario_id"] != current_user.id:
+        return jsonify({"error": "No tienes permiso para ver esta ruta."}), 403
+
+    lon, lat = entrada["destino"]
+    clima_destino, pois_destino = obtener_datos_destino(lat, lon, CATEGORIAS_DESTINO)
 
     # Validar que los datos sean serializables y asignar valores predeterminados
-    clima_destino = clima_destino if isinstance(clima_destino, dict) else {}
-    pois_destino = pois_destino if isinstance(pois_destino, dict) else {}
-    coordinates = coordinates if isinstance(coordinates, list) else []
+    return jsonify({
+        "clima": clima_destino if isinstance(clima_destino, dict) else {},
+        "pois": pois_destino if isinstance(pois_destino, dict) else {},
+    })
+
+@app.route("/api/rutas/<int:route_id>/a_lo_largo")
+@login_required
+def clima_pois_a_lo_largo(route_id):
+    """Pronóstico a la hora estimada de paso y POIs cercanos para cada checkpoint de la ruta.
+
+    Parámetro opcional `salida` (ISO 8601) con la hora de partida; por defecto, ahora.
+    """
+    route = Route.query.get_or_404(route_id)
+    if route.user_id != current_user.id:
+        return jsonify({"error": "No tienes permiso para ver esta ruta."}), 403
 
-    # Generar puntos de la ruta para el mapa
-    route_points = [
+    salida = datetime.now(timezone.utc)
+    if request.args.get("salida"):
+        try:
+            salida = datetime.fromisoformat(request.args["salida"])
+        except ValueError:
+            return jsonify({"error": "salida debe tener formato ISO 8601."}), 400
+        if salida.tzinfo is None:
+            salida = salida.replace(tzinfo=timezone.utc)
+
+    checkpoints = [
         {
             "lat": checkpoint.lat,
             "lon": checkpoint.lon,
             "kilometro": checkpoint.kilometro,
             "tiempo_estimado": checkpoint.tiempo_estimado
         }
-        for checkpoint in checkpoints
+        for checkpoint in route.checkpoints
     ]
+    with registro.medir("a_lo_largo"):
+        enriquecidos = enriquecer_checkpoints(
+            checkpoints,
+            salida,
+            cache_pronostico.obtener,
+            lambda puntos: almacen_pois.cercanos_en_lote(
+                puntos, CATEGORIAS_DESTINO, radio_km=POI_RUTA_RADIUS_KM, k=POI_RUTA_LIMIT,
+                espera=PROVIDER_DEADLINE, max_descargas=POI_MAX_DESCARGAS
+            ),
+            enriquecimiento_executor,
+            precision=RUTA_CELDA_PRECISION,
+            plazo=PROVIDER_DEADLINE
+        )
+    return jsonify({
+        "salida": salida.isoformat(timespec="minutes"),
+        "celdas": len({checkpoint["celda"] for checkpoint in enriquecidos}),
+        "checkpoints": enriquecidos
+    })
+
+@app.route("/api/rutas/<int:route_id>/geometria")
+@login_required
+def geometria_ruta(route_id):
+    """Devuelve la geometría de una ruta simplificada para un zoom y, opcionalmente, recortada a una caja.
+
+    Parámetros: `zoom` (nivel de Leaflet) y `bbox=oeste,sur,este,norte`.
+    """
+    route = Route.query.get_or_404(route_id)
+    if route.user_id != current_user.id:
+        return jsonify({"error": "No tienes permiso para ver esta ruta."}), 403
+
+    coordinates = coordenadas_ruta(route)
+    zoom = request.args.get("zoom", type=int)
+    bbox = request.args.get("bbox")
+    if zoom is not None:
+        zoom = max(0, min(zoom, 18))
+
+    if not bbox:
+        simplificadas, zoom = simplificar_para_mapa(coordinates, zoom, route=route)
+        return jsonify({"zoom": zoom, "segmentos": [simplificadas]})
+
+    try:
+        caja = [float(valor) for valor in bbox.split(",")]
+        if len(caja) != 4:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "bbox debe tener el formato oeste,sur,este,norte."}), 400
+
+    if zoom is None:
+        zoom = polilinea.zoom_para_caja(coordinates)
+    tolerancia = polilinea.tolerancia_zoom(zoom)
+    segmentos = [polilinea.simplificar(tramo, tolerancia) for tramo in polilinea.recortar_caja(coordinates, caja)]
+    return jsonify({"zoom": zoom, "segmentos": segmentos})
+
+def _filtros_exportacion(args):
+    """Lee `desde` y `hasta` (YYYY-MM-DD, ambos inclusive); lanza ValueError si no son fechas válidas."""
+    desde = datetime.fromisoformat(args["desde"]) if args.get("desde") else None
+    hasta = datetime.fromisoformat(args["hasta"]) + timedelta(days=1) if args.get("hasta") else None
+    return desde, hasta
+
+def _filtrar_rutas(consulta, usuario_id, desde, hasta):
+    if usuario_id is not None:
+        consulta = consulta.where(Route.user_id == usuario_id)
+    if desde is not None:
+        consulta = consulta.where(Route.fecha_creacion >= desde)
+    if hasta is not None:
+        consulta = consulta.where(Route.fecha_creacion < hasta)
+    return consulta
+
+def _rutas_para_exportar(usuario_id, desde, hasta):
+    """Recorre las rutas con un cursor en lotes de EXPORT_ROUTE_BATCH_SIZE, sin cargar la tabla en memoria."""
+    consulta = _filtrar_rutas(
+        db.select(
+            Route.id, Route.user_id, Route.origen, Route.destino, Route.distancia_total,
+            Route.fecha_creacion, Route.geometria, Route.precision_geometria
+        ).order_by(Route.id),
+        usuario_id, desde, hasta
+    ).execution_options(yield_per=EXPORT_ROUTE_BATCH_SIZE)
+
+    for fila in db.session.execute(consulta):
+        if fila.geometria:
+            coordinates = polilinea.decodificar(fila.geometria, fila.precision_geometria or 5)
+        else:
+            # Rutas anteriores a la geometría guardada: solo tienen sus checkpoints
+            coordinates = [
+                [lon, lat] for lon, lat in db.session.execute(
+                    db.select(Checkpoint.lon, Checkpoint.lat)
+                    .where(Checkpoint.route_id == fila.id)
+                    .order_by(Checkpoint.kilometro)
+                )
+            ]
+        yield {
+            "id": fila.id,
+            "usuario_id": fila.user_id,
+            "origen": fila.origen,
+            "destino": fila.destino,
+            "distancia_total": fila.distancia_total,
+            "fecha_creacion": fila.fecha_creacion.isoformat(),
+            "coordinates": coordinates,
+        }
+
+def _checkpoints_para_exportar(usuario_id, desde, hasta):
+    """Filas de `exportacion.COLUMNAS_CSV`, una por checkpoint, leídas con un cursor en lotes."""
+    consulta = _filtrar_rutas(
+        db.select(
+            Route.id, Route.user_id, Route.origen, Route.destino, Route.distancia_total, Route.fecha_creacion,
+            Checkpoint.kilometro, Checkpoint.lat, Checkpoint.lon, Checkpoint.tiempo_estimado
+        )
+        .join(Checkpoint, Checkpoint.route_id == Route.id)
+        .order_by(Route.id, Checkpoint.kilometro),
+        usuario_id, desde, hasta
+    ).execution_options(yield_per=EXPORT_CHECKPOINT_BATCH_SIZE)
+
+    for fila in db.session.execute(consulta):
+        yield (*fila[:5], fila.fecha_creacion.isoformat(), *fila[6:])
+
+def _respuesta_exportacion(usuario_id):
+    """Respuesta en streaming con las rutas en el formato pedido (`formato=geojson|gpx|csv`)."""
+    formato = request.args.get("formato", "geojson")
+    if formato not in exportacion.FORMATOS:
+        return jsonify({"error": f"formato debe ser uno de: {', '.join(exportacion.FORMATOS)}."}), 400
+    try:
+        desde, hasta = _filtros_exportacion(request.args)
+    except ValueError:
+        return jsonify({"error": "desde y hasta deben tener el formato YYYY-MM-DD."}), 400
+
+    if formato == "csv":
+        trozos = exportacion.csv_checkpoints(_checkpoints_para_exportar(usuario_id, desde, hasta))
+    elif formato == "gpx":
+        trozos = exportacion.gpx(_rutas_para_exportar(usuario_id, desde, hasta))
+    else:
+        trozos = exportacion.geojson(_rutas_para_exportar(usuario_id, desde, hasta))
+    cuerpo = exportacion.agrupar(trozos)
+
+    mimetype, extension = exportacion.FORMATOS[formato]
+    headers = {"Content-Disposition": f"attachment; filename=rutas.{extension}"}
+    if "gzip" in request.headers.get("Accept-Encoding", "") and request.args.get("gzip") != "0":
+        cuerpo = exportacion.comprimir_gzip(cuerpo)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(stream_with_context(cuerpo), mimetype=mimetype, headers=headers)
 
-    return render_template(
-        "ver_ruta.html",
-        route=route,
-        coordinates=coordinates,
-        clima_destino=clima_destino,
-        pois_destino=pois_destino,
-        route_points=route_points
+@app.route("/api/rutas/exportar")
+@login_required
+def exportar_mis_rutas():
+    """Exporta las rutas del usuario. Parámetros: `formato`, `desde`, `hasta` y `gzip=0` para no comprimir."""
+    return _respuesta_exportacion(current_user.id)
+
+@app.route("/admin/rutas/exportar")
+@login_required
+def exportar_rutas_admin():
+    """Exporta las rutas de todos los usuarios (o de `usuario_id`) con los mismos parámetros."""
+    if not current_user.is_admin:
+        return jsonify({"error": "No autorizado"}), 403
+    return _respuesta_exportacion(request.args.get("usuario_id", type=int))
+
+def guardar_rutas_importadas(user_id, rutas):
+    """Guarda un lote de rutas preparadas por `importacion` en una sola transacción."""
+    try:
+        for ruta in rutas:
+            agregar_ruta(
+                user_id, ruta["origen"], ruta["destino"], ruta["distancia_total"],
+                ruta["checkpoints"], ruta["coordinates"]
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    db.session.expunge_all()  # Las rutas ya guardadas no se vuelven a usar en esta sesión
+
+def _trabajo_importar(reportar, user_id, directorio, nombres, intervalo_km, velocidad_promedio):
+    """Importa los archivos subidos a `directorio` y lo borra al terminar."""
+    try:
+        archivos = [os.path.join(directorio, nombre) for nombre in nombres]
+        resumen = importacion.importar_archivos(
+            archivos, lambda rutas: guardar_rutas_importadas(user_id, rutas),
+            intervalo_km, velocidad_promedio,
+            procesos=IMPORT_UPLOAD_PROCESSES, lote=IMPORT_BATCH_SIZE, reportar=reportar
+        )
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+    # Los errores se informan con el nombre del archivo subido, no con la ruta temporal
+    resumen["errores"] = {os.path.basename(ruta).split("_", 1)[1]: error for ruta, error in resumen["errores"].items()}
+    return resumen
+
+@app.route("/api/rutas/importar", methods=["POST"])
+@login_required
+def importar_rutas():
+    """Importa rutas desde archivos GPX o GeoJSON subidos en el campo `archivos`.
+
+    Los archivos se guardan en disco y se importan en la cola de trabajos; responde 202
+    con el id del trabajo, cuyo estado incluye el resumen al completarse.
+    """
+    subidos = [archivo for archivo in request.files.getlist("archivos") if archivo.filename]
+    if not subidos:
+        return jsonify({"error": "Se esperaba al menos un archivo en 'archivos'."}), 400
+    for archivo in subidos:
+        if os.path.splitext(archivo.filename)[1].lower() not in importacion.EXTENSIONES:
+            return jsonify({"error": f"{archivo.filename}: solo se admiten archivos .gpx, .geojson o .json."}), 400
+    try:
+        intervalo_km = float(request.form.get("intervalo_km", 10))
+        velocidad_promedio = float(request.form.get("velocidad_promedio", 60))
+    except ValueError:
+        return jsonify({"error": "intervalo_km y velocidad_promedio deben ser números."}), 400
+    if intervalo_km <= 0 or velocidad_promedio <= 0:
+        return jsonify({"error": "intervalo_km y velocidad_promedio deben ser mayores que cero."}), 400
+
+    directorio = tempfile.mkdtemp(prefix="importacion_")
+    nombres = []
+    for indice, archivo in enumerate(subidos):
+        # El prefijo evita que dos archivos con el mismo nombre se pisen
+        nombre = f"{indice}_{secure_filename(archivo.filename) or 'archivo'}"
+        archivo.save(os.path.join(directorio, nombre))
+        nombres.append(nombre)
+
+    job_id, _ = cola_trabajos.encolar(
+        f"importar|{os.path.basename(directorio)}", current_user.id, _trabajo_importar,
+        current_user.id, directorio, nombres, intervalo_km, velocidad_promedio
     )
+    return jsonify({"job_id": job_id, "estado_url": url_for("estado_trabajo", job_id=job_id)}), 202
+
+def consultas_criticas():
+    """Consultas del camino crítico que siempre deben resolverse con un índice."""
+    return {
+        "mis_rutas": Route.query.filter_by(user_id=1).order_by(Route.fecha_creacion.desc(), Route.id.desc()),
+        "checkpoints_ruta": Checkpoint.query.filter_by(route_id=1).order_by(Checkpoint.kilometro),
+        "login": User.query.filter_by(username="admin"),
+        "rutas_similares": consulta_similares(["66jc8y", "66jc8z"], ["66j9kq"], datetime(2026, 1, 1)),
+    }
+
+def verificar_planes_consulta():
+    """Devuelve {consulta: [detalles]} de las consultas críticas que recorren una tabla completa."""
+    problemas = {}
+    for nombre, query in consultas_criticas().items():
+        sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        plan = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        escaneos = [fila[-1] for fila in plan if fila[-1].startswith("SCAN ")]
+        if escaneos:
+            problemas[nombre] = escaneos
+    return problemas
+
+@app.cli.command("verificar-indices")
+def verificar_indices():
+    """Falla si alguna consulta crítica no usa un índice (pensado para CI)."""
+    problemas = verificar_planes_consulta()
+    for nombre, escaneos in problemas.items():
+        print(f"{nombre}: recorrido completo -> {'; '.join(escaneos)}")
+    if problemas:
+        sys.exit(1)
+    print("Todas las consultas críticas usan índices.")
+
+@app.cli.command("indexar-extremos")
+@click.option("--todas", is_flag=True, help="Recalcular también las rutas ya indexadas (p. ej. al cambiar la precisión).")
+def indexar_extremos_cli(todas):
+    """Indexa los extremos de las rutas guardadas para que puedan reutilizarse."""
+    consulta = Route.query.filter(Route.geometria.isnot(None), Route.geometria_reutilizada.is_(False))
+    if not todas:
+        consulta = consulta.filter(Route.celda_origen.is_(None))
+    ids = [route_id for route_id, in consulta.with_entities(Route.id)]
+    for inicio in range(0, len(ids), IMPORT_BATCH_SIZE):
+        for route in Route.query.filter(Route.id.in_(ids[inicio:inicio + IMPORT_BATCH_SIZE])).options(db.undefer(Route.geometria)):
+            if todas and route.origen_lat is not None:
+                origen, destino = [route.origen_lon, route.origen_lat], [route.destino_lon, route.destino_lat]
+            else:
+                coordinates = route.obtener_coordenadas()
+                origen, destino = coordinates[0], coordinates[-1]
+            indexar_extremos(route, origen, destino)
+        db.session.commit()
+        db.session.expunge_all()
+    print(f"{len(ids)} rutas indexadas.")
+
+@app.cli.command("importar-rutas")
+@click.argument("rutas", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--usuario", required=True, help="Nombre del usuario dueño de las rutas importadas.")
+@click.option("--intervalo-km", default=10.0, show_default=True, help="Distancia entre checkpoints.")
+@click.option("--velocidad", default=60.0, show_default=True, help="Velocidad promedio en km/h para las ETA.")
+@click.option("--procesos", default=IMPORT_PROCESSES, show_default=True, help="Procesos que preparan los archivos.")
+@click.option("--lote", default=IMPORT_BATCH_SIZE, show_default=True, help="Rutas por transacción.")
+@click.option("--estado", type=click.Path(), help="Archivo JSON de avance; al repetir el comando se reanuda.")
+def importar_rutas_cli(rutas, usuario, intervalo_km, velocidad, procesos, lote, estado):
+    """Importa rutas desde archivos o directorios con GPX/GeoJSON."""
+    user = User.query.filter_by(username=usuario).first()
+    if user is None:
+        sys.exit(f"El usuario '{usuario}' no existe.")
+    user_id = user.id
+    archivos = importacion.listar_archivos(rutas)
+    inicio = time.perf_counter()
+    resumen = importacion.importar_archivos(
+        archivos, lambda lote_rutas: guardar_rutas_importadas(user_id, lote_rutas),
+        intervalo_km, velocidad, procesos=procesos, lote=lote,
+        estado=importacion.EstadoImportacion(estado), reportar=print
+    )
+    for archivo, error in resumen["errores"].items():
+        print(f"Error en {archivo}: {error}")
+    print(
+        f"{resumen['rutas']} rutas importadas de {resumen['archivos']} archivos en "
+        f"{time.perf_counter() - inicio:.1f} s ({resumen['omitidos_por_estado']} ya importados, "
+        f"{len(resumen['errores'])} con errores, {resumen['recorridos_descartados']} recorridos sin puntos suficientes)."
+    )
+    if resumen["errores"]:
+        sys.exit(1)
+
+def create_app():
+    """Punto de entrada WSGI (gunicorn "app:create_app()" o wsgi.py).
+
+    Las rutas se registran al importar el módulo, así que devuelve la aplicación ya
+    configurada según APP_CONFIG tras las tareas de arranque. Falla si falta SECRET_KEY
+    (solo la configuración de desarrollo tiene una clave por defecto).
+    """
+    if not app.config["SECRET_KEY"]:
+        raise RuntimeError("SECRET_KEY no está definida; la configuración de producción no arranca sin ella.")
+    if app.config["CREAR_TABLAS"]:
+        with app.app_context():
+            db.create_all()
+    return app
 
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=app.config["DEBUG"])
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""Benchmark de extremo a extremo de `calcular_ruta`, `ver_ruta`, `destino` y `mis_rutas` con proveedores simulados.
+
+Levanta `proveedores_simulados` en un puerto local, apunta la app a él con una base de
+datos y una caché temporales y mide, por escenario y tamaño de ruta, el throughput, la
+latencia p50/p95/p99 y la memoria asignada por solicitud (pico de tracemalloc).
+
+Uso:
+    python benchmarks/bench_app.py --iteraciones 30 --guardar benchmarks/baselines/local.json
+    python benchmarks/bench_app.py --comparar benchmarks/baselines/local.json
+    python benchmarks/bench_app.py --escenarios calcular_ruta --en-frio --latencia-ms 80
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from proveedores_simulados import ProveedoresSimulados  # noqa: E402
+
+# Tamaños de ruta representativos: de un trayecto urbano a ~3.000 km de carretera
+RUTAS = {
+    "urbana": ("Plaza de Armas, Santiago", "Costanera Center, Santiago"),
+    "interurbana": ("Santiago", "Valparaiso"),
+    "carretera": ("Arica", "Puerto Montt"),
+}
+ESCENARIOS = ("calcular_ruta", "ver_ruta", "destino", "mis_rutas")
+
+# Métricas donde un valor mayor es peor (el resto, como el throughput, empeora al bajar)
+MAYOR_ES_PEOR = ("p50_ms", "p95_ms", "p99_ms", "memoria_kb")
+
+
+def preparar_app(simulados, directorio):
+    """Configura el entorno antes de importar la app para aislarla en `directorio`."""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(directorio, 'bench.db')}",
+        "CACHE_DB_PATH": os.path.join(directorio, "cache.db"),
+        "ORS_API_KEY": "benchmark",
+        "OWM_API_KEY": "benchmark",
+        "ORS_BASE_URL": simulados.url,
+        "OWM_BASE_URL": simulados.url,
+        "NOMINATIM_BASE_URL": simulados.url,
+        # Sin límites de tasa: se mide la app, no la política de uso de cada proveedor
+        "ORS_RATE": "100000", "ORS_BURST": "100000",
+        "OWM_RATE": "100000", "OWM_BURST": "100000",
+        "NOMINATIM_RATE": "100000",
+    })
+    import app as aplicacion
+
+    with aplicacion.app.app_context():
+        aplicacion.db.create_all()
+        usuario = aplicacion.User(
+            username="benchmark", password=aplicacion.bcrypt.generate_password_hash("benchmark").decode("utf-8")
+        )
+        aplicacion.db.session.add(usuario)
+        aplicacion.db.session.commit()
+        usuario_id = usuario.id
+    return aplicacion, usuario_id
+
+
+def cliente(aplicacion, usuario_id):
+    c = aplicacion.app.test_client()
+    with c.session_transaction() as sesion:
+        sesion["_user_id"] = str(usuario_id)
+    return c
+
+
+def vaciar_caches(aplicacion):
+    for cache in (aplicacion.geocodificador, aplicacion.cache_rutas, aplicacion.cache_clima,
+                  aplicacion.cache_pronostico):
+        cache.memoria.limpiar()
+        cache.almacen.limpiar()
+    # Sin la caché de render y los POIs, ver_ruta y destino volverían a servirse sin
+    # consultar OpenWeatherMap ni Nominatim
+    aplicacion.cache_render.limpiar()
+    aplicacion.almacen_pois.limpiar()
+    aplicacion.geometrias_cache.limpiar()
+
+
+def solicitudes(aplicacion, usuario_id, ruta_ids):
+    """Devuelve {nombre_escenario: funcion(cliente) -> codigo_http}."""
+    casos = {}
+    for tamano, (origen, destino) in RUTAS.items():
+        formulario = {"origen": origen, "destino": destino, "intervalo_km": "10", "velocidad_promedio": "60"}
+        casos[f"calcular_ruta[{tamano}]"] = lambda c, f=formulario: c.post("/calcular_ruta", data=f).status_code
+        casos[f"ver_ruta[{tamano}]"] = lambda c, i=ruta_ids[tamano]: c.get(f"/ver_ruta/{i}").status_code
+        casos[f"destino[{tamano}]"] = lambda c, i=ruta_ids[tamano]: c.get(f"/api/rutas/{i}/destino").status_code
+    casos["mis_rutas"] = lambda c: c.get("/mis_rutas").status_code
+    return casos
+
+
+def medir(funcion, clientes, iteraciones, antes=None):
+    """Ejecuta `funcion` `iteraciones` veces repartidas entre los clientes y mide cada solicitud."""
+    def una(c):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        estado = funcion(c)
+        return time.perf_counter() - inicio, estado
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clientes)) as executor:
+        resultados = list(executor.map(una, (clientes[i % len(clientes)] for i in range(iteraciones))))
+    total = time.perf_counter() - inicio
+
+    tiempos = np.array([t for t, _ in resultados]) * 1000
+    return {
+        "solicitudes": iteraciones,
+        "errores": sum(1 for _, estado in resultados if estado != 200),
+        "rps": round(iteraciones / total, 2),
+        "p50_ms": round(float(np.percentile(tiempos, 50)), 2),
+        "p95_ms": round(float(np.percentile(tiempos, 95)), 2),
+        "p99_ms": round(float(np.percentile(tiempos, 99)), 2),
+    }
+
+
+def memoria_por_solicitud(funcion, c, muestras, antes=None):
+    """Mediana del pico de memoria asignada (KB) durante una solicitud, medida con tracemalloc."""
+    picos = []
+    tracemalloc.start()
+    try:
+        for _ in range(muestras):
+            if antes:
+                antes()
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            funcion(c)
+            picos.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return round(float(np.median(picos)) / 1024, 1)
+
+
+def comparar(actual, baseline, tolerancia):
+    """Imprime la diferencia con la baseline y devuelve la lista de regresiones."""
+    regresiones = []
+    print(f"\nComparación con baseline ({baseline['metadatos']['fecha']}), tolerancia {tolerancia:.0%}:")
+    for nombre, metricas in actual["escenarios"].items():
+        previas = baseline["escenarios"].get(nombre)
+        if not previas:
+            continue
+        for metrica in MAYOR_ES_PEOR + ("rps",):
+            antes, ahora = previas.get(metrica), metricas.get(metrica)
+            if not antes or ahora is None:
+                continue
+            cambio = ahora / antes - 1
+            empeora = cambio > tolerancia if metrica in MAYOR_ES_PEOR else cambio < -tolerancia
+            marca = "  REGRESIÓN" if empeora else ""
+            print(f"  {nombre:<26} {metrica:<10} {antes:>10} -> {ahora:>10} ({cambio:+.1%}){marca}")
+            if empeora:
+                regresiones.append((nombre, metrica))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iteraciones", type=int, default=20, help="Solicitudes medidas por escenario")
+    parser.add_argument("--concurrencia", type=int, default=1, help="Clientes concurrentes")
+    parser.add_argument("--muestras-memoria", type=int, default=3)
+    parser.add_argument("--latencia-ms", type=float, default=0, help="Latencia simulada de cada proveedor")
+    parser.add_argument("--escenarios", nargs="+", choices=ESCENARIOS, default=list(ESCENARIOS))
+    parser.add_argument("--en-frio", action="store_true", help="Vaciar las cachés antes de cada solicitud")
+    parser.add_argument("--guardar", help="Guardar los resultados como baseline en este archivo JSON")
+    parser.add_argument("--comparar", help="Baseline JSON contra la cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento relativo aceptado")
+    args = parser.parse_args()
+
+    with ProveedoresSimulados(latencia_ms=args.latencia_ms) as simulados, \
+            tempfile.TemporaryDirectory() as directorio:
+        aplicacion, usuario_id = preparar_app(simulados, directorio)
+        clientes = [cliente(aplicacion, usuario_id) for _ in range(args.concurrencia)]
+        antes = (lambda: vaciar_caches(aplicacion)) if args.en_frio else None
+
+        # La salida de depuración de la app no debe contaminar los tiempos ni el reporte
+        with contextlib.redirect_stdout(io.StringIO()):
+            ruta_ids = {}
+            with aplicacion.app.app_context():
+                for tamano, (origen, destino) in RUTAS.items():
+                    clientes[0].post("/calcular_ruta", data={"origen": origen, "destino": destino})
+                    ruta_ids[tamano] = aplicacion.db.session.execute(
+                        aplicacion.db.select(aplicacion.Route.id).order_by(aplicacion.Route.id.desc()).limit(1)
+                    ).scalar_one()
+
+            resultados = {}
+            for nombre, funcion in solicitudes(aplicacion, usuario_id, ruta_ids).items():
+                if nombre.split("[")[0] not in args.escenarios:
+                    continue
+                funcion(clientes[0])  # Calentamiento
+                resultado = medir(funcion, clientes, args.iteraciones, antes)
+                resultado["memoria_kb"] = memoria_por_solicitud(funcion, clientes[0], args.muestras_memoria, antes)
+                resultados[nombre] = resultado
+
+        rutas_guardadas = len(ruta_ids) + sum(
+            r["solicitudes"] + args.muestras_memoria + 1 for n, r in resultados.items() if n.startswith("calcular_ruta")
+        )
+        print(f"Proveedores simulados: {simulados.solicitudes} solicitudes; {rutas_guardadas} rutas guardadas")
+
+    print(f"\n{'escenario':<26} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mem KB':>9} {'errores':>8}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<26} {r['rps']:>8} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} "
+              f"{r['memoria_kb']:>9} {r['errores']:>8}")
+
+    actual = {
+        "metadatos": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "iteraciones": args.iteraciones,
+            "concurrencia": args.concurrencia,
+            "latencia_ms": args.latencia_ms,
+            "en_frio": args.en_frio,
+        },
+        "escenarios": resultados,
+    }
+
+    if args.guardar:
+        os.makedirs(os.path.dirname(os.path.abspath(args.guardar)), exist_ok=True)
+        with open(args.guardar, "w", encoding="utf-8") as archivo:
+            json.dump(actual, archivo, indent=2, ensure_ascii=False)
+        print(f"\nBaseline guardada en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            baseline = json.load(archivo)
+        if comparar(actual, baseline, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark del generador de checkpoints sobre polilíneas largas.
+
+Uso:
+    python benchmarks/bench_checkpoints.py --vertices 100000 --intervalo 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checkpoints import distancias_tramos, generar_checkpoints  # noqa: E402
+
+
+def polilinea_sintetica(vertices, semilla=0):
+    """Genera una ruta de ~3.000 km de norte a sur (Arica - Puerto Montt) con ruido lateral."""
+    rng = np.random.default_rng(semilla)
+    lat = np.linspace(-18.48, -41.47, vertices)
+    lon = -70.3 + np.cumsum(rng.normal(0, 0.0002, vertices))
+    return np.column_stack((lon, lat)).tolist()
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return resultado, min(tiempos), sorted(tiempos)[len(tiempos) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vertices", type=int, default=100_000)
+    parser.add_argument("--intervalo", type=float, default=10.0)
+    parser.add_argument("--velocidad", type=float, default=60.0)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    coordinates = polilinea_sintetica(args.vertices)
+    checkpoints, minimo, mediana = medir(
+        lambda: generar_checkpoints(coordinates, args.intervalo, args.velocidad), args.repeticiones
+    )
+    total_km = float(distancias_tramos(coordinates).sum())
+
+    print(f"Vértices:     {args.vertices}")
+    print(f"Distancia:    {total_km:.1f} km")
+    print(f"Checkpoints:  {len(checkpoints)} (cada {args.intervalo} km)")
+    print(f"Tiempo:       mín {minimo * 1000:.1f} ms / mediana {mediana * 1000:.1f} ms")
+
+    try:
+        from geopy.distance import geodesic
+    except ImportError:
+        return
+
+    # Error de haversine frente a la distancia geodésica WGS84 en una muestra de tramos
+    muestra = coordinates[:: max(1, args.vertices // 1000)]
+    geodesica = sum(
+        geodesic((a[1], a[0]), (b[1], b[0])).kilometers for a, b in zip(muestra, muestra[1:])
+    )
+    error = abs(float(distancias_tramos(muestra).sum()) - geodesica) / geodesica * 100
+    print(f"Error vs geodésica WGS84: {error:.2f} %")
+
+
+if __name__ == "__main__":
+    main()
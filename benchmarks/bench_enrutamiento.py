@@ -0,0 +1,64 @@
+"""Benchmark del backend de enrutamiento local (A* sobre arreglos CSR), sin red.
+
+Uso:
+    python benchmarks/bench_enrutamiento.py --lado 300 --consultas 50
+    python benchmarks/bench_enrutamiento.py --grafo extracto.osm
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enrutamiento import GrafoLocal  # noqa: E402
+
+
+def grafo_grilla(lado, paso=0.001, semilla=0):
+    """Grilla vial de `lado` x `lado` nodos con pequeñas perturbaciones, centrada en Santiago."""
+    rng = np.random.default_rng(semilla)
+    lon = -70.8 + np.arange(lado) * paso
+    lat = -33.6 + np.arange(lado) * paso
+    malla_lon, malla_lat = np.meshgrid(lon, lat)
+    malla_lon = malla_lon + rng.normal(0, paso / 10, malla_lon.shape)
+    malla_lat = malla_lat + rng.normal(0, paso / 10, malla_lat.shape)
+    aristas = []
+    for i in range(lado):
+        for j in range(lado):
+            if j + 1 < lado:
+                aristas.append((malla_lon[i, j], malla_lat[i, j], malla_lon[i, j + 1], malla_lat[i, j + 1], False))
+            if i + 1 < lado:
+                aristas.append((malla_lon[i, j], malla_lat[i, j], malla_lon[i + 1, j], malla_lat[i + 1, j], False))
+    return GrafoLocal.desde_aristas(aristas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lado", type=int, default=300)
+    parser.add_argument("--grafo", help="Extracto .osm o CSV de aristas en lugar de la grilla sintética")
+    parser.add_argument("--consultas", type=int, default=50)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    grafo = GrafoLocal.desde_archivo(args.grafo) if args.grafo else grafo_grilla(args.lado)
+    print(f"Grafo:        {len(grafo.lon)} nodos, {len(grafo.destinos)} aristas "
+          f"(carga {time.perf_counter() - inicio:.2f} s)")
+
+    rng = np.random.default_rng(1)
+    pares = rng.integers(0, len(grafo.lon), size=(args.consultas, 2))
+    tiempos, metros = [], []
+    for origen, destino in pares:
+        inicio = time.perf_counter()
+        _, distancia = grafo.camino_mas_corto(int(origen), int(destino))
+        tiempos.append(time.perf_counter() - inicio)
+        metros.append(distancia)
+
+    tiempos = np.array(tiempos) * 1000
+    print(f"Consultas:    {args.consultas} (distancia media {np.mean(metros) / 1000:.1f} km)")
+    print(f"Latencia A*:  p50 {np.percentile(tiempos, 50):.1f} ms / p95 {np.percentile(tiempos, 95):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
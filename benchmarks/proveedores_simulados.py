@@ -0,0 +1,245 @@
+"""Servidor HTTP local que simula OpenRouteService, OpenWeatherMap y Nominatim.
+
+Responde con las mismas estructuras JSON que los proveedores reales a partir de los
+fixtures de `fixtures/proveedores.json`; la geometría de las rutas se genera de forma
+determinista con la densidad de vértices típica de ORS, así que los resultados son
+reproducibles sin red ni claves de API.
+
+Uso independiente (para apuntar la app con ORS_BASE_URL, OWM_BASE_URL y NOMINATIM_BASE_URL):
+    python benchmarks/proveedores_simulados.py --puerto 8089 --latencia-ms 50
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checkpoints import RADIO_TIERRA_KM, distancias_tramos  # noqa: E402
+from cache import normalizar_consulta  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "proveedores.json")
+
+
+def _semilla(*partes):
+    return int.from_bytes(hashlib.sha1(repr(partes).encode()).digest()[:4], "little")
+
+
+def geometria_ruta(origen, destino, metros_por_vertice=75):
+    """Polilínea [lon, lat] sinuosa entre dos puntos, con un vértice cada ~`metros_por_vertice`.
+
+    Se ondula alrededor de la línea recta (amplitud de 1/10 de la longitud de onda) para
+    que la distancia recorrida sea ~10 % mayor que la directa, como en una carretera real.
+    """
+    origen, destino = np.asarray(origen, dtype=np.float64), np.asarray(destino, dtype=np.float64)
+    directa_km = float(distancias_tramos([origen.tolist(), destino.tolist()])[0])
+    n = max(2, int(directa_km * 1100 / metros_por_vertice))
+    t = np.linspace(0.0, 1.0, n)
+
+    # Trabajar en km locales para que la ondulación sea perpendicular a la dirección del viaje
+    escala = np.array([np.cos(np.radians((origen[1] + destino[1]) / 2)), 1.0]) * np.pi * RADIO_TIERRA_KM / 180
+    delta = (destino - origen) * escala
+    largo = max(np.hypot(*delta), 1e-9)
+    normal = np.array([-delta[1], delta[0]]) / largo
+    ondas = max(1, round(largo / 50))
+    amplitud = largo / ondas / 10
+    desplazamiento = amplitud * np.sin(2 * np.pi * ondas * t)
+    desplazamiento[[0, -1]] = 0
+
+    rng = np.random.default_rng(_semilla(origen.tolist(), destino.tolist()))
+    puntos = origen + np.outer(t, destino - origen) + np.outer(desplazamiento, normal) / escala
+    puntos[1:-1] += rng.normal(0, 0.00003, puntos[1:-1].shape)
+    return np.round(puntos, 6).tolist()
+
+
+class ProveedoresSimulados:
+    """Levanta los tres proveedores simulados en un hilo; sirve como context manager."""
+
+    def __init__(self, puerto=0, latencia_ms=0, metros_por_vertice=75, fixtures=FIXTURES):
+        with open(fixtures, encoding="utf-8") as archivo:
+            self.fixtures = json.load(archivo)
+        self.latencia = latencia_ms / 1000
+        self.metros_por_vertice = metros_por_vertice
+        self.solicitudes = {"openrouteservice": 0, "openweathermap": 0, "nominatim": 0}
+        self._lock = threading.Lock()
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", puerto), self._manejador())
+        self.servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def _contar(self, proveedor):
+        with self._lock:
+            self.solicitudes[proveedor] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    # --- Respuestas de cada proveedor ---
+
+    def geocodificar(self, texto):
+        coords = self.fixtures["geocodificacion"].get(normalizar_consulta(texto))
+        if coords is None:
+            # Lugares desconocidos: una coordenada determinista dentro de Chile central
+            rng = np.random.default_rng(_semilla(normalizar_consulta(texto)))
+            coords = [round(float(rng.uniform(-72, -70.5)), 6), round(float(rng.uniform(-38, -30)), 6)]
+        return {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": coords},
+                "properties": {"label": texto, "confidence": 1},
+            }],
+        }
+
+    def direcciones(self, coordinates):
+        geometria = geometria_ruta(coordinates[0], coordinates[-1], self.metros_por_vertice)
+        distancia = float(distancias_tramos(geometria).sum() * 1000)
+        duracion = distancia / (80 / 3.6)
+        return {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": geometria},
+                "properties": {
+                    "segments": [{"distance": round(distancia, 1), "duration": round(duracion, 1), "steps": []}],
+                    "summary": {"distance": round(distancia, 1), "duration": round(duracion, 1)},
+                    "way_points": [0, len(geometria) - 1],
+                },
+            }],
+            "bbox": [
+                min(p[0] for p in geometria), min(p[1] for p in geometria),
+                max(p[0] for p in geometria), max(p[1] for p in geometria),
+            ],
+        }
+
+    def clima(self, lat, lon):
+        datos = json.loads(json.dumps(self.fixtures["clima"]))
+        datos["coord"] = {"lon": lon, "lat": lat}
+        datos["main"]["temp"] = round(25 + lat / 4, 1)
+        return datos
+
+    def pronostico(self, lat, lon):
+        """Pronóstico cada 3 horas de los próximos 5 días (40 entradas), como /data/2.5/forecast."""
+        actual = self.clima(lat, lon)
+        inicio = int(time.time()) // 10800 * 10800 + 10800
+        entradas = []
+        for i in range(40):
+            entrada = {k: actual[k] for k in ("main", "weather", "clouds", "wind", "visibility")}
+            entrada = json.loads(json.dumps(entrada))
+            entrada["dt"] = inicio + i * 10800
+            entrada["main"]["temp"] = round(actual["main"]["temp"] + 4 * np.sin(i * np.pi / 4), 1)
+            entrada["dt_txt"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(entrada["dt"]))
+            entradas.append(entrada)
+        return {"cod": "200", "message": 0, "cnt": len(entradas), "list": entradas,
+                "city": {"coord": {"lat": lat, "lon": lon}, "country": "CL", "timezone": -10800}}
+
+    def pois(self, consulta):
+        categoria = consulta.get("q", ["restaurant"])[0]
+        limite = int(consulta.get("limit", ["10"])[0])
+        if "viewbox" in consulta:
+            oeste, norte, este, sur = map(float, consulta["viewbox"][0].split(","))
+        else:
+            lat, lon = float(consulta["lat"][0]), float(consulta["lon"][0])
+            oeste, norte, este, sur = lon - 0.01, lat + 0.01, lon + 0.01, lat - 0.01
+        rng = np.random.default_rng(_semilla(categoria, oeste, norte, este, sur))
+        base = self.fixtures["poi"]
+        return [
+            dict(
+                base,
+                place_id=i,
+                type=categoria,
+                display_name=f"{categoria.title()} {i}",
+                lat=f"{rng.uniform(sur, norte):.7f}",
+                lon=f"{rng.uniform(oeste, este):.7f}",
+            )
+            for i in range(limite)
+        ]
+
+    def _manejador(self):
+        simulados = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, datos, estado=200):
+                cuerpo = json.dumps(datos).encode()
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                consulta = parse_qs(url.query)
+                if url.path == "/geocode/search":
+                    simulados._contar("openrouteservice")
+                    return self._responder(simulados.geocodificar(consulta.get("text", [""])[0]))
+                if url.path == "/data/2.5/weather":
+                    simulados._contar("openweathermap")
+                    return self._responder(simulados.clima(float(consulta["lat"][0]), float(consulta["lon"][0])))
+                if url.path == "/data/2.5/forecast":
+                    simulados._contar("openweathermap")
+                    return self._responder(simulados.pronostico(float(consulta["lat"][0]), float(consulta["lon"][0])))
+                if url.path == "/search":
+                    simulados._contar("nominatim")
+                    return self._responder(simulados.pois(consulta))
+                self._responder({"error": "not found"}, 404)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if url.path.startswith("/v2/directions/") and url.path.endswith("/geojson"):
+                    simulados._contar("openrouteservice")
+                    return self._responder(simulados.direcciones(cuerpo["coordinates"]))
+                self._responder({"error": "not found"}, 404)
+
+        return Manejador
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--puerto", type=int, default=8089)
+    parser.add_argument("--latencia-ms", type=float, default=0, help="Latencia agregada a cada respuesta")
+    parser.add_argument("--metros-por-vertice", type=float, default=75)
+    args = parser.parse_args()
+
+    simulados = ProveedoresSimulados(args.puerto, args.latencia_ms, args.metros_por_vertice)
+    print(f"Proveedores simulados en {simulados.url} (Ctrl+C para detener)")
+    print(f"  ORS_BASE_URL={simulados.url} OWM_BASE_URL={simulados.url} NOMINATIM_BASE_URL={simulados.url}")
+    try:
+        simulados.servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
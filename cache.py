@@ -0,0 +1,566 @@
+"""Capas de caché en memoria y en SQLite para las consultas a proveedores externos."""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+_FALTA = object()
+
+
+_BASE32_GEOHASH = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat, lon, precision=5):
+    """Codifica una coordenada como geohash; con precisión 5 cada celda mide ~4,9 x 4,9 km."""
+    rango_lat, rango_lon = [-90.0, 90.0], [-180.0, 180.0]
+    caracteres, bits, valor, par = [], 0, 0, True
+    while len(caracteres) < precision:
+        rango, coordenada = (rango_lon, lon) if par else (rango_lat, lat)
+        medio = (rango[0] + rango[1]) / 2
+        valor <<= 1
+        if coordenada >= medio:
+            valor |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        par = not par
+        bits += 1
+        if bits == 5:
+            caracteres.append(_BASE32_GEOHASH[valor])
+            bits, valor = 0, 0
+    return "".join(caracteres)
+
+
+def caja_geohash(celda):
+    """Devuelve la caja (sur, oeste, norte, este) que cubre una celda geohash."""
+    rango_lat, rango_lon = [-90.0, 90.0], [-180.0, 180.0]
+    par = True
+    for caracter in celda:
+        valor = _BASE32_GEOHASH.index(caracter)
+        for desplazamiento in range(4, -1, -1):
+            rango = rango_lon if par else rango_lat
+            medio = (rango[0] + rango[1]) / 2
+            if (valor >> desplazamiento) & 1:
+                rango[0] = medio
+            else:
+                rango[1] = medio
+            par = not par
+    return rango_lat[0], rango_lon[0], rango_lat[1], rango_lon[1]
+
+
+def celdas_cercanas(lat, lon, radio_km, precision):
+    """Celdas geohash que intersectan la caja que encierra un círculo de `radio_km` alrededor de (lat, lon).
+
+    Se recorren las celdas de una en una desde la esquina suroeste de la caja, así que
+    salen todas las necesarias y solo esas: 1 a 4 si el radio es menor que una celda.
+    """
+    radio_lat = radio_km / 111.32
+    radio_lon = radio_km / (111.32 * max(math.cos(math.radians(lat)), 0.01))
+    sur, norte = max(-90.0, lat - radio_lat), min(90.0, lat + radio_lat)
+    oeste, este = lon - radio_lon, lon + radio_lon
+    sur_celda, oeste_celda, norte_celda, este_celda = caja_geohash(
+        geohash(sur, (oeste + 180) % 360 - 180, precision)
+    )
+    alto, ancho = norte_celda - sur_celda, este_celda - oeste_celda
+    oeste_celda = oeste - ((oeste + 180) % 360 - 180 - oeste_celda)  # Sin normalizar, como `oeste`
+    filas = math.floor((norte - sur_celda) / alto) + 1
+    columnas = min(math.floor((este - oeste_celda) / ancho) + 1, round(360 / ancho))
+    return sorted({
+        geohash(min(sur_celda + (i + 0.5) * alto, 90.0), (oeste_celda + (j + 0.5) * ancho + 180) % 360 - 180, precision)
+        for i in range(filas)
+        for j in range(columnas)
+    })
+
+
+def normalizar_consulta(texto):
+    """Normaliza un texto de búsqueda: sin acentos, en minúsculas y con espacios simples."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.casefold().split())
+
+
+class CacheLRU:
+    """Caché en memoria con expulsión LRU y expiración por TTL (en segundos)."""
+
+    def __init__(self, max_entradas=1024, ttl=3600):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, defecto=None):
+        with self._lock:
+            entrada = self._datos.get(clave, _FALTA)
+            if entrada is _FALTA:
+                return defecto
+            valor, expira = entrada
+            if expira is not None and expira < time.time():
+                del self._datos[clave]
+                return defecto
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expira = time.time() + ttl if ttl else None
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def eliminar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def eliminar_donde(self, condicion):
+        """Elimina todas las entradas cuya clave cumpla `condicion(clave)`."""
+        with self._lock:
+            for clave in [clave for clave in self._datos if condicion(clave)]:
+                del self._datos[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class Coalescedor:
+    """Agrupa llamadas concurrentes con la misma clave para que solo una llegue al proveedor."""
+
+    def __init__(self):
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+        self.coalescidas = 0
+
+    def ejecutar(self, clave, funcion, *args):
+        with self._lock:
+            futuro = self._en_vuelo.get(clave)
+            if futuro is not None:
+                self.coalescidas += 1
+                lider = False
+            else:
+                futuro = self._en_vuelo[clave] = Future()
+                lider = True
+
+        if not lider:
+            return futuro.result()
+
+        try:
+            futuro.set_result(funcion(*args))
+        except Exception as e:
+            futuro.set_exception(e)
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+        return futuro.result()
+
+
+class AlmacenSQLite:
+    """Tabla clave/valor persistente en SQLite, compartida entre procesos.
+
+    Con `max_entradas` se expulsan las entradas usadas hace más tiempo; con `comprimir`
+    los valores se guardan como JSON comprimido con zlib.
+    """
+
+    def __init__(self, ruta, tabla, ttl=None, max_entradas=None, comprimir=False):
+        self.ruta = ruta
+        self.tabla = tabla
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.comprimir = comprimir
+        self._lectura = threading.local()
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.tabla} ("
+                "clave TEXT PRIMARY KEY, valor BLOB NOT NULL, creado REAL NOT NULL, "
+                "usado REAL NOT NULL, expira REAL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.tabla}_usado ON {self.tabla} (usado)")
+
+    @contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.ruta, timeout=10)
+        # Es una caché: con WAL, NORMAL evita un fsync por escritura y solo arriesga las últimas entradas
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _conexion_lectura(self):
+        """Conexión propia del hilo para lecturas frecuentes (en autocommit cada consulta ve lo último).
+
+        Se recrea si el proceso cambió, porque una conexión SQLite no sobrevive a un fork.
+        """
+        pid, conn = getattr(self._lectura, "conexion", (None, None))
+        if pid != os.getpid():
+            conn = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+            self._lectura.conexion = (os.getpid(), conn)
+        return conn
+
+    def _serializar(self, valor):
+        datos = json.dumps(valor, separators=(",", ":"))
+        return zlib.compress(datos.encode("utf-8")) if self.comprimir else datos
+
+    def _deserializar(self, datos):
+        if self.comprimir:
+            datos = zlib.decompress(datos).decode("utf-8")
+        return json.loads(datos)
+
+    def obtener(self, clave, defecto=None):
+        fila = self.obtener_con_version(clave)
+        return defecto if fila is None else fila[0]
+
+    def obtener_con_version(self, clave):
+        """Devuelve (valor, version) o None; la versión es el instante en que se guardó el valor."""
+        ahora = time.time()
+        with self._conectar() as conn:
+            fila = conn.execute(
+                f"SELECT valor, creado, expira FROM {self.tabla} WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            valor, creado, expira = fila
+            if expira is not None and expira < ahora:
+                conn.execute(f"DELETE FROM {self.tabla} WHERE clave = ?", (clave,))
+                return None
+            if self.max_entradas:
+                conn.execute(f"UPDATE {self.tabla} SET usado = ? WHERE clave = ?", (ahora, clave))
+        return self._deserializar(valor), creado
+
+    def version(self, clave):
+        """Versión vigente de una entrada sin leer su valor, o None si no existe o venció."""
+        fila = self._conexion_lectura().execute(
+            f"SELECT creado FROM {self.tabla} WHERE clave = ? AND (expira IS NULL OR expira >= ?)",
+            (clave, time.time()),
+        ).fetchone()
+        return fila[0] if fila else None
+
+    def guardar(self, clave, valor, ttl=None):
+        """Guarda el valor y devuelve su versión."""
+        ttl = self.ttl if ttl is None else ttl
+        ahora = time.time()
+        with self._conectar() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.tabla} (clave, valor, creado, usado, expira) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (clave, self._serializar(valor), ahora, ahora, ahora + ttl if ttl else None),
+            )
+            if self.max_entradas:
+                conn.execute(
+                    f"DELETE FROM {self.tabla} WHERE clave IN ("
+                    f"SELECT clave FROM {self.tabla} ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entradas,),
+                )
+        return ahora
+
+    def eliminar(self, *claves):
+        with self._conectar() as conn:
+            conn.executemany(f"DELETE FROM {self.tabla} WHERE clave = ?", [(clave,) for clave in claves])
+
+    def purgar_expirados(self):
+        """Elimina las entradas vencidas y devuelve cuántas se borraron."""
+        with self._conectar() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM {self.tabla} WHERE expira IS NOT NULL AND expira < ?", (time.time(),)
+            )
+            return cursor.rowcount
+
+    def purgar_anteriores(self, segundos):
+        """Elimina las entradas creadas hace más de `segundos` y devuelve cuántas se borraron."""
+        with self._conectar() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM {self.tabla} WHERE creado < ?", (time.time() - segundos,)
+            )
+            return cursor.rowcount
+
+    def limpiar(self):
+        with self._conectar() as conn:
+            conn.execute(f"DELETE FROM {self.tabla}")
+
+
+class CacheGeocodificacion:
+    """Caché de geocodificación delante de `client.pelias_search`.
+
+    Primero consulta la memoria del proceso, luego la tabla SQLite compartida y solo
+    ante un fallo en ambas llama a OpenRouteService.
+    """
+
+    def __init__(self, client, ruta_db, ttl=7 * 24 * 3600, max_entradas=1024):
+        self.client = client
+        self.memoria = CacheLRU(max_entradas=max_entradas, ttl=ttl)
+        self.almacen = AlmacenSQLite(ruta_db, "geocodificacion", ttl=ttl)
+        self._lock = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_sqlite = 0
+        self.fallos = 0
+
+    def _contar(self, atributo):
+        with self._lock:
+            setattr(self, atributo, getattr(self, atributo) + 1)
+
+    def geocodificar(self, texto):
+        """Devuelve las coordenadas [lon, lat] del primer resultado para `texto`."""
+        clave = normalizar_consulta(texto)
+        if not clave:
+            raise ValueError("La ubicación no puede estar vacía.")
+
+        coords = self.memoria.obtener(clave)
+        if coords is not None:
+            self._contar("aciertos_memoria")
+            return coords
+
+        coords = self.almacen.obtener(clave)
+        if coords is not None:
+            self._contar("aciertos_sqlite")
+            self.memoria.guardar(clave, coords)
+            return coords
+
+        self._contar("fallos")
+        features = self.client.pelias_search(texto)["features"]
+        if not features:
+            raise ValueError(f"No se encontró la ubicación '{texto}'.")
+        coords = features[0]["geometry"]["coordinates"]
+        self.memoria.guardar(clave, coords)
+        self.almacen.guardar(clave, coords)
+        return coords
+
+    def estadisticas(self):
+        aciertos = self.aciertos_memoria + self.aciertos_sqlite
+        total = aciertos + self.fallos
+        return {
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_sqlite": self.aciertos_sqlite,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(aciertos / total, 3) if total else 0.0,
+            "entradas_memoria": len(self.memoria),
+        }
+
+
+class CacheRutas:
+    """Caché de direcciones indexada por origen/destino cuantizados, perfil y backend.
+
+    Guarda la geometría GeoJSON comprimida y la distancia del segmento, de modo que una
+    consulta repetida no vuelve a calcular la ruta. `backend` es cualquier objeto con
+    `nombre` y `direcciones(origen, destino, profile)` (ver `enrutamiento`).
+    """
+
+    def __init__(self, backend, ruta_db, precision=4, ttl=30 * 24 * 3600,
+                 max_entradas=5000, max_entradas_memoria=64):
+        self.backend = backend
+        self.precision = precision
+        self.memoria = CacheLRU(max_entradas=max_entradas_memoria, ttl=ttl)
+        self.almacen = AlmacenSQLite(
+            ruta_db, "direcciones", ttl=ttl, max_entradas=max_entradas, comprimir=True
+        )
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def clave(self, origen_coords, destino_coords, profile="driving-car"):
+        puntos = ";".join(
+            f"{round(lon, self.precision)},{round(lat, self.precision)}"
+            for lon, lat in (origen_coords, destino_coords)
+        )
+        return f"{self.backend.nombre}:{profile}:{puntos}"
+
+    def _buscar(self, clave):
+        resultado = self.memoria.obtener(clave)
+        if resultado is None:
+            resultado = self.almacen.obtener(clave)
+            if resultado is not None:
+                self.memoria.guardar(clave, resultado)
+        return resultado
+
+    def obtener(self, origen_coords, destino_coords, profile="driving-car"):
+        """Devuelve el resultado en caché para el par dado, o None sin llamar al backend."""
+        resultado = self._buscar(self.clave(origen_coords, destino_coords, profile))
+        if resultado is not None:
+            with self._lock:
+                self.aciertos += 1
+        return resultado
+
+    def guardar(self, origen_coords, destino_coords, resultado, profile="driving-car"):
+        """Guarda el resultado exacto de las direcciones para el par dado."""
+        clave = self.clave(origen_coords, destino_coords, profile)
+        self.memoria.guardar(clave, resultado)
+        self.almacen.guardar(clave, resultado)
+
+    def direcciones(self, origen_coords, destino_coords, profile="driving-car"):
+        """Devuelve {"coordinates": [...], "distancia": metros} para el par dado."""
+        resultado = self._buscar(self.clave(origen_coords, destino_coords, profile))
+
+        with self._lock:
+            if resultado is not None:
+                self.aciertos += 1
+                return resultado
+            self.fallos += 1
+
+        resultado = self.backend.direcciones(origen_coords, destino_coords, profile)
+        self.guardar(origen_coords, destino_coords, resultado, profile)
+        return resultado
+
+    def invalidar(self, origen_coords, destino_coords, profile="driving-car"):
+        clave = self.clave(origen_coords, destino_coords, profile)
+        self.memoria.eliminar(clave)
+        self.almacen.eliminar(clave)
+
+    def invalidar_anteriores(self, segundos):
+        """Descarta las rutas calculadas hace más de `segundos`."""
+        self.memoria.limpiar()
+        return self.almacen.purgar_anteriores(segundos)
+
+    def limpiar(self):
+        self.memoria.limpiar()
+        self.almacen.limpiar()
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 3) if total else 0.0,
+            "entradas_memoria": len(self.memoria),
+        }
+
+
+class CacheClima:
+    """Caché del clima (actual o pronosticado) agrupada por celdas geohash.
+
+    Las consultas que caen en la misma celda dentro del TTL se responden desde memoria o
+    SQLite, y los fallos concurrentes para una misma celda se resuelven con una sola
+    llamada al proveedor. Las respuestas con error no se guardan. `tabla` separa en
+    SQLite las distintas consultas (clima actual y pronóstico).
+    """
+
+    def __init__(self, obtener_clima, ruta_db, precision=5, ttl=600, max_entradas=4096, tabla="clima"):
+        self.obtener_clima = obtener_clima
+        self.precision = precision
+        self.memoria = CacheLRU(max_entradas=max_entradas, ttl=ttl)
+        self.almacen = AlmacenSQLite(ruta_db, tabla, ttl=ttl, max_entradas=max_entradas * 4)
+        self.coalescedor = Coalescedor()
+        self._lock = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_sqlite = 0
+        self.fallos = 0
+
+    def _contar(self, atributo):
+        with self._lock:
+            setattr(self, atributo, getattr(self, atributo) + 1)
+
+    def obtener(self, lat, lon):
+        celda = geohash(lat, lon, self.precision)
+        clima = self.memoria.obtener(celda)
+        if clima is not None:
+            self._contar("aciertos_memoria")
+            return clima
+
+        clima = self.almacen.obtener(celda)
+        if clima is not None:
+            self._contar("aciertos_sqlite")
+            self.memoria.guardar(celda, clima)
+            return clima
+
+        self._contar("fallos")
+        return self.coalescedor.ejecutar(celda, self._consultar, celda, lat, lon)
+
+    def _consultar(self, celda, lat, lon):
+        clima = self.obtener_clima(lat, lon)
+        if isinstance(clima, dict) and "error" not in clima:
+            self.memoria.guardar(celda, clima)
+            self.almacen.guardar(celda, clima)
+        return clima
+
+    def estadisticas(self):
+        aciertos = self.aciertos_memoria + self.aciertos_sqlite
+        total = aciertos + self.fallos
+        return {
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_sqlite": self.aciertos_sqlite,
+            "fallos": self.fallos,
+            "coalescidas": self.coalescedor.coalescidas,
+            "tasa_aciertos": round(aciertos / total, 3) if total else 0.0,
+            "entradas_memoria": len(self.memoria),
+        }
+
+
+class CacheRender:
+    """Fragmentos ya renderizados de contenido inmutable (HTML o JSON), por clave.
+
+    Vive en memoria del proceso y, con `ruta_db`, también en una tabla SQLite compartida
+    entre workers. Las invalidaciones de otros procesos solo llegan a la tabla, así que cada
+    acierto en memoria se valida contra la versión de la fila compartida (una lectura sin
+    descomprimir el valor); `ttl_memoria` solo acota cuánto se retiene en memoria.
+    """
+
+    def __init__(self, ruta_db=None, ttl=7 * 24 * 3600, ttl_memoria=60, max_entradas=512):
+        self.memoria = CacheLRU(max_entradas=max_entradas, ttl=ttl_memoria if ruta_db else ttl)
+        self.almacen = (
+            AlmacenSQLite(ruta_db, "render", ttl=ttl, max_entradas=max_entradas * 8, comprimir=True)
+            if ruta_db else None
+        )
+        self._lock = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_sqlite = 0
+        self.fallos = 0
+
+    def _contar(self, atributo):
+        with self._lock:
+            setattr(self, atributo, getattr(self, atributo) + 1)
+
+    def obtener(self, clave):
+        en_memoria = self.memoria.obtener(clave)
+        if en_memoria is not None:
+            valor, version = en_memoria
+            if self.almacen is None or self.almacen.version(clave) == version:
+                self._contar("aciertos_memoria")
+                return valor
+            self.memoria.eliminar(clave)  # Otro worker la invalidó o la reemplazó
+
+        if self.almacen is not None:
+            fila = self.almacen.obtener_con_version(clave)
+            if fila is not None:
+                self._contar("aciertos_sqlite")
+                self.memoria.guardar(clave, fila)
+                return fila[0]
+
+        self._contar("fallos")
+        return None
+
+    def guardar(self, clave, valor):
+        version = self.almacen.guardar(clave, valor) if self.almacen is not None else None
+        self.memoria.guardar(clave, (valor, version))
+
+    def invalidar(self, *claves):
+        for clave in claves:
+            self.memoria.eliminar(clave)
+        if self.almacen is not None and claves:
+            self.almacen.eliminar(*claves)
+
+    def limpiar(self):
+        self.memoria.limpiar()
+        if self.almacen is not None:
+            self.almacen.limpiar()
+
+    def estadisticas(self):
+        aciertos = self.aciertos_memoria + self.aciertos_sqlite
+        total = aciertos + self.fallos
+        return {
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_sqlite": self.aciertos_sqlite,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(aciertos / total, 3) if total else 0.0,
+            "entradas_memoria": len(self.memoria),
+        }
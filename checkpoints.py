@@ -0,0 +1,70 @@
+"""Generación vectorizada de checkpoints a lo largo de una polilínea."""
+import numpy as np
+
+# Radio medio de la Tierra (IUGG) en kilómetros
+RADIO_TIERRA_KM = 6371.0088
+
+
+def distancias_tramos(coordinates):
+    """Calcula la longitud en km de cada tramo de una polilínea [lon, lat] con la fórmula de haversine."""
+    puntos = np.asarray(coordinates, dtype=np.float64)
+    if puntos.ndim != 2 or len(puntos) < 2:
+        return np.zeros(0)
+
+    lon = np.radians(puntos[:, 0])
+    lat = np.radians(puntos[:, 1])
+    dlat = lat[1:] - lat[:-1]
+    dlon = lon[1:] - lon[:-1]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def generar_checkpoints(coordinates, intervalo_km=10, velocidad_promedio=60):
+    """Ubica un checkpoint cada `intervalo_km` a lo largo de la ruta y estima su ETA.
+
+    Devuelve una lista de diccionarios con `lat`, `lon`, `kilometro` y `tiempo_estimado`
+    (en horas), en el mismo formato que usan las plantillas.
+    """
+    if intervalo_km <= 0:
+        raise ValueError("El intervalo entre checkpoints debe ser mayor que cero.")
+    if velocidad_promedio <= 0:
+        raise ValueError("La velocidad promedio debe ser mayor que cero.")
+
+    puntos = np.asarray(coordinates, dtype=np.float64)
+    tramos = distancias_tramos(puntos)
+    if tramos.size == 0:
+        return []
+
+    # Distancia acumulada en cada vértice de la polilínea
+    acumulado = np.concatenate(([0.0], np.cumsum(tramos)))
+    total_km = acumulado[-1]
+
+    # Todos los kilómetros donde corresponde un checkpoint
+    kilometros = np.arange(1, int(total_km // intervalo_km) + 1) * float(intervalo_km)
+    if kilometros.size == 0:
+        return []
+
+    # Tramo que contiene cada checkpoint e interpolación lineal dentro de él
+    indices = np.searchsorted(acumulado, kilometros, side="left")
+    indices = np.clip(indices, 1, len(acumulado) - 1)
+    inicio = puntos[indices - 1]
+    fin = puntos[indices]
+    largo = tramos[indices - 1]
+    factor = np.divide(
+        kilometros - acumulado[indices - 1],
+        largo,
+        out=np.zeros_like(kilometros),
+        where=largo > 0,
+    )
+    posiciones = inicio + factor[:, None] * (fin - inicio)
+
+    tiempos = kilometros / velocidad_promedio
+    return [
+        {
+            "lat": float(lat),
+            "lon": float(lon),
+            "kilometro": round(float(km), 1),
+            "tiempo_estimado": round(float(horas), 2),
+        }
+        for (lon, lat), km, horas in zip(posiciones, kilometros, tiempos)
+    ]
@@ -0,0 +1,60 @@
+"""Configuraciones de la aplicación para desarrollo y producción.
+
+La configuración activa se elige con la variable de entorno APP_CONFIG
+("desarrollo" por defecto, o "produccion").
+"""
+import os
+
+from dotenv import load_dotenv
+
+# Las clases leen el entorno al importarse, así que el .env se carga antes
+load_dotenv()
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+class Config:
+    # Firma las cookies de sesión; sin un valor propio cualquiera podría falsificarlas
+    SECRET_KEY = os.getenv("SECRET_KEY")
+    SQLALCHEMY_DATABASE_URI = os.getenv(
+        "DATABASE_URL", f'sqlite:///{os.path.join(BASE_DIR, "database.db")}'
+    )
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Un pool por proceso: cada hilo del worker toma su propia conexión. SQLite espera
+    # hasta `timeout` segundos por el bloqueo de escritura en lugar de fallar de inmediato.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "connect_args": {"timeout": float(os.getenv("SQLITE_BUSY_TIMEOUT", 30))},
+    }
+
+    # Crear las tablas al arrancar si no existen (bases nuevas sin migraciones aplicadas)
+    CREAR_TABLAS = os.getenv("CREAR_TABLAS", "1") == "1"
+
+
+class Desarrollo(Config):
+    DEBUG = True
+    SECRET_KEY = os.getenv("SECRET_KEY", "clave_secreta")
+
+
+class Produccion(Config):
+    DEBUG = False
+    TEMPLATES_AUTO_RELOAD = False
+    SESSION_COOKIE_HTTPONLY = True
+    SESSION_COOKIE_SAMESITE = "Lax"
+
+
+configuraciones = {
+    "desarrollo": Desarrollo,
+    "produccion": Produccion,
+}
+
+
+def obtener_configuracion(nombre=None):
+    """Devuelve la clase de configuración `nombre` o la indicada en APP_CONFIG."""
+    nombre = nombre or os.getenv("APP_CONFIG", "desarrollo")
+    if nombre not in configuraciones:
+        raise ValueError(f"Configuración desconocida '{nombre}'. Opciones: {', '.join(configuraciones)}")
+    return configuraciones[nombre]
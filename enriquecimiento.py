@@ -0,0 +1,90 @@
+"""Clima pronosticado y POIs a lo largo de una ruta, agrupando los checkpoints por celda.
+
+Los checkpoints cercanos caen en la misma celda geohash y comparten una sola consulta de
+pronóstico, hecha en el centro de la celda para que la caché (indexada por la misma celda)
+se reutilice entre rutas distintas. Los POIs salen del índice local, que se consulta para
+cada checkpoint: una celda mide decenas de km y desde su centro se perderían los cercanos.
+"""
+import time
+from concurrent.futures import wait
+from datetime import timedelta
+
+from cache import caja_geohash, geohash
+
+# Separación entre entradas del pronóstico de OpenWeatherMap (cada 3 horas)
+PASO_PRONOSTICO = 3 * 3600
+
+
+def agrupar_por_celda(checkpoints, precision=4):
+    """Devuelve {celda: [índices de checkpoints]} en el orden en que la ruta entra a cada celda."""
+    celdas = {}
+    for i, checkpoint in enumerate(checkpoints):
+        celdas.setdefault(geohash(checkpoint["lat"], checkpoint["lon"], precision), []).append(i)
+    return celdas
+
+
+def centro_celda(celda):
+    """Centro (lat, lon) de una celda geohash."""
+    sur, oeste, norte, este = caja_geohash(celda)
+    return (sur + norte) / 2, (oeste + este) / 2
+
+
+def pronostico_para(pronostico, instante):
+    """Entrada del pronóstico más cercana a `instante` (datetime), o None si queda fuera del horizonte.
+
+    `pronostico` es una lista de entradas con `dt` en segundos desde epoch. Se acepta una
+    distancia de hasta un paso para cubrir las horas antes de la primera entrada y después
+    de la última.
+    """
+    if not pronostico:
+        return None
+    objetivo = instante.timestamp()
+    entrada = min(pronostico, key=lambda e: abs(e["dt"] - objetivo))
+    if abs(entrada["dt"] - objetivo) > PASO_PRONOSTICO:
+        return None
+    return entrada
+
+
+def _resultado(futuro):
+    if not futuro.done() or futuro.exception() is not None:
+        return None
+    return futuro.result()
+
+
+def enriquecer_checkpoints(checkpoints, salida, obtener_pronostico, pois_en_lote, executor,
+                           precision=4, plazo=8):
+    """Agrega a cada checkpoint el pronóstico para su hora estimada de paso y los POIs cercanos.
+
+    - `salida`: datetime de partida; la hora de paso es `salida + tiempo_estimado` horas.
+    - `obtener_pronostico(lat, lon)`: {"pronostico": [...]} o {"error": ...}; se llama una
+      vez por celda en `executor`, cuyo tamaño acota la concurrencia hacia el proveedor.
+    - `pois_en_lote(puntos)`: POIs agrupados por categoría para cada (lat, lon) de la lista;
+      se llama con la posición de cada checkpoint.
+
+    Las celdas que no responden dentro de `plazo` segundos quedan con `clima` None; sus
+    consultas siguen en segundo plano y quedan en caché para la próxima vista.
+    """
+    inicio = time.monotonic()
+    celdas = agrupar_por_celda(checkpoints, precision)
+    centros = {celda: centro_celda(celda) for celda in celdas}
+    futuros = {celda: executor.submit(obtener_pronostico, *centro) for celda, centro in centros.items()}
+
+    # Los POIs salen del índice local mientras los pronósticos se descargan
+    pois = pois_en_lote([(checkpoint["lat"], checkpoint["lon"]) for checkpoint in checkpoints])
+    wait(futuros.values(), timeout=max(0, plazo - (time.monotonic() - inicio)))
+
+    enriquecidos = [None] * len(checkpoints)
+    for celda, indices in celdas.items():
+        respuesta = _resultado(futuros[celda])
+        pronostico = respuesta.get("pronostico") if isinstance(respuesta, dict) else None
+        for i in indices:
+            checkpoint = checkpoints[i]
+            instante = salida + timedelta(hours=checkpoint["tiempo_estimado"])
+            enriquecidos[i] = dict(
+                checkpoint,
+                celda=celda,
+                hora_estimada=instante.isoformat(timespec="minutes"),
+                clima=pronostico_para(pronostico, instante),
+                pois=pois[i],
+            )
+    return enriquecidos
@@ -0,0 +1,294 @@
+"""Backends de enrutamiento intercambiables para `calcular_ruta`.
+
+Todos los backends exponen `direcciones(origen_coords, destino_coords, profile)` y
+devuelven {"coordinates": [[lon, lat], ...], "distancia": metros}, el mismo formato
+que guarda la caché de rutas.
+"""
+import csv
+import heapq
+import math
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from checkpoints import RADIO_TIERRA_KM, distancias_tramos
+
+
+class BackendEnrutamiento(ABC):
+    """Interfaz común de los backends de enrutamiento."""
+
+    nombre = "base"
+
+    @abstractmethod
+    def direcciones(self, origen_coords, destino_coords, profile="driving-car"):
+        """Ruta entre dos puntos [lon, lat] como {"coordinates", "distancia"}."""
+
+
+class BackendORS(BackendEnrutamiento):
+    """Enrutamiento remoto con el cliente de OpenRouteService."""
+
+    nombre = "ors"
+
+    def __init__(self, client):
+        self.client = client
+
+    def direcciones(self, origen_coords, destino_coords, profile="driving-car"):
+        route = self.client.directions(
+            coordinates=[origen_coords, destino_coords],
+            profile=profile,
+            format="geojson"
+        )
+        feature = route["features"][0]
+        return {
+            "coordinates": feature["geometry"]["coordinates"],
+            "distancia": feature["properties"]["segments"][0]["distance"],
+        }
+
+
+class GrafoLocal(BackendEnrutamiento):
+    """Enrutamiento local sobre un grafo vial en arreglos CSR, con búsqueda A*.
+
+    Los nodos se guardan como arreglos de lon/lat y las aristas en formato CSR
+    (`indptr`, `destinos`, `pesos` en metros). La heurística de A* es la distancia
+    haversine al destino, admisible porque los pesos son longitudes geográficas.
+    El grafo solo tiene vías y sentidos de circulación, así que solo atiende el perfil
+    `driving-car`; `nodo_cercano` busca en una grilla de celdas en vez de recorrer todos
+    los nodos.
+    """
+
+    nombre = "local"
+    perfiles = ("driving-car",)
+
+    def __init__(self, lon, lat, origenes, destinos, pesos):
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        orden = np.argsort(origenes, kind="stable")
+        origenes = np.asarray(origenes)[orden]
+        self.destinos = np.asarray(destinos, dtype=np.int64)[orden]
+        self.pesos = np.asarray(pesos, dtype=np.float64)[orden]
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(origenes, minlength=len(self.lon)))))
+
+        # Copias en listas de Python: el bucle de A* es más rápido indexando listas que arreglos
+        self._indptr = self.indptr.tolist()
+        self._destinos = self.destinos.tolist()
+        self._pesos = self.pesos.tolist()
+        self._lat_rad = np.radians(self.lat).tolist()
+        self._lon_rad = np.radians(self.lon).tolist()
+        self._indexar_celdas()
+
+    def _indexar_celdas(self):
+        """Agrupa los nodos en celdas cuadradas de grados, con unos 4 nodos por celda en promedio."""
+        self._lon0, self._lat0 = float(self.lon.min()), float(self.lat.min())
+        ancho = float(self.lon.max()) - self._lon0
+        alto = float(self.lat.max()) - self._lat0
+        self._celda = max(math.sqrt(4 * max(ancho, 1e-9) * max(alto, 1e-9) / len(self.lon)), 1e-6)
+        columnas = ((self.lon - self._lon0) // self._celda).astype(np.int64)
+        filas = ((self.lat - self._lat0) // self._celda).astype(np.int64)
+        self._columnas, self._filas = int(columnas.max()) + 1, int(filas.max()) + 1
+
+        claves = columnas * self._filas + filas
+        orden = np.argsort(claves, kind="stable")
+        unicas, inicios = np.unique(claves[orden], return_index=True)
+        self._celdas = {
+            int(clave): nodos
+            for clave, nodos in zip(unicas, np.split(orden, inicios[1:]))
+        }
+        # Cota inferior de cos(lat) de los nodos, para acotar la distancia de las celdas no visitadas
+        self._cos_minimo = float(np.cos(np.radians(np.abs(self.lat).max())))
+
+    @classmethod
+    def desde_aristas(cls, aristas):
+        """Construye el grafo desde tuplas (lon1, lat1, lon2, lat2, sentido_unico).
+
+        Los nodos se identifican por sus coordenadas redondeadas a 7 decimales.
+        """
+        indices = {}
+        lon, lat, origenes, destinos = [], [], [], []
+
+        def nodo(x, y):
+            clave = (round(x, 7), round(y, 7))
+            if clave not in indices:
+                indices[clave] = len(lon)
+                lon.append(x)
+                lat.append(y)
+            return indices[clave]
+
+        for lon1, lat1, lon2, lat2, sentido_unico in aristas:
+            a, b = nodo(lon1, lat1), nodo(lon2, lat2)
+            origenes.append(a)
+            destinos.append(b)
+            if not sentido_unico:
+                origenes.append(b)
+                destinos.append(a)
+
+        lon_arr, lat_arr = np.asarray(lon), np.asarray(lat)
+        origenes, destinos = np.asarray(origenes, dtype=np.int64), np.asarray(destinos, dtype=np.int64)
+        pesos = _haversine_m(lon_arr[origenes], lat_arr[origenes], lon_arr[destinos], lat_arr[destinos])
+        return cls(lon_arr, lat_arr, origenes, destinos, pesos)
+
+    @classmethod
+    def desde_archivo(cls, ruta):
+        """Carga un grafo desde un extracto OSM en XML (.osm) o una lista de aristas CSV.
+
+        El CSV tiene columnas `lon1,lat1,lon2,lat2` y opcionalmente `sentido_unico`: 1 si solo
+        se circula de (lon1, lat1) a (lon2, lat2) y -1 si solo en sentido contrario, como
+        `oneway=-1` en OSM.
+        """
+        if ruta.endswith(".osm"):
+            return cls.desde_aristas(_aristas_osm(ruta))
+        return cls.desde_aristas(_aristas_csv(ruta))
+
+    def _nodos_en_anillo(self, columna, fila, radio):
+        """Nodos de las celdas a distancia de Chebyshev `radio` de la celda dada, dentro de la grilla."""
+        celdas = self._celdas
+        ultima_columna, ultima_fila = self._columnas - 1, self._filas - 1
+        bloques = []
+
+        def agregar(c, f):
+            nodos = celdas.get(c * self._filas + f)
+            if nodos is not None:
+                bloques.append(nodos)
+
+        if radio == 0:
+            if 0 <= columna <= ultima_columna and 0 <= fila <= ultima_fila:
+                agregar(columna, fila)
+            return bloques
+        desde_c, hasta_c = max(columna - radio, 0), min(columna + radio, ultima_columna)
+        for f in (fila - radio, fila + radio):
+            if 0 <= f <= ultima_fila:
+                for c in range(desde_c, hasta_c + 1):
+                    agregar(c, f)
+        desde_f, hasta_f = max(fila - radio + 1, 0), min(fila + radio - 1, ultima_fila)
+        for c in (columna - radio, columna + radio):
+            if 0 <= c <= ultima_columna:
+                for f in range(desde_f, hasta_f + 1):
+                    agregar(c, f)
+        return bloques
+
+    def nodo_cercano(self, lon, lat):
+        """Índice del nodo más cercano a la coordenada.
+
+        Recorre anillos de celdas alrededor de la coordenada y se detiene cuando ningún nodo
+        fuera de los anillos vistos puede estar más cerca que el mejor encontrado.
+        """
+        columna = math.floor((lon - self._lon0) / self._celda)
+        fila = math.floor((lat - self._lat0) / self._celda)
+        # Primer y último anillo que tocan la grilla
+        radio = max(0, -columna, columna - (self._columnas - 1), -fila, fila - (self._filas - 1))
+        ultimo = max(columna, self._columnas - 1 - columna, fila, self._filas - 1 - fila, radio)
+        factor = math.sqrt(max(math.cos(math.radians(lat)), 0.0) * self._cos_minimo)
+
+        mejor, mejor_m = -1, math.inf
+        for radio in range(radio, ultimo + 1):
+            bloques = self._nodos_en_anillo(columna, fila, radio)
+            if bloques:
+                nodos = np.concatenate(bloques)
+                metros = _haversine_m(self.lon[nodos], self.lat[nodos], lon, lat)
+                i = int(np.argmin(metros))
+                if metros[i] < mejor_m:
+                    mejor, mejor_m = int(nodos[i]), float(metros[i])
+            # Un nodo en un anillo posterior dista más de `radio` celdas en lon o en lat
+            separacion = math.radians(min(radio * self._celda, 180.0))
+            if mejor_m <= 2000 * RADIO_TIERRA_KM * math.asin(min(1.0, factor * math.sin(separacion / 2))):
+                break
+        return mejor
+
+    def _heuristica(self, nodo, lat_destino, lon_destino, cos_destino):
+        lat = self._lat_rad[nodo]
+        a = (math.sin((lat_destino - lat) / 2) ** 2
+             + math.cos(lat) * cos_destino * math.sin((lon_destino - self._lon_rad[nodo]) / 2) ** 2)
+        return 2000 * RADIO_TIERRA_KM * math.asin(math.sqrt(min(1.0, a)))
+
+    def camino_mas_corto(self, origen, destino):
+        """A* entre dos índices de nodo. Devuelve (lista de nodos, metros) o (None, inf)."""
+        lat_destino, lon_destino = self._lat_rad[destino], self._lon_rad[destino]
+        cos_destino = math.cos(lat_destino)
+        indptr, destinos, pesos = self._indptr, self._destinos, self._pesos
+
+        distancias = {origen: 0.0}
+        previos = {origen: -1}
+        cerrados = set()
+        abiertos = [(self._heuristica(origen, lat_destino, lon_destino, cos_destino), origen)]
+        while abiertos:
+            _, nodo = heapq.heappop(abiertos)
+            if nodo == destino:
+                break
+            if nodo in cerrados:
+                continue
+            cerrados.add(nodo)
+            base = distancias[nodo]
+            for i in range(indptr[nodo], indptr[nodo + 1]):
+                vecino = destinos[i]
+                candidata = base + pesos[i]
+                if candidata < distancias.get(vecino, math.inf):
+                    distancias[vecino] = candidata
+                    previos[vecino] = nodo
+                    heapq.heappush(
+                        abiertos,
+                        (candidata + self._heuristica(vecino, lat_destino, lon_destino, cos_destino), vecino)
+                    )
+        else:
+            return None, math.inf
+
+        camino = []
+        nodo = destino
+        while nodo != -1:
+            camino.append(nodo)
+            nodo = previos[nodo]
+        return camino[::-1], distancias[destino]
+
+    def direcciones(self, origen_coords, destino_coords, profile="driving-car"):
+        if profile not in self.perfiles:
+            raise ValueError(f"El grafo local no atiende el perfil '{profile}'; solo {', '.join(self.perfiles)}.")
+        origen = self.nodo_cercano(*origen_coords)
+        destino = self.nodo_cercano(*destino_coords)
+        camino, _ = self.camino_mas_corto(origen, destino)
+        if camino is None:
+            raise ValueError("No existe una ruta entre el origen y el destino en el grafo local.")
+
+        coordinates = [list(origen_coords)] + np.column_stack(
+            (self.lon[camino], self.lat[camino])
+        ).tolist() + [list(destino_coords)]
+        return {
+            "coordinates": coordinates,
+            "distancia": float(distancias_tramos(coordinates).sum() * 1000),
+        }
+
+
+def _haversine_m(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2000 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _aristas_csv(ruta):
+    with open(ruta, newline="", encoding="utf-8") as archivo:
+        for fila in csv.DictReader(archivo):
+            inicio = (float(fila["lon1"]), float(fila["lat1"]))
+            fin = (float(fila["lon2"]), float(fila["lat2"]))
+            sentido = fila.get("sentido_unico", "0")
+            if sentido == "-1":
+                yield (*fin, *inicio, True)
+            else:
+                yield (*inicio, *fin, sentido in ("1", "true", "yes"))
+
+
+def _aristas_osm(ruta):
+    """Extrae las aristas de las vías (`highway`) de un extracto OSM en XML, leyéndolo de forma incremental."""
+    nodos = {}
+    for _, elemento in ET.iterparse(ruta, events=("end",)):
+        if elemento.tag == "node":
+            nodos[elemento.get("id")] = (float(elemento.get("lon")), float(elemento.get("lat")))
+            elemento.clear()
+        elif elemento.tag == "way":
+            etiquetas = {tag.get("k"): tag.get("v") for tag in elemento.iter("tag")}
+            if "highway" in etiquetas:
+                referencias = [nd.get("ref") for nd in elemento.iter("nd") if nd.get("ref") in nodos]
+                sentido_unico = etiquetas.get("oneway") in ("yes", "1", "true", "-1")
+                if etiquetas.get("oneway") == "-1":
+                    # Se circula contra el orden de los nodos de la vía
+                    referencias.reverse()
+                for a, b in zip(referencias, referencias[1:]):
+                    yield (*nodos[a], *nodos[b], sentido_unico)
+            elemento.clear()
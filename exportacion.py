@@ -0,0 +1,98 @@
+"""Exportación de rutas en GeoJSON, GPX y CSV como generadores de texto.
+
+Cada formato consume un iterable de rutas (o de filas de checkpoints) y produce el
+documento por partes, así que la memoria usada no depende de cuántas rutas se exporten.
+"""
+import csv
+import io
+import json
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+
+FORMATOS = {
+    "geojson": ("application/geo+json", "geojson"),
+    "gpx": ("application/gpx+xml", "gpx"),
+    "csv": ("text/csv", "csv"),
+}
+
+COLUMNAS_CSV = (
+    "route_id", "usuario_id", "origen", "destino", "distancia_total", "fecha_creacion",
+    "kilometro", "lat", "lon", "tiempo_estimado",
+)
+
+
+def geojson(rutas):
+    """FeatureCollection con un LineString por ruta.
+
+    Cada ruta es un diccionario con `coordinates` ([lon, lat]) y sus propiedades.
+    """
+    yield '{"type":"FeatureCollection","features":['
+    separador = ""
+    for ruta in rutas:
+        coordinates = ruta.pop("coordinates")
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": coordinates},
+            "properties": ruta,
+        }
+        yield separador + json.dumps(feature, ensure_ascii=False, separators=(",", ":"))
+        separador = ","
+    yield "]}\n"
+
+
+def gpx(rutas):
+    """Documento GPX 1.1 con un track por ruta."""
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="recomendacionruta" xmlns="http://www.topografix.com/GPX/1/1">\n'
+    )
+    for ruta in rutas:
+        partes = [
+            f"<trk><name>{escape(ruta['origen'])} - {escape(ruta['destino'])}</name>",
+            f"<desc>{ruta['distancia_total']} km</desc>",
+            f"<number>{ruta['id']}</number><trkseg>",
+        ]
+        partes.extend(
+            f"<trkpt lat={quoteattr(str(lat))} lon={quoteattr(str(lon))}/>" for lon, lat in ruta["coordinates"]
+        )
+        partes.append("</trkseg></trk>\n")
+        yield "".join(partes)
+    yield "</gpx>\n"
+
+
+def csv_checkpoints(filas):
+    """Una fila por checkpoint con los datos de su ruta (columnas de `COLUMNAS_CSV`)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUMNAS_CSV)
+    for fila in filas:
+        escritor.writerow(fila)
+        if buffer.tell() > 16 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def agrupar(trozos, tamano=64 * 1024):
+    """Junta trozos pequeños en bloques de ~`tamano` bytes para no enviar un chunk por fila."""
+    pendientes, acumulado = [], 0
+    for trozo in trozos:
+        datos = trozo.encode("utf-8")
+        pendientes.append(datos)
+        acumulado += len(datos)
+        if acumulado >= tamano:
+            yield b"".join(pendientes)
+            pendientes, acumulado = [], 0
+    if pendientes:
+        yield b"".join(pendientes)
+
+
+def comprimir_gzip(bloques, nivel=6):
+    """Comprime un flujo de bytes a gzip sobre la marcha."""
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        datos = compresor.compress(bloque)
+        if datos:
+            yield datos
+    yield compresor.flush()
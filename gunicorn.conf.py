@@ -0,0 +1,37 @@
+"""Configuración de gunicorn para producción.
+
+Uso: gunicorn --config gunicorn.conf.py wsgi:app
+Cada parámetro se puede ajustar con variables de entorno sin reconstruir la imagen.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Procesos x hilos: los hilos (gthread) atienden otras solicitudes mientras una espera
+# a un proveedor externo; los procesos aprovechan varios núcleos.
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+# Cargar la app una vez en el proceso maestro y compartir el código entre workers (copy-on-write)
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Reciclar workers de vez en cuando acota el crecimiento de memoria de las cachés en proceso
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """Con preload, las conexiones abiertas en el maestro no deben compartirse entre procesos."""
+    from app import app, db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,334 @@
+"""Importación masiva de recorridos desde archivos GPX y GeoJSON.
+
+Los archivos se leen de forma incremental (iterparse para GPX y un decodificador por
+partes para el arreglo `features` de GeoJSON) y sus recorridos se agrupan en partes de
+unos `puntos_por_parte` puntos. Las partes se preparan (distancia y checkpoints) en un
+pool de procesos con una cantidad acotada en curso y se guardan en el proceso principal
+en lotes, así que la memoria depende del tamaño de las partes y del lote, no del archivo.
+Un archivo de estado opcional registra cuánto de cada archivo quedó confirmado para reanudar.
+"""
+import json
+import os
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from checkpoints import distancias_tramos, generar_checkpoints
+
+EXTENSIONES = {".gpx": "gpx", ".geojson": "geojson", ".json": "geojson"}
+
+
+def _etiqueta(elemento):
+    """Nombre de la etiqueta sin el espacio de nombres (GPX 1.0 y 1.1 usan distintos)."""
+    return elemento.tag.rsplit("}", 1)[-1]
+
+
+def leer_gpx(ruta):
+    """Genera un recorrido {"nombre", "coordinates"} por cada <trk> o <rte> del archivo.
+
+    Los segmentos de un mismo track se concatenan. Cada punto se libera apenas se lee.
+    """
+    coordinates, nombre, en_punto = [], None, False
+    contexto = ET.iterparse(ruta, events=("start", "end"))
+    _, raiz = next(contexto)
+    for evento, elemento in contexto:
+        etiqueta = _etiqueta(elemento)
+        if evento == "start":
+            if etiqueta in ("trk", "rte"):
+                coordinates, nombre = [], None
+            en_punto = en_punto or etiqueta in ("trkpt", "rtept")
+            continue
+        if etiqueta in ("trkpt", "rtept"):
+            coordinates.append([float(elemento.get("lon")), float(elemento.get("lat"))])
+            elemento.clear()
+            en_punto = False
+        elif etiqueta == "name" and nombre is None and not en_punto:
+            nombre = (elemento.text or "").strip() or None
+        elif etiqueta in ("trk", "rte"):
+            yield {"nombre": nombre, "coordinates": coordinates}
+            coordinates, nombre = [], None
+            raiz.clear()
+
+
+def _features_geojson(archivo, tamano_bloque=64 * 1024):
+    """Decodifica uno a uno los elementos del arreglo `features` leyendo el archivo por bloques.
+
+    Si el documento no es una FeatureCollection se decodifica completo y se devuelve tal cual.
+    """
+    decodificador = json.JSONDecoder()
+    buffer = ""
+    while True:
+        inicio = buffer.find('"features"')
+        corchete = buffer.find("[", inicio) if inicio >= 0 else -1
+        if corchete >= 0:
+            buffer = buffer[corchete + 1:]
+            break
+        bloque = archivo.read(tamano_bloque)
+        if not bloque:
+            yield json.loads(buffer)
+            return
+        buffer += bloque
+
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            feature, fin = decodificador.raw_decode(buffer)
+        except json.JSONDecodeError as error:
+            if not _cortado(error, buffer):
+                raise ValueError(f"GeoJSON mal formado: {error}") from None
+            bloque = archivo.read(tamano_bloque)
+            if not bloque:
+                raise ValueError("GeoJSON incompleto: el arreglo 'features' no termina.")
+            buffer += bloque
+            continue
+        yield feature
+        buffer = buffer[fin:]
+
+
+def _cortado(error, buffer):
+    """True si el error se explica porque el buffer termina a mitad de un valor.
+
+    Es así cuando falla justo al final, en un texto sin cerrar o en un token corto
+    (número, literal o escape) que llega hasta el final; cualquier otro error es del JSON.
+    """
+    resto = buffer[error.pos:]
+    return error.msg.startswith("Unterminated string") or (
+        len(resto) < 32 and not any(caracter in resto for caracter in ' \t\r\n,:[]{}"')
+    )
+
+
+def _coordenadas_geometria(geometria):
+    if not geometria:
+        return []
+    if geometria.get("type") == "LineString":
+        return [punto[:2] for punto in geometria["coordinates"]]
+    if geometria.get("type") == "MultiLineString":
+        return [punto[:2] for linea in geometria["coordinates"] for punto in linea]
+    return []
+
+
+def leer_geojson(ruta):
+    """Genera un recorrido por cada Feature con geometría LineString o MultiLineString.
+
+    Las propiedades `origen` y `destino` (como las que escribe la exportación) se conservan.
+    """
+    with open(ruta, encoding="utf-8") as archivo:
+        for feature in _features_geojson(archivo):
+            if feature.get("type") != "Feature":
+                feature = {"type": "Feature", "geometry": feature, "properties": {}}
+            propiedades = feature.get("properties") or {}
+            yield {
+                "nombre": propiedades.get("name") or propiedades.get("nombre"),
+                "origen": propiedades.get("origen"),
+                "destino": propiedades.get("destino"),
+                "coordinates": _coordenadas_geometria(feature.get("geometry")),
+            }
+
+
+def leer_archivo(ruta):
+    """Recorridos de un archivo según su extensión."""
+    formato = EXTENSIONES.get(os.path.splitext(ruta)[1].lower())
+    if formato is None:
+        raise ValueError(f"Extensión no soportada: {ruta}")
+    return leer_gpx(ruta) if formato == "gpx" else leer_geojson(ruta)
+
+
+def listar_archivos(rutas):
+    """Expande directorios (recursivamente) a los archivos importables, en orden estable."""
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for directorio, _, nombres in sorted(os.walk(ruta)):
+                archivos.extend(
+                    os.path.join(directorio, nombre) for nombre in sorted(nombres)
+                    if os.path.splitext(nombre)[1].lower() in EXTENSIONES
+                )
+        else:
+            archivos.append(ruta)
+    return [os.path.abspath(archivo) for archivo in archivos]
+
+
+def _extremo(coordinates, indice):
+    lon, lat = coordinates[indice]
+    return f"{lat:.5f}, {lon:.5f}"
+
+
+def preparar_ruta(recorrido, intervalo_km, velocidad_promedio):
+    """Convierte un recorrido en los argumentos de `agregar_ruta`, o None si tiene menos de 2 puntos."""
+    coordinates = recorrido["coordinates"]
+    if len(coordinates) < 2:
+        return None
+    origen, destino = recorrido.get("origen"), recorrido.get("destino")
+    nombre = recorrido.get("nombre")
+    if not (origen and destino) and nombre and " - " in nombre:
+        origen, destino = nombre.split(" - ", 1)
+    return {
+        "origen": (origen or _extremo(coordinates, 0))[:150],
+        "destino": (destino or _extremo(coordinates, -1))[:150],
+        "distancia_total": round(float(distancias_tramos(coordinates).sum()), 3),
+        "checkpoints": generar_checkpoints(coordinates, intervalo_km, velocidad_promedio),
+        "coordinates": coordinates,
+    }
+
+
+def partes_archivo(ruta, desde=0, puntos_por_parte=100_000):
+    """Agrupa los recorridos de un archivo, a partir del número `desde`, en partes de ~`puntos_por_parte` puntos.
+
+    Genera (recorridos, leidos, ultima): `leidos` es la cantidad de recorridos del archivo
+    hasta el final de la parte. La última parte se genera siempre, aunque quede vacía.
+    """
+    parte, puntos, leidos = [], 0, 0
+    for leidos, recorrido in enumerate(leer_archivo(ruta), start=1):
+        if leidos <= desde:
+            continue
+        parte.append(recorrido)
+        puntos += len(recorrido["coordinates"])
+        if puntos >= puntos_por_parte:
+            yield parte, leidos, False
+            parte, puntos = [], 0
+    yield parte, max(leidos, desde), True
+
+
+def preparar_parte(recorridos, intervalo_km, velocidad_promedio):
+    """Prepara una parte de los recorridos de un archivo. Devuelve (rutas, omitidos)."""
+    rutas, omitidos = [], 0
+    for recorrido in recorridos:
+        preparada = preparar_ruta(recorrido, intervalo_km, velocidad_promedio)
+        if preparada is None:
+            omitidos += 1
+        else:
+            rutas.append(preparada)
+    return rutas, omitidos
+
+
+def _preparar_seguro(recorridos, intervalo_km, velocidad_promedio):
+    """`preparar_parte` que devuelve el error como texto (las excepciones no cruzan bien el pool)."""
+    try:
+        return preparar_parte(recorridos, intervalo_km, velocidad_promedio), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+class EstadoImportacion:
+    """Avance confirmado en la base, persistido en un JSON para reanudar una importación.
+
+    `completados` es {archivo: rutas guardadas}; `parciales` es {archivo: {"recorridos", "rutas"}}
+    para los archivos de los que solo se guardaron los primeros `recorridos`.
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta
+        self.completados, self.parciales = {}, {}
+        if ruta and os.path.exists(ruta):
+            with open(ruta, encoding="utf-8") as archivo:
+                datos = json.load(archivo)
+            self.completados = datos.get("completados", {})
+            self.parciales = datos.get("parciales", {})
+
+    def marcar(self, completados, parciales=None):
+        """Registra el avance de un lote y reescribe el estado de forma atómica."""
+        self.completados.update(completados)
+        for archivo in completados:
+            self.parciales.pop(archivo, None)
+        self.parciales.update(parciales or {})
+        if not self.ruta:
+            return
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump({"completados": self.completados, "parciales": self.parciales}, archivo, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
+
+
+def importar_archivos(archivos, guardar_lote, intervalo_km=10, velocidad_promedio=60,
+                      procesos=1, lote=200, estado=None, reportar=None, puntos_por_parte=100_000):
+    """Importa los archivos y devuelve un resumen {"archivos", "omitidos_por_estado", "rutas", ...}.
+
+    - `guardar_lote(rutas)` guarda una lista de rutas preparadas en una sola transacción.
+      Se llama cada vez que se acumulan `lote` rutas; después se registra en `estado`
+      cuántos recorridos de cada archivo quedaron guardados, así que una importación
+      interrumpida continúa desde el primer recorrido sin confirmar.
+    - `procesos` > 1 prepara las partes en un ProcessPoolExecutor, con a lo sumo
+      2 * `procesos` en curso; los resultados se consumen en orden.
+    - Un archivo con errores se informa en `errores`; lo confirmado antes del error se conserva.
+    - `reportar(mensaje)` recibe el avance después de cada archivo.
+    """
+    reportar = reportar or (lambda mensaje: None)
+    estado = estado or EstadoImportacion()
+    pendientes = [archivo for archivo in archivos if archivo not in estado.completados]
+    resumen = {
+        "archivos": len(archivos),
+        "omitidos_por_estado": len(archivos) - len(pendientes),
+        "rutas": 0,
+        "recorridos_descartados": 0,
+        "errores": {},
+    }
+
+    acumuladas = []
+    avance = {}  # {archivo: (recorridos, rutas, completo)} de lo acumulado sin confirmar
+    rutas_archivo = {archivo: estado.parciales.get(archivo, {}).get("rutas", 0) for archivo in pendientes}
+
+    def confirmar():
+        if avance:
+            guardar_lote(acumuladas)
+            estado.marcar(
+                {archivo: rutas for archivo, (_, rutas, completo) in avance.items() if completo},
+                {archivo: {"recorridos": recorridos, "rutas": rutas}
+                 for archivo, (recorridos, rutas, completo) in avance.items() if not completo},
+            )
+            resumen["rutas"] += len(acumuladas)
+        acumuladas.clear()
+        avance.clear()
+
+    def error_archivo(numero, archivo, error):
+        resumen["errores"][archivo] = error
+        reportar(f"[{numero}/{len(pendientes)}] {os.path.basename(archivo)}: error ({error})")
+
+    en_curso = deque()
+    max_en_curso = 2 * procesos
+    executor = ProcessPoolExecutor(max_workers=procesos) if procesos > 1 and pendientes else None
+
+    def enviar(numero, archivo, recorridos, leidos, ultima):
+        if executor is not None:
+            futuro = executor.submit(_preparar_seguro, recorridos, intervalo_km, velocidad_promedio)
+        else:
+            futuro = Future()
+            futuro.set_result(_preparar_seguro(recorridos, intervalo_km, velocidad_promedio))
+        en_curso.append((numero, archivo, leidos, ultima, futuro))
+
+    def consumir():
+        numero, archivo, leidos, ultima, futuro = en_curso.popleft()
+        preparado, error = futuro.result()
+        if archivo in resumen["errores"]:
+            return
+        if error:
+            error_archivo(numero, archivo, error)
+            return
+        rutas, descartados = preparado
+        resumen["recorridos_descartados"] += descartados
+        acumuladas.extend(rutas)
+        rutas_archivo[archivo] += len(rutas)
+        avance[archivo] = (leidos, rutas_archivo[archivo], ultima)
+        if ultima:
+            reportar(f"[{numero}/{len(pendientes)}] {os.path.basename(archivo)}: {rutas_archivo[archivo]} rutas")
+        if len(acumuladas) >= lote:
+            confirmar()
+
+    try:
+        for numero, archivo in enumerate(pendientes, start=1):
+            desde = estado.parciales.get(archivo, {}).get("recorridos", 0)
+            try:
+                for recorridos, leidos, ultima in partes_archivo(archivo, desde, puntos_por_parte):
+                    while len(en_curso) >= max_en_curso:
+                        consumir()
+                    enviar(numero, archivo, recorridos, leidos, ultima)
+            except Exception as e:
+                error_archivo(numero, archivo, f"{type(e).__name__}: {e}")
+        while en_curso:
+            consumir()
+        confirmar()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return resumen
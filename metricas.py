@@ -0,0 +1,103 @@
+"""Instrumentación liviana: tiempos por etapa, contadores e histogramas en formato Prometheus."""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# Límites (en segundos) de los buckets de los histogramas de duración
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    return "{" + ",".join(f'{clave}="{valor}"' for clave, valor in sorted(etiquetas)) + "}"
+
+
+class Registro:
+    """Contadores, histogramas y medidores calculados al momento de exportar."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._contadores = {}
+        self._histogramas = {}
+        self._colectores = []
+        self._lock = threading.Lock()
+
+    def contar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = {"buckets": [0] * len(self.buckets), "suma": 0.0, "total": 0}
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    histograma["buckets"][i] += 1
+            histograma["suma"] += valor
+            histograma["total"] += 1
+
+    def agregar_colector(self, colector):
+        """Registra una función que devuelve [(nombre, {etiquetas}, valor)] al exportar (medidores)."""
+        self._colectores.append(colector)
+
+    @contextmanager
+    def medir(self, etapa, **etiquetas):
+        """Mide la duración de un bloque y la agrega al histograma y al Server-Timing de la solicitud."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.observar("etapa_duracion_segundos", duracion, etapa=etapa, **etiquetas)
+            if has_request_context():
+                g.setdefault("server_timing", []).append((etapa, duracion))
+
+    def exportar(self):
+        """Devuelve todas las métricas en el formato de texto de Prometheus."""
+        lineas = []
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted((clave, dict(h, buckets=list(h["buckets"]))) for clave, h in self._histogramas.items())
+
+        tipos = set()
+        for (nombre, etiquetas), valor in contadores:
+            if nombre not in tipos:
+                lineas.append(f"# TYPE {nombre} counter")
+                tipos.add(nombre)
+            lineas.append(f"{nombre}{_etiquetas(etiquetas)} {valor}")
+
+        for (nombre, etiquetas), histograma in histogramas:
+            if nombre not in tipos:
+                lineas.append(f"# TYPE {nombre} histogram")
+                tipos.add(nombre)
+            for limite, cantidad in zip(self.buckets, histograma["buckets"]):
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', limite),))} {cantidad}")
+            lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {histograma['total']}")
+            lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {histograma['suma']}")
+            lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {histograma['total']}")
+
+        # Las muestras de un mismo medidor deben quedar contiguas en la salida
+        medidores = sorted(
+            (muestra for colector in self._colectores for muestra in colector()), key=lambda m: m[0]
+        )
+        for nombre, etiquetas, valor in medidores:
+            if nombre not in tipos:
+                lineas.append(f"# TYPE {nombre} gauge")
+                tipos.add(nombre)
+            lineas.append(f"{nombre}{_etiquetas(tuple(sorted(etiquetas.items())))} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+def cabecera_server_timing(tiempos):
+    """Arma el valor de la cabecera Server-Timing a partir de [(etapa, segundos)]."""
+    return ", ".join(f"{etapa};dur={duracion * 1000:.1f}" for etapa, duracion in tiempos)
+
+
+# Registro global del proceso
+registro = Registro()
@@ -97,14 +97,33 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=get_metadata(),
-            **conf_args
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        # La app activa las claves foráneas en cada conexión SQLite; el modo batch recrea
+        # las tablas (DROP TABLE) y fallaría con filas dependientes. SQLite ignora este
+        # PRAGMA dentro de una transacción, así que se cambia antes de empezarla.
+        sqlite = connection.dialect.name == "sqlite"
+        if sqlite:
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.commit()
+
+        try:
+            context.configure(
+                connection=connection,
+                target_metadata=get_metadata(),
+                **conf_args
+            )
+
+            with context.begin_transaction():
+                context.run_migrations()
+
+            if sqlite:
+                violaciones = connection.exec_driver_sql("PRAGMA foreign_key_check").all()
+                if violaciones:
+                    raise RuntimeError(f"Claves foráneas inválidas tras la migración: {violaciones[:10]}")
+        finally:
+            if sqlite:
+                connection.rollback()
+                connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+                connection.commit()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,45 @@
+"""Indices para consultas frecuentes y borrado en cascada de rutas y checkpoints
+
+Revision ID: 7c3e5a9d2b41
+Revises: 496987ff9287
+Create Date: 2026-10-18 10:12:40.318215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e5a9d2b41'
+down_revision = '496987ff9287'
+branch_labels = None
+depends_on = None
+
+# SQLite no nombra las claves foráneas; esta convención permite referirlas en modo batch
+naming_convention = {
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+}
+
+
+def upgrade():
+    with op.batch_alter_table('route', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint('fk_route_user_id_user', type_='foreignkey')
+        batch_op.create_foreign_key('fk_route_user_id_user', 'user', ['user_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_index('ix_route_user_id_fecha_creacion', ['user_id', 'fecha_creacion'], unique=False)
+
+    with op.batch_alter_table('checkpoint', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint('fk_checkpoint_route_id_route', type_='foreignkey')
+        batch_op.create_foreign_key('fk_checkpoint_route_id_route', 'route', ['route_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_index('ix_checkpoint_route_id_kilometro', ['route_id', 'kilometro'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('checkpoint', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_index('ix_checkpoint_route_id_kilometro')
+        batch_op.drop_constraint('fk_checkpoint_route_id_route', type_='foreignkey')
+        batch_op.create_foreign_key('fk_checkpoint_route_id_route', 'route', ['route_id'], ['id'])
+
+    with op.batch_alter_table('route', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_index('ix_route_user_id_fecha_creacion')
+        batch_op.drop_constraint('fk_route_user_id_user', type_='foreignkey')
+        batch_op.create_foreign_key('fk_route_user_id_user', 'user', ['user_id'], ['id'])
@@ -0,0 +1,28 @@
+"""Geometría completa de la ruta como polilínea codificada
+
+Revision ID: a41f8c06e2d7
+Revises: 7c3e5a9d2b41
+Create Date: 2026-10-18 11:47:05.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f8c06e2d7'
+down_revision = '7c3e5a9d2b41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('route', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geometria', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('precision_geometria', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('route', schema=None) as batch_op:
+        batch_op.drop_column('precision_geometria')
+        batch_op.drop_column('geometria')
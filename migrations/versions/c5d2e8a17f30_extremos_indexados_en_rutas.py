@@ -0,0 +1,42 @@
+"""Extremos geocodificados y celdas geohash de cada ruta para reutilizar rutas similares
+
+Revision ID: c5d2e8a17f30
+Revises: a41f8c06e2d7
+Create Date: 2026-10-18 16:20:41.507239
+
+Las rutas existentes quedan sin indexar; `flask indexar-extremos` las completa a partir
+de su geometría.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8a17f30'
+down_revision = 'a41f8c06e2d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('route', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('origen_lat', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('origen_lon', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('destino_lat', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('destino_lon', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('celda_origen', sa.String(length=12), nullable=True))
+        batch_op.add_column(sa.Column('celda_destino', sa.String(length=12), nullable=True))
+        batch_op.create_index(
+            'ix_route_celdas_extremos', ['celda_origen', 'celda_destino', 'fecha_creacion'], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('route', schema=None) as batch_op:
+        batch_op.drop_index('ix_route_celdas_extremos')
+        batch_op.drop_column('celda_destino')
+        batch_op.drop_column('celda_origen')
+        batch_op.drop_column('destino_lon')
+        batch_op.drop_column('destino_lat')
+        batch_op.drop_column('origen_lon')
+        batch_op.drop_column('origen_lat')
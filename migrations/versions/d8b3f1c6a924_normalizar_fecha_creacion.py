@@ -0,0 +1,31 @@
+"""Formato uniforme de fecha_creacion en rutas
+
+Revision ID: d8b3f1c6a924
+Revises: c5d2e8a17f30
+Create Date: 2026-10-18 18:05:12.734610
+
+Las rutas creadas con CURRENT_TIMESTAMP guardan 'YYYY-MM-DD HH:MM:SS', pero SQLAlchemy
+compara contra 'YYYY-MM-DD HH:MM:SS.ffffff'; como SQLite compara el texto, el cursor de
+mis_rutas trataba como anteriores las rutas del mismo segundo. Se completan los
+microsegundos para que todas las fechas tengan el formato que escribe la app.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8b3f1c6a924'
+down_revision = 'c5d2e8a17f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "UPDATE route SET fecha_creacion = fecha_creacion || '.000000' "
+        "WHERE length(fecha_creacion) = 19"
+    )
+
+
+def downgrade():
+    # El formato con microsegundos también es válido para el esquema anterior
+    pass
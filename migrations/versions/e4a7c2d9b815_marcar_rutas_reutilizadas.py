@@ -0,0 +1,31 @@
+"""Marca de las rutas cuya geometría se reutilizó de otra ruta guardada
+
+Revision ID: e4a7c2d9b815
+Revises: d8b3f1c6a924
+Create Date: 2026-10-18 21:10:37.118402
+
+Las rutas reutilizadas no se indexan para `buscar_ruta_similar`: de lo contrario cada
+reutilización podía servir de base a la siguiente y los extremos se alejaban sin límite
+de la geometría. Las rutas existentes quedan marcadas como no reutilizadas.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c2d9b815'
+down_revision = 'd8b3f1c6a924'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('route', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('geometria_reutilizada', sa.Boolean(), nullable=False, server_default=sa.false())
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('route', schema=None) as batch_op:
+        batch_op.drop_column('geometria_reutilizada')
@@ -0,0 +1,207 @@
+"""Almacén local de puntos de interés con índice espacial R-tree en SQLite.
+
+Los POIs se descargan por celdas geohash ("tiles") y categoría, se guardan junto a un
+índice R-tree y se consultan localmente con una búsqueda de los k más cercanos. Las
+celdas vencidas se refrescan en segundo plano.
+"""
+import math
+import sqlite3
+import threading
+import time
+from concurrent.futures import wait
+from contextlib import contextmanager
+
+from cache import caja_geohash, celdas_cercanas
+
+KM_POR_GRADO = 111.32
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distancia haversine en km entre dos puntos."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(min(1.0, a)))
+
+
+class AlmacenPOIs:
+    """POIs persistidos por celda geohash y categoría, consultables por cercanía.
+
+    `descargar(categoria, caja)` recibe la caja (sur, oeste, norte, este) de una celda y
+    devuelve una lista de POIs con `nombre`, `lat` y `lon`. Las descargas corren en
+    `executor`, que conviene que sea propio: cada una espera el límite de tasa del
+    proveedor. Con `max_en_curso` no se encolan más descargas mientras haya esa cantidad
+    pendiente; las celdas omitidas se piden en una consulta posterior.
+    """
+
+    def __init__(self, ruta_db, descargar, executor, precision=3, ttl=7 * 24 * 3600, max_en_curso=None):
+        self.ruta = ruta_db
+        self.descargar = descargar
+        self.executor = executor
+        self.precision = precision
+        self.ttl = ttl
+        self.max_en_curso = max_en_curso
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self._crear_tablas()
+
+    @contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.ruta, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _crear_tablas(self):
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pois ("
+                "id INTEGER PRIMARY KEY, tile TEXT NOT NULL, categoria TEXT NOT NULL, "
+                "nombre TEXT NOT NULL, lat REAL NOT NULL, lon REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_pois_tile_categoria ON pois (tile, categoria)")
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS pois_rtree USING rtree("
+                "id, min_lat, max_lat, min_lon, max_lon)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pois_tiles ("
+                "tile TEXT NOT NULL, categoria TEXT NOT NULL, actualizado REAL NOT NULL, "
+                "PRIMARY KEY (tile, categoria))"
+            )
+
+    def limpiar(self):
+        """Descarta todos los POIs y celdas guardados (las descargas en curso no se cancelan)."""
+        with self._conectar() as conn:
+            conn.execute("DELETE FROM pois_rtree")
+            conn.execute("DELETE FROM pois")
+            conn.execute("DELETE FROM pois_tiles")
+
+    def tiles_cercanos(self, lat, lon, radio_km):
+        """Celdas geohash que cubren el radio alrededor del punto, sea el radio menor o mayor que una celda."""
+        return set(celdas_cercanas(lat, lon, radio_km, self.precision))
+
+    def refrescar(self, tile, categoria):
+        """Descarga los POIs de una celda y categoría y reemplaza los guardados."""
+        pois = self.descargar(categoria, caja_geohash(tile))
+        with self._conectar() as conn:
+            conn.execute(
+                "DELETE FROM pois_rtree WHERE id IN (SELECT id FROM pois WHERE tile = ? AND categoria = ?)",
+                (tile, categoria),
+            )
+            conn.execute("DELETE FROM pois WHERE tile = ? AND categoria = ?", (tile, categoria))
+            for poi in pois:
+                cursor = conn.execute(
+                    "INSERT INTO pois (tile, categoria, nombre, lat, lon) VALUES (?, ?, ?, ?, ?)",
+                    (tile, categoria, poi["nombre"], poi["lat"], poi["lon"]),
+                )
+                conn.execute(
+                    "INSERT INTO pois_rtree (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+                    (cursor.lastrowid, poi["lat"], poi["lat"], poi["lon"], poi["lon"]),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO pois_tiles (tile, categoria, actualizado) VALUES (?, ?, ?)",
+                (tile, categoria, time.time()),
+            )
+        return len(pois)
+
+    def _programar(self, tile, categoria, nuevo=True):
+        """Devuelve el refresco en curso de una celda o, si `nuevo`, lo encola.
+
+        Devuelve (futuro, encolado); el futuro es None si no hay refresco en curso y no se
+        encoló uno (por `nuevo` falso o por haber `max_en_curso` pendientes).
+        """
+        clave = (tile, categoria)
+        with self._lock:
+            futuro = self._en_curso.get(clave)
+            if futuro is not None:
+                return futuro, False
+            if not nuevo or (self.max_en_curso is not None and len(self._en_curso) >= self.max_en_curso):
+                return None, False
+            futuro = self.executor.submit(self.refrescar, tile, categoria)
+            self._en_curso[clave] = futuro
+            futuro.add_done_callback(lambda _: self._terminar(clave))
+            return futuro, True
+
+    def _terminar(self, clave):
+        with self._lock:
+            self._en_curso.pop(clave, None)
+
+    def _asegurar_tiles(self, tiles, categorias, espera, max_descargas=None):
+        """Descarga las celdas que faltan (esperando hasta `espera` s) y refresca en segundo plano las vencidas.
+
+        Se encolan como mucho `max_descargas` descargas nuevas, primero las de celdas que faltan.
+        """
+        marcas = ",".join("?" * len(tiles))
+        with self._conectar() as conn:
+            actualizados = {
+                (tile, categoria): actualizado
+                for tile, categoria, actualizado in conn.execute(
+                    f"SELECT tile, categoria, actualizado FROM pois_tiles WHERE tile IN ({marcas})",
+                    tuple(tiles),
+                )
+            }
+
+        limite = time.time() - self.ttl
+        pares = [(tile, categoria) for tile in sorted(tiles) for categoria in categorias]
+        faltantes = [par for par in pares if par not in actualizados]
+        vencidos = [par for par in pares if par in actualizados and actualizados[par] < limite]
+
+        disponibles = len(faltantes) + len(vencidos) if max_descargas is None else max_descargas
+        esperar = []
+        for indice, (tile, categoria) in enumerate(faltantes + vencidos):
+            futuro, encolado = self._programar(tile, categoria, nuevo=disponibles > 0)
+            if encolado:
+                disponibles -= 1
+            if futuro is not None and indice < len(faltantes):
+                esperar.append(futuro)
+        if esperar:
+            wait(esperar, timeout=espera)
+
+    def cercanos_por_categorias(self, lat, lon, categorias, radio_km=50, k=10, espera=5, max_descargas=None):
+        """Devuelve los `k` POIs más cercanos de cada categoría dentro de `radio_km`, agrupados por categoría."""
+        self._asegurar_tiles(self.tiles_cercanos(lat, lon, radio_km), categorias, espera, max_descargas)
+        return self._cercanos(lat, lon, categorias, radio_km, k)
+
+    def cercanos_en_lote(self, puntos, categorias, radio_km=10, k=3, espera=5, max_descargas=None):
+        """Como `cercanos_por_categorias` para una lista de puntos (lat, lon).
+
+        Las celdas de todos los puntos se revisan y descargan de una sola vez, de modo que
+        una celda compartida por varios puntos se pide una única vez; una ruta larga encola
+        como mucho `max_descargas` descargas por llamada.
+        """
+        tiles = set()
+        for lat, lon in puntos:
+            tiles |= self.tiles_cercanos(lat, lon, radio_km)
+        if tiles:
+            self._asegurar_tiles(tiles, categorias, espera, max_descargas)
+        return [self._cercanos(lat, lon, categorias, radio_km, k) for lat, lon in puntos]
+
+    def _cercanos(self, lat, lon, categorias, radio_km, k):
+        dlat = radio_km / KM_POR_GRADO
+        dlon = radio_km / (KM_POR_GRADO * max(math.cos(math.radians(lat)), 0.01))
+        marcas = ",".join("?" * len(categorias))
+        with self._conectar() as conn:
+            filas = conn.execute(
+                "SELECT p.categoria, p.nombre, p.lat, p.lon FROM pois_rtree r JOIN pois p ON p.id = r.id "
+                "WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ? "
+                f"AND p.categoria IN ({marcas})",
+                (lat - dlat, lat + dlat, lon - dlon, lon + dlon, *categorias),
+            ).fetchall()
+
+        pois_por_categoria = {categoria: [] for categoria in categorias}
+        for categoria, nombre, poi_lat, poi_lon in filas:
+            distancia = distancia_km(lat, lon, poi_lat, poi_lon)
+            if distancia <= radio_km:
+                pois_por_categoria[categoria].append({
+                    "nombre": nombre,
+                    "lat": poi_lat,
+                    "lon": poi_lon,
+                    "distancia_km": round(distancia, 2)
+                })
+        return {
+            categoria: sorted(pois, key=lambda poi: poi["distancia_km"])[:k]
+            for categoria, pois in pois_por_categoria.items()
+        }
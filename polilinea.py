@@ -0,0 +1,121 @@
+"""Codificación compacta de geometrías de ruta con el formato de polilínea de Google.
+
+Las coordenadas se manejan como [lon, lat] (igual que GeoJSON y OpenRouteService);
+el texto codificado guarda los pares en orden (lat, lon) como el formato original.
+"""
+import numpy as np
+
+
+def codificar(coordinates, precision=5):
+    """Codifica una lista de [lon, lat] como polilínea; `precision` es el número de decimales."""
+    puntos = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if len(puntos) == 0:
+        return ""
+
+    enteros = np.round(puntos[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(enteros, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    valores = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    caracteres = []
+    for valor in valores.tolist():
+        while valor >= 0x20:
+            caracteres.append(chr((0x20 | (valor & 0x1F)) + 63))
+            valor >>= 5
+        caracteres.append(chr(valor + 63))
+    return "".join(caracteres)
+
+
+def decodificar(texto, precision=5):
+    """Decodifica una polilínea y devuelve una lista de [lon, lat]."""
+    valores = []
+    valor = desplazamiento = 0
+    for caracter in texto:
+        byte = ord(caracter) - 63
+        valor |= (byte & 0x1F) << desplazamiento
+        desplazamiento += 5
+        if byte < 0x20:
+            valores.append(~(valor >> 1) if valor & 1 else valor >> 1)
+            valor = desplazamiento = 0
+
+    if not valores:
+        return []
+    puntos = np.cumsum(np.asarray(valores, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return puntos[:, ::-1].tolist()
+
+
+def tolerancia_zoom(zoom, pixeles=1.0):
+    """Tolerancia en grados equivalente a `pixeles` de pantalla en un nivel de zoom de Leaflet/OSM."""
+    return pixeles * 360.0 / (256 * 2 ** zoom)
+
+
+def zoom_para_caja(coordinates, ancho_px=800, zoom_maximo=18):
+    """Nivel de zoom aproximado con el que la ruta completa cabe en un mapa de `ancho_px`."""
+    puntos = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if len(puntos) < 2:
+        return zoom_maximo
+    extension = max(float(np.ptp(puntos[:, 0])), float(np.ptp(puntos[:, 1])), 1e-9)
+    return int(np.clip(np.floor(np.log2(360.0 * ancho_px / (256 * extension))), 0, zoom_maximo))
+
+
+def simplificar(coordinates, tolerancia):
+    """Simplifica una polilínea [lon, lat] con Douglas-Peucker; `tolerancia` está en grados.
+
+    Las distancias de los puntos a cada segmento se calculan de forma vectorizada y la
+    longitud se escala por el coseno de la latitud media para no sobresimplificar en
+    latitudes altas.
+    """
+    puntos = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    n = len(puntos)
+    if n < 3 or tolerancia <= 0:
+        return puntos.tolist()
+
+    plano = puntos.copy()
+    plano[:, 0] *= np.cos(np.radians(puntos[:, 1].mean()))
+
+    conservar = np.zeros(n, dtype=bool)
+    conservar[[0, -1]] = True
+    pila = [(0, n - 1)]
+    while pila:
+        inicio, fin = pila.pop()
+        if fin - inicio < 2:
+            continue
+        a = plano[inicio]
+        dx, dy = plano[fin] - a
+        intermedios = plano[inicio + 1:fin] - a
+        largo2 = dx * dx + dy * dy
+        # Distancia al segmento, no a la recta: los puntos que se proyectan fuera del tramo
+        # (idas y vueltas, ramales) se miden hasta el extremo más cercano
+        t = 0.0
+        if largo2 > 0:
+            t = np.clip((intermedios[:, 0] * dx + intermedios[:, 1] * dy) / largo2, 0.0, 1.0)
+        distancias = np.hypot(intermedios[:, 0] - t * dx, intermedios[:, 1] - t * dy)
+        k = int(np.argmax(distancias))
+        if distancias[k] > tolerancia:
+            medio = inicio + 1 + k
+            conservar[medio] = True
+            pila.append((inicio, medio))
+            pila.append((medio, fin))
+    return puntos[conservar].tolist()
+
+
+def recortar_caja(coordinates, caja):
+    """Recorta la polilínea a la caja (oeste, sur, este, norte) y devuelve los tramos visibles.
+
+    Cada tramo incluye el punto anterior y el posterior a la caja para que las líneas que
+    entran o salen de la vista se sigan dibujando.
+    """
+    puntos = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    oeste, sur, este, norte = caja
+    dentro = (
+        (puntos[:, 0] >= oeste) & (puntos[:, 0] <= este)
+        & (puntos[:, 1] >= sur) & (puntos[:, 1] <= norte)
+    )
+    visibles = dentro.copy()
+    visibles[1:] |= dentro[:-1]
+    visibles[:-1] |= dentro[1:]
+
+    indices = np.flatnonzero(visibles)
+    if len(indices) == 0:
+        return []
+    cortes = np.flatnonzero(np.diff(indices) > 1) + 1
+    return [puntos[grupo].tolist() for grupo in np.split(indices, cortes)]
@@ -0,0 +1,208 @@
+"""Sesiones HTTP compartidas para los proveedores externos (ORS, OpenWeatherMap, Nominatim).
+
+Cada proveedor tiene una `requests.Session` con conexiones keep-alive reutilizables,
+un limitador de tasa tipo token bucket, reintentos con backoff exponencial y jitter
+ante respuestas 429/5xx y un circuit breaker que corta las llamadas cuando el
+proveedor falla de forma sostenida. Ni la espera por un token ni las esperas entre
+reintentos superan el plazo total de la solicitud: si `Retry-After` pide más, se
+devuelve la respuesta de inmediato, y si el token no llega a tiempo se lanza `PlazoAgotado`.
+"""
+import random
+import threading
+import time
+
+import openrouteservice
+import requests
+from requests.adapters import HTTPAdapter
+
+from metricas import registro
+
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class CircuitoAbierto(requests.exceptions.RequestException):
+    """Se lanza cuando el circuit breaker de un proveedor está abierto."""
+
+
+class PlazoAgotado(requests.exceptions.Timeout):
+    """Se lanza cuando el limitador de tasa no entrega un token antes del plazo de la solicitud."""
+
+
+class TokenBucket:
+    """Limitador de tasa: `tasa` solicitudes por segundo con ráfagas de hasta `capacidad`.
+
+    El límite es por proceso; con varios workers la tasa efectiva se multiplica.
+    """
+
+    def __init__(self, tasa, capacidad=1):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._tokens = capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self, limite=None):
+        """Bloquea hasta que haya un token disponible y devuelve True.
+
+        Con `limite` (un instante de `time.monotonic()`) devuelve False sin esperar si el
+        próximo token no llega antes de ese instante.
+        """
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                espera = (1 - self._tokens) / self.tasa
+            if limite is not None and ahora + espera > limite:
+                return False
+            time.sleep(espera)
+
+
+class CircuitBreaker:
+    """Abre el circuito tras `umbral` fallos consecutivos y lo vuelve a probar pasado `reapertura` segundos.
+
+    En estado semiabierto deja pasar una sola llamada de prueba y rechaza las demás hasta
+    que esa termine; si la prueba no informa su resultado en `reapertura` segundos se
+    permite otra.
+    """
+
+    def __init__(self, umbral=5, reapertura=30):
+        self.umbral = umbral
+        self.reapertura = reapertura
+        self.fallos = 0
+        self._abierto_desde = None
+        self._prueba_desde = None
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        if self._abierto_desde is None:
+            return "cerrado"
+        if time.monotonic() - self._abierto_desde >= self.reapertura:
+            return "semiabierto"
+        return "abierto"
+
+    def permitir(self):
+        with self._lock:
+            estado = self.estado
+            if estado != "semiabierto":
+                return estado == "cerrado"
+            ahora = time.monotonic()
+            if self._prueba_desde is not None and ahora - self._prueba_desde < self.reapertura:
+                return False
+            self._prueba_desde = ahora
+            return True
+
+    def liberar_prueba(self):
+        """Libera la llamada de prueba cuando terminó sin llegar al proveedor."""
+        with self._lock:
+            self._prueba_desde = None
+
+    def registrar_exito(self):
+        with self._lock:
+            self.fallos = 0
+            self._abierto_desde = None
+            self._prueba_desde = None
+
+    def registrar_fallo(self):
+        with self._lock:
+            self.fallos += 1
+            if self.fallos >= self.umbral:
+                self._abierto_desde = time.monotonic()
+            self._prueba_desde = None
+
+
+class SesionProveedor(requests.Session):
+    """`requests.Session` con limitador de tasa, reintentos con jitter y circuit breaker.
+
+    `plazo` (por defecto `timeout`) acota el tiempo total de una solicitud con sus
+    reintentos: una espera que no cabe en lo que queda no se hace.
+    """
+
+    def __init__(self, nombre, tasa=10, capacidad=10, reintentos=3, backoff=0.5,
+                 timeout=10, tamano_pool=10, umbral_fallos=5, reapertura=30, headers=None, plazo=None):
+        super().__init__()
+        self.nombre = nombre
+        self.limitador = TokenBucket(tasa, capacidad)
+        self.breaker = CircuitBreaker(umbral_fallos, reapertura)
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.timeout = timeout
+        self.plazo = timeout if plazo is None else plazo
+        adaptador = HTTPAdapter(pool_connections=tamano_pool, pool_maxsize=tamano_pool, max_retries=0)
+        self.mount("http://", adaptador)
+        self.mount("https://", adaptador)
+        if headers:
+            self.headers.update(headers)
+
+    def _espera(self, intento, response=None):
+        """Backoff exponencial con jitter completo, respetando `Retry-After` si viene."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return float(retry_after)
+        return random.uniform(0, self.backoff * (2 ** intento))
+
+    def _hay_plazo(self, espera, limite):
+        """True si cabe una espera de `espera` segundos antes de `limite`; si no, la registra como agotada."""
+        if time.monotonic() + espera <= limite:
+            return True
+        registro.contar("proveedor_errores_total", proveedor=self.nombre, tipo="plazo_agotado")
+        return False
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        limite = time.monotonic() + self.plazo
+        for intento in range(self.reintentos + 1):
+            if not self.breaker.permitir():
+                registro.contar("proveedor_errores_total", proveedor=self.nombre, tipo="circuito_abierto")
+                raise CircuitoAbierto(f"Circuito abierto para {self.nombre}")
+
+            if not self.limitador.adquirir(limite):
+                self.breaker.liberar_prueba()
+                registro.contar("proveedor_errores_total", proveedor=self.nombre, tipo="plazo_agotado")
+                raise PlazoAgotado(f"Sin cupo de tasa para {self.nombre} antes del plazo de la solicitud")
+            ultimo = intento == self.reintentos
+            registro.contar("proveedor_solicitudes_total", proveedor=self.nombre)
+            inicio = time.perf_counter()
+            try:
+                response = super().request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                registro.contar("proveedor_errores_total", proveedor=self.nombre, tipo=type(e).__name__)
+                self.breaker.registrar_fallo()
+                espera = self._espera(intento)
+                if ultimo or not self._hay_plazo(espera, limite):
+                    raise
+                time.sleep(espera)
+                continue
+            finally:
+                registro.observar("proveedor_duracion_segundos", time.perf_counter() - inicio, proveedor=self.nombre)
+
+            if response.status_code not in ESTADOS_REINTENTABLES:
+                self.breaker.registrar_exito()
+                return response
+
+            registro.contar("proveedor_errores_total", proveedor=self.nombre, tipo=str(response.status_code))
+            self.breaker.registrar_fallo()
+            espera = self._espera(intento, response)
+            if ultimo or not self._hay_plazo(espera, limite):
+                return response
+            time.sleep(espera)
+
+    def estadisticas(self):
+        return {"circuito": self.breaker.estado, "fallos_consecutivos": self.breaker.fallos}
+
+
+class ClienteORS(openrouteservice.Client):
+    """Cliente de OpenRouteService que envía sus solicitudes por una `SesionProveedor`.
+
+    Los reintentos propios del cliente quedan desactivados: de eso se encarga la sesión.
+    """
+
+    def __init__(self, sesion, **kwargs):
+        kwargs.setdefault("timeout", sesion.timeout)
+        super().__init__(retry_over_query_limit=False, **kwargs)
+        self._session = sesion
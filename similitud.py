@@ -0,0 +1,31 @@
+"""Búsqueda de rutas guardadas con origen y destino cercanos a los de una solicitud nueva.
+
+Cada ruta guarda la celda geohash de sus extremos; una solicitud busca en las celdas
+que cubren un radio de `tolerancia` alrededor de cada extremo (`cache.celdas_cercanas`)
+y luego filtra por la distancia real, así que la consulta a la base se resuelve con el
+índice de celdas.
+"""
+from checkpoints import distancias_tramos
+
+
+def distancia_km(a, b):
+    """Distancia en km entre dos puntos [lon, lat]."""
+    return float(distancias_tramos([a, b])[0])
+
+
+def elegir_similar(candidatas, origen, destino, tolerancia_km):
+    """La candidata cuyos extremos quedan más cerca de `origen` y `destino`, o None.
+
+    `candidatas` son filas con `origen_lon`, `origen_lat`, `destino_lon` y `destino_lat`;
+    se descartan las que tengan algún extremo a más de `tolerancia_km`. A igual distancia
+    gana la primera, así que conviene pasarlas de la más reciente a la más antigua.
+    """
+    mejor, mejor_desvio = None, None
+    for candidata in candidatas:
+        desvio = max(
+            distancia_km(origen, [candidata.origen_lon, candidata.origen_lat]),
+            distancia_km(destino, [candidata.destino_lon, candidata.destino_lat]),
+        )
+        if desvio <= tolerancia_km and (mejor_desvio is None or desvio < mejor_desvio):
+            mejor, mejor_desvio = candidata, desvio
+    return mejor
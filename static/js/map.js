@@ -13,6 +13,22 @@ document.addEventListener('DOMContentLoaded', () => {
 
         const polyline = L.polyline(coordinates.map(coord => [coord[1], coord[0]]), { color: 'blue', weight: 4 }).addTo(map);
 
+        // Pedir al servidor la geometría con el nivel de detalle del zoom y la vista actuales
+        if (window.routeId) {
+            map.on('moveend', () => {
+                const vista = map.getBounds().pad(0.5);
+                const bbox = [vista.getWest(), vista.getSouth(), vista.getEast(), vista.getNorth()].join(',');
+                fetch(`/api/rutas/${window.routeId}/geometria?zoom=${map.getZoom()}&bbox=${bbox}`)
+                    .then(response => response.ok ? response.json() : null)
+                    .then(data => {
+                        if (data && data.segmentos) {
+                            polyline.setLatLngs(data.segmentos.map(tramo => tramo.map(coord => [coord[1], coord[0]])));
+                        }
+                    })
+                    .catch(error => console.error("Error al obtener la geometría de la ruta:", error));
+            });
+        }
+
         const climaOrigen = window.climaOrigen;
         if (climaOrigen && !climaOrigen.error) {
             const origenMarker = L.marker([coordinates[0][1], coordinates[0][0]]).addTo(map);
@@ -24,19 +40,8 @@ document.addEventListener('DOMContentLoaded', () => {
             `);
         }
 
-        const climaDestino = window.climaDestino;
-        if (climaDestino && !climaDestino.error) {
-            const destinoMarker = L.marker([coordinates[coordinates.length - 1][1], coordinates[coordinates.length - 1][0]]).addTo(map);
-            destinoMarker.bindPopup(`
-                <strong>Clima en el Destino</strong><br>
-                Temperatura: ${climaDestino.temperatura}°C<br>
-                Descripción: ${climaDestino.descripcion}<br>
-                <img src="http://openweathermap.org/img/wn/${climaDestino.icono}@2x.png" alt="Icono del clima">
-            `);
-        }
-
         // Agregar POIs en el origen
-        const poisOrigen = window.poisOrigen;
+        const poisOrigen = window.poisOrigen || [];
         poisOrigen.forEach(poi => {
             const poiMarker = L.marker([poi.lat, poi.lon]).addTo(map);
             poiMarker.bindPopup(`
@@ -45,17 +50,43 @@ document.addEventListener('DOMContentLoaded', () => {
             `);
         });
 
-        // Agregar POIs en el destino
-        const poisDestino = window.poisDestino;
-        poisDestino.forEach(poi => {
-            const poiMarker = L.marker([poi.lat, poi.lon]).addTo(map);
-            poiMarker.bindPopup(`
-                <strong>${poi.nombre}</strong><br>
-                Categoría: Restaurante
-            `);
-        });
+        // Clima y POIs del destino: se piden aparte porque cambian y la página de la ruta queda en caché
+        const mostrarDestino = (climaDestino, poisDestino) => {
+            if (climaDestino && !climaDestino.error) {
+                const destinoMarker = L.marker([coordinates[coordinates.length - 1][1], coordinates[coordinates.length - 1][0]]).addTo(map);
+                destinoMarker.bindPopup(`
+                    <strong>Clima en el Destino</strong><br>
+                    Temperatura: ${climaDestino.temperatura}°C<br>
+                    Descripción: ${climaDestino.descripcion}<br>
+                    <img src="http://openweathermap.org/img/wn/${climaDestino.icono}@2x.png" alt="Icono del clima">
+                `);
+            }
+
+            // POIs agrupados por categoría; una categoría sin respuesta llega vacía
+            Object.entries(poisDestino || {}).forEach(([categoria, pois]) => {
+                pois.forEach(poi => {
+                    const poiMarker = L.marker([poi.lat, poi.lon]).addTo(map);
+                    poiMarker.bindPopup(`
+                        <strong>${poi.nombre}</strong><br>
+                        Categoría: ${categoria}
+                    `);
+                });
+            });
+        };
+
+        if (window.destinoUrl) {
+            fetch(window.destinoUrl)
+                .then(response => response.ok ? response.json() : null)
+                .then(data => {
+                    if (data) {
+                        mostrarDestino(data.clima, data.pois);
+                    }
+                })
+                .catch(error => console.error("Error al obtener el clima y los POIs del destino:", error));
+        }
 
         // Agregar marcadores para los checkpoints
+        const checkpointMarkers = [];
         if (window.routePoints) {
             window.routePoints.forEach(point => {
                 const marker = L.marker([point.lat, point.lon]).addTo(map);
@@ -63,9 +94,39 @@ document.addEventListener('DOMContentLoaded', () => {
                     <strong>Kilómetro:</strong> ${point.kilometro} km<br>
                     <strong>ETA:</strong> ${point.tiempo_estimado} horas
                 `);
+                checkpointMarkers.push(marker);
             });
         }
 
+        // Pronóstico a la hora estimada de paso y POIs cercanos en cada checkpoint
+        if (window.aLoLargoUrl && checkpointMarkers.length > 0) {
+            fetch(window.aLoLargoUrl)
+                .then(response => response.ok ? response.json() : null)
+                .then(data => {
+                    if (!data || !data.checkpoints) {
+                        return;
+                    }
+                    data.checkpoints.forEach((point, i) => {
+                        const marker = checkpointMarkers[i];
+                        if (!marker) {
+                            return;
+                        }
+                        const clima = point.clima
+                            ? `<strong>Pronóstico:</strong> ${point.clima.temperatura}°C, ${point.clima.descripcion}<br>`
+                            : '';
+                        const pois = Object.entries(point.pois || {})
+                            .flatMap(([categoria, lista]) => lista.map(poi => `${poi.nombre} (${categoria}, ${poi.distancia_km} km)`));
+                        marker.setPopupContent(`
+                            <strong>Kilómetro:</strong> ${point.kilometro} km<br>
+                            <strong>ETA:</strong> ${point.tiempo_estimado} horas (${point.hora_estimada})<br>
+                            ${clima}
+                            ${pois.length ? `<strong>Cerca:</strong> ${pois.join(', ')}` : ''}
+                        `);
+                    });
+                })
+                .catch(error => console.error("Error al obtener el clima a lo largo de la ruta:", error));
+        }
+
         const recenterButton = document.createElement('button');
         recenterButton.textContent = 'Centrar Ruta';
         recenterButton.style.position = 'absolute';
@@ -80,7 +141,7 @@ document.addEventListener('DOMContentLoaded', () => {
         recenterButton.style.cursor = 'pointer';
 
         recenterButton.addEventListener('click', () => {
-            map.fitBounds(polyline.getBounds());
+            map.fitBounds(bounds);
         });
 
         document.body.appendChild(recenterButton);
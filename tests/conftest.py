@@ -0,0 +1,45 @@
+"""Fixtures comunes: la app se importa con una base de datos y una caché temporales."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py lee el entorno al importarse, así que se configura antes de la primera importación
+_DIRECTORIO = tempfile.mkdtemp(prefix="pruebas_rutas_")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_DIRECTORIO, 'pruebas.db')}",
+    "CACHE_DB_PATH": os.path.join(_DIRECTORIO, "cache.db"),
+    "ORS_API_KEY": "pruebas",
+    "OWM_API_KEY": "pruebas",
+})
+
+
+@pytest.fixture(scope="session")
+def aplicacion():
+    import app as aplicacion
+
+    with aplicacion.app.app_context():
+        aplicacion.db.create_all()
+    return aplicacion
+
+
+@pytest.fixture
+def usuario(aplicacion, request):
+    """Id de un usuario nuevo para cada prueba."""
+    with aplicacion.app.app_context():
+        user = aplicacion.User(username=f"prueba_{request.node.name}", password="x")
+        aplicacion.db.session.add(user)
+        aplicacion.db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def cliente(aplicacion, usuario):
+    """Cliente de pruebas con la sesión de `usuario` iniciada."""
+    c = aplicacion.app.test_client()
+    with c.session_transaction() as sesion:
+        sesion["_user_id"] = str(usuario)
+    return c
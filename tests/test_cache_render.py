@@ -0,0 +1,36 @@
+from cache import CacheRender
+
+
+def test_invalidacion_de_otro_worker_llega_a_la_memoria(tmp_path):
+    ruta_db = str(tmp_path / "render.db")
+    worker_a, worker_b = CacheRender(ruta_db), CacheRender(ruta_db)
+
+    worker_a.guardar("ver_ruta:1", {"html": "ruta 1"})
+    assert worker_b.obtener("ver_ruta:1") == {"html": "ruta 1"}
+    assert worker_b.obtener("ver_ruta:1") == {"html": "ruta 1"}  # Ya en memoria de b
+
+    worker_a.invalidar("ver_ruta:1")
+    assert worker_b.obtener("ver_ruta:1") is None
+
+    worker_a.guardar("ver_ruta:1", {"html": "ruta 1 nueva"})
+    assert worker_b.obtener("ver_ruta:1") == {"html": "ruta 1 nueva"}
+
+
+def test_eliminar_usuario_invalida_las_caches_de_sus_rutas(aplicacion, usuario):
+    with aplicacion.app.app_context():
+        admin = aplicacion.User(username="admin_cache_render", password="x", is_admin=True)
+        aplicacion.db.session.add(admin)
+        route = aplicacion.agregar_ruta(usuario, "A", "B", 1.0, [], [[-70.6, -33.4], [-70.5, -33.3]])
+        aplicacion.db.session.commit()
+        route_id, admin_id = route.id, admin.id
+        clave_geometria = aplicacion.clave_geometria(route, None)
+        aplicacion.coordenadas_ruta(route)
+        aplicacion.cache_render.guardar(aplicacion.clave_render("ver_ruta", route_id), {"html": "ruta"})
+
+    c = aplicacion.app.test_client()
+    with c.session_transaction() as sesion:
+        sesion["_user_id"] = str(admin_id)
+    assert c.post(f"/admin/delete_user/{usuario}").status_code == 302
+
+    assert aplicacion.cache_render.obtener(aplicacion.clave_render("ver_ruta", route_id)) is None
+    assert aplicacion.geometrias_cache.obtener(clave_geometria) is None
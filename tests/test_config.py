@@ -0,0 +1,23 @@
+import pytest
+
+
+def test_create_app_no_arranca_sin_secret_key(aplicacion, monkeypatch):
+    monkeypatch.setitem(aplicacion.app.config, "SECRET_KEY", None)
+    with pytest.raises(RuntimeError, match="SECRET_KEY"):
+        aplicacion.create_app()
+
+
+def test_solo_desarrollo_tiene_clave_por_defecto(monkeypatch):
+    import importlib
+
+    import config
+
+    monkeypatch.delenv("SECRET_KEY", raising=False)
+    monkeypatch.setattr("dotenv.load_dotenv", lambda *args, **kwargs: False)
+    config = importlib.reload(config)
+    try:
+        assert config.obtener_configuracion("produccion").SECRET_KEY is None
+        assert config.obtener_configuracion("desarrollo").SECRET_KEY == "clave_secreta"
+    finally:
+        monkeypatch.undo()
+        importlib.reload(config)
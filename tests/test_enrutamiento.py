@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from enrutamiento import GrafoLocal, _haversine_m
+
+
+def test_nodo_cercano_coincide_con_la_busqueda_exhaustiva():
+    rng = np.random.default_rng(3)
+    puntos = np.column_stack((rng.uniform(-70.8, -70.5, 400), rng.uniform(-33.6, -33.3, 400)))
+    # Nodos agrupados para que haya celdas vacías entre ellos
+    puntos[:100] = puntos[:100] * 0.01 + np.array([-70.7, -33.5]) * 0.99
+    grafo = GrafoLocal.desde_aristas([(*a, *b, False) for a, b in zip(puntos[::2], puntos[1::2])])
+
+    consultas = np.column_stack((rng.uniform(-71.5, -69.8, 300), rng.uniform(-34.2, -32.7, 300)))
+    for lon, lat in consultas:
+        esperado = _haversine_m(grafo.lon, grafo.lat, lon, lat).min()
+        elegido = grafo.nodo_cercano(lon, lat)
+        assert _haversine_m(grafo.lon[elegido], grafo.lat[elegido], lon, lat) == pytest.approx(esperado)
+
+
+def test_oneway_menos_uno_se_recorre_contra_el_orden_de_la_via(tmp_path):
+    extracto = tmp_path / "extracto.osm"
+    extracto.write_text(
+        """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lon="-70.600" lat="-33.400"/>
+  <node id="2" lon="-70.590" lat="-33.400"/>
+  <node id="3" lon="-70.580" lat="-33.400"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="residential"/><tag k="oneway" v="-1"/></way>
+</osm>
+""",
+        encoding="utf-8",
+    )
+    grafo = GrafoLocal.desde_archivo(str(extracto))
+    primero, ultimo = grafo.nodo_cercano(-70.600, -33.400), grafo.nodo_cercano(-70.580, -33.400)
+
+    camino, _ = grafo.camino_mas_corto(ultimo, primero)
+    assert camino is not None and len(camino) == 3
+    assert grafo.camino_mas_corto(primero, ultimo) == (None, float("inf"))
+
+
+def test_direcciones_rechaza_perfiles_que_el_grafo_no_atiende():
+    grafo = GrafoLocal.desde_aristas([(-70.6, -33.4, -70.59, -33.4, False)])
+    assert grafo.direcciones([-70.6, -33.4], [-70.59, -33.4])["distancia"] > 0
+    with pytest.raises(ValueError, match="foot-walking"):
+        grafo.direcciones([-70.6, -33.4], [-70.59, -33.4], profile="foot-walking")
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+import importacion
+
+
+def escribir_gpx(ruta, tracks, puntos=3):
+    segmentos = "".join(
+        f"<trk><name>Origen {i} - Destino {i}</name><trkseg>"
+        + "".join(f'<trkpt lat="{-33 - i - 0.01 * j}" lon="{-70 - 0.01 * j}"/>' for j in range(puntos))
+        + "</trkseg></trk>"
+        for i in range(tracks)
+    )
+    ruta.write_text(f'<gpx xmlns="http://www.topografix.com/GPX/1/1">{segmentos}</gpx>', encoding="utf-8")
+    return str(ruta)
+
+
+def test_geojson_mal_formado_no_se_lee_hasta_el_final():
+    features = ",".join(['{"type": "Feature" "geometry": null}'] + ['{"type": "Feature"}'] * 1000)
+    archivo = io.StringIO(f'{{"type": "FeatureCollection", "features": [{features}]}}')
+
+    with pytest.raises(ValueError, match="mal formado"):
+        list(importacion._features_geojson(archivo, tamano_bloque=64))
+    assert archivo.tell() < 1000
+
+
+def test_geojson_se_decodifica_con_bloques_que_cortan_los_valores():
+    archivo = io.StringIO(
+        '{"type": "FeatureCollection", "features": ['
+        '{"type": "Feature", "properties": {"name": "A \\u00e9 - B", "x": 1.5e-3, "ok": true}, "geometry": null},'
+        '{"type": "Feature", "properties": {"name": null}, "geometry": null}]}'
+    )
+    features = list(importacion._features_geojson(archivo, tamano_bloque=7))
+    assert [f["properties"].get("name") for f in features] == ["A é - B", None]
+
+
+def test_importacion_interrumpida_continua_dentro_del_archivo(tmp_path):
+    archivo = escribir_gpx(tmp_path / "tracks.gpx", tracks=5)
+    estado_json = str(tmp_path / "estado.json")
+    guardadas, fallar = [], [True]
+
+    def guardar_lote(rutas):
+        if len(guardadas) >= 2 and fallar[0]:
+            raise RuntimeError("base no disponible")
+        guardadas.extend(ruta["origen"] for ruta in rutas)
+
+    with pytest.raises(RuntimeError):
+        importacion.importar_archivos(
+            [archivo], guardar_lote, lote=2, puntos_por_parte=3,
+            estado=importacion.EstadoImportacion(estado_json),
+        )
+    assert importacion.EstadoImportacion(estado_json).parciales[archivo] == {"recorridos": 2, "rutas": 2}
+
+    fallar[0] = False
+    resumen = importacion.importar_archivos(
+        [archivo], guardar_lote, lote=2, puntos_por_parte=3,
+        estado=importacion.EstadoImportacion(estado_json),
+    )
+    assert guardadas == [f"Origen {i}" for i in range(5)]
+    assert resumen["rutas"] == 3
+    estado = importacion.EstadoImportacion(estado_json)
+    assert estado.completados == {archivo: 5} and estado.parciales == {}
+
+
+def test_importacion_con_procesos_acota_las_partes_en_curso(tmp_path, monkeypatch):
+    archivo = escribir_gpx(tmp_path / "tracks.gpx", tracks=12)
+    leidos = []
+    partes = importacion.partes_archivo
+
+    def partes_registradas(*args, **kwargs):
+        for parte in partes(*args, **kwargs):
+            leidos.append((parte[1], len(guardadas)))
+            yield parte
+
+    monkeypatch.setattr(importacion, "partes_archivo", partes_registradas)
+    guardadas = []
+    resumen = importacion.importar_archivos(
+        [archivo], guardadas.extend, procesos=2, lote=1, puntos_por_parte=3
+    )
+    assert resumen["rutas"] == 12 and not resumen["errores"]
+    # Con 2 procesos hay a lo sumo 4 partes en curso más la que se acaba de leer
+    assert max(recorridos - guardados for recorridos, guardados in leidos) == 5
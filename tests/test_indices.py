@@ -0,0 +1,8 @@
+def test_consultas_criticas_usan_indices(aplicacion):
+    with aplicacion.app.app_context():
+        assert aplicacion.verificar_planes_consulta() == {}
+
+
+def test_verificar_indices_cli(aplicacion):
+    resultado = aplicacion.app.test_cli_runner().invoke(args=["verificar-indices"])
+    assert resultado.exit_code == 0, resultado.output
@@ -0,0 +1,34 @@
+import json
+
+
+def test_ruta_que_falla_al_guardarse_no_afecta_al_resto_del_lote(aplicacion, usuario, cliente, monkeypatch):
+    lugares = {"L0": [-71.5, -35.0], "L1": [-71.4, -35.1], "L2": [-71.3, -35.2], "L3": [-71.2, -35.3]}
+    monkeypatch.setattr(aplicacion.geocodificador, "geocodificar", lambda texto: lugares[texto])
+    monkeypatch.setattr(
+        aplicacion.cache_rutas, "direcciones",
+        lambda origen, destino, profile: {"coordinates": [origen, destino], "distancia": 15000.0},
+    )
+    generar = aplicacion.generar_checkpoints
+
+    def generar_checkpoints(coordinates, intervalo_km, velocidad_promedio):
+        puntos = generar(coordinates, intervalo_km, velocidad_promedio)
+        if coordinates[0] == lugares["L1"]:
+            puntos[0]["lat"] = None  # Viola NOT NULL al insertar los checkpoints
+        return puntos
+
+    monkeypatch.setattr(aplicacion, "generar_checkpoints", generar_checkpoints)
+    monkeypatch.setattr(aplicacion, "LOTE_CONCURRENCIA", 1)
+
+    rutas = [{"origen": f"L{i}", "destino": f"L{i + 1}"} for i in range(3)]
+    respuesta = cliente.post("/api/rutas/lote", json={"rutas": rutas})
+    lineas = [json.loads(linea) for linea in respuesta.get_data(as_text=True).splitlines()]
+
+    por_origen = {linea["origen"]: linea for linea in lineas[:-1]}
+    assert "error" in por_origen["L1"]
+    assert "route_id" in por_origen["L0"] and "route_id" in por_origen["L2"]
+    assert lineas[-1]["resumen"] == {"guardadas": 2, "errores": 1, "confirmado": True}
+
+    with aplicacion.app.app_context():
+        guardadas = aplicacion.Route.query.filter_by(user_id=usuario).all()
+        assert sorted(route.origen for route in guardadas) == ["L0", "L2"]
+        assert all(route.checkpoints for route in guardadas)
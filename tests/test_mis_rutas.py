@@ -0,0 +1,77 @@
+import html
+import re
+from datetime import datetime
+
+
+def _recorrer_paginas(cliente, maximo=20):
+    """Ids de ruta de todas las páginas de mis_rutas, siguiendo el enlace "Siguiente página"."""
+    vistos, url = [], "/mis_rutas"
+    for _ in range(maximo):
+        pagina = cliente.get(url).get_data(as_text=True)
+        vistos.extend(int(route_id) for route_id in re.findall(r'/ver_ruta/(\d+)"', pagina))
+        siguiente = re.search(r'href="(/mis_rutas\?antes=[^"]+)"', pagina)
+        if not siguiente:
+            return vistos
+        url = html.unescape(siguiente.group(1))
+    raise AssertionError("La paginación no termina")
+
+
+def test_paginacion_con_rutas_creadas_en_el_mismo_segundo(aplicacion, usuario, cliente, monkeypatch):
+    monkeypatch.setattr(aplicacion, "RUTAS_POR_PAGINA", 2)
+
+    # Varias rutas guardadas seguidas con la fecha por defecto caen en el mismo segundo
+    with aplicacion.app.app_context():
+        ids = [aplicacion.agregar_ruta(usuario, f"Origen {i}", f"Destino {i}", 1.0, []).id for i in range(7)]
+        aplicacion.db.session.commit()
+
+    assert _recorrer_paginas(cliente) == sorted(ids, reverse=True)
+
+
+def test_paginacion_con_fechas_identicas_desempata_por_id(aplicacion, usuario, cliente, monkeypatch):
+    monkeypatch.setattr(aplicacion, "RUTAS_POR_PAGINA", 2)
+    segundos = [datetime(2026, 10, 18, 1, 34, 22)] * 3 + [datetime(2026, 10, 18, 1, 34, 23)] * 4
+
+    with aplicacion.app.app_context():
+        ids = []
+        for i, fecha in enumerate(segundos):
+            route = aplicacion.agregar_ruta(usuario, f"Origen {i}", f"Destino {i}", 1.0, [])
+            route.fecha_creacion = fecha
+            ids.append(route.id)
+        aplicacion.db.session.commit()
+
+    # Más reciente primero y, dentro del mismo segundo, por id descendente; sin repetir ni saltar
+    esperados = [route_id for _, route_id in sorted(zip(segundos, ids), reverse=True)]
+    assert _recorrer_paginas(cliente) == esperados
+
+
+def test_fecha_creacion_por_defecto_incluye_microsegundos(aplicacion, usuario):
+    with aplicacion.app.app_context():
+        route = aplicacion.agregar_ruta(usuario, "A", "B", 1.0, [])
+        aplicacion.db.session.commit()
+        texto = aplicacion.db.session.execute(
+            aplicacion.db.text("SELECT fecha_creacion FROM route WHERE id = :id"), {"id": route.id}
+        ).scalar_one()
+    # Mismo formato que SQLAlchemy usa al comparar, para que el cursor no confunda rutas del mismo segundo
+    assert re.fullmatch(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{6}", texto)
+
+
+def test_mis_rutas_no_carga_checkpoints(aplicacion, usuario, cliente):
+    with aplicacion.app.app_context():
+        checkpoints = [{"lat": -33.4, "lon": -70.6, "kilometro": 0.0, "tiempo_estimado": 0.0}]
+        aplicacion.agregar_ruta(usuario, "A", "B", 1.0, checkpoints, [[-70.6, -33.4], [-70.5, -33.3]])
+        aplicacion.db.session.commit()
+        motor = aplicacion.db.engine
+
+    consultas = []
+
+    def registrar(conn, cursor, sentencia, parametros, contexto, executemany):
+        consultas.append(sentencia.lower())
+
+    aplicacion.db.event.listen(motor, "before_cursor_execute", registrar)
+    try:
+        respuesta = cliente.get("/mis_rutas")
+    finally:
+        aplicacion.db.event.remove(motor, "before_cursor_execute", registrar)
+
+    assert respuesta.status_code == 200
+    assert consultas and not any("checkpoint" in sentencia for sentencia in consultas)
@@ -0,0 +1,82 @@
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from cache import caja_geohash, geohash
+from enriquecimiento import enriquecer_checkpoints
+from pois import AlmacenPOIs
+
+
+def _almacen(tmp_path, descargar, **kwargs):
+    return AlmacenPOIs(str(tmp_path / "pois.db"), descargar, ThreadPoolExecutor(max_workers=2), **kwargs)
+
+
+def test_limita_las_descargas_nuevas_por_solicitud(tmp_path):
+    pedidas = []
+    lock = threading.Lock()
+
+    def descargar(categoria, caja):
+        with lock:
+            pedidas.append((categoria, caja))
+        return []
+
+    almacen = _almacen(tmp_path, descargar)
+    # Una ruta de norte a sur de Chile cruza decenas de celdas de precisión 3
+    puntos = [(-18.5 - i * 0.5, -70.3) for i in range(40)]
+    almacen.cercanos_en_lote(puntos, ["comida"], radio_km=10, espera=5, max_descargas=4)
+    assert len(pedidas) == 4
+
+    # Las siguientes solicitudes completan las celdas que faltan, de a poco
+    almacen.cercanos_en_lote(puntos, ["comida"], radio_km=10, espera=5, max_descargas=4)
+    assert len(pedidas) == 8
+
+
+def test_no_encola_mas_que_max_en_curso(tmp_path):
+    liberar = threading.Event()
+
+    def descargar(categoria, caja):
+        liberar.wait(5)
+        return []
+
+    almacen = _almacen(tmp_path, descargar, max_en_curso=3)
+    puntos = [(-18.5 - i * 0.5, -70.3) for i in range(40)]
+    almacen.cercanos_en_lote(puntos, ["comida"], radio_km=10, espera=0)
+    assert len(almacen._en_curso) == 3
+    liberar.set()
+
+
+def test_pois_a_lo_largo_se_buscan_en_cada_checkpoint(tmp_path):
+    # Un solo POI junto a un checkpoint cerca del borde de su celda de pronóstico
+    almacen = _almacen(tmp_path, lambda categoria, caja: [{"nombre": "Fonda", "lat": -33.5, "lon": -70.5}]
+                       if caja[0] <= -33.5 <= caja[2] and caja[1] <= -70.5 <= caja[3] else [])
+    checkpoints = [
+        {"lat": -33.501, "lon": -70.501, "kilometro": 10.0, "tiempo_estimado": 0.2},
+        {"lat": -33.70, "lon": -70.60, "kilometro": 35.0, "tiempo_estimado": 0.6},
+    ]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        enriquecidos = enriquecer_checkpoints(
+            checkpoints, datetime.now(timezone.utc), lambda lat, lon: {"pronostico": []},
+            lambda puntos: almacen.cercanos_en_lote(puntos, ["comida"], radio_km=10, k=3),
+            executor, precision=4,
+        )
+    assert [poi["nombre"] for poi in enriquecidos[0]["pois"]["comida"]] == ["Fonda"]
+    assert enriquecidos[0]["pois"]["comida"][0]["distancia_km"] < 1
+    assert enriquecidos[1]["pois"]["comida"] == []
+
+
+def test_tiles_cercanos_cubren_radios_mayores_que_una_celda(tmp_path):
+    almacen = _almacen(tmp_path, lambda categoria, caja: [], precision=5)  # Celdas de ~4,9 km
+    lat, lon, radio_km = -33.45, -70.66, 12
+    tiles = almacen.tiles_cercanos(lat, lon, radio_km)
+    for grados in range(0, 360, 10):
+        angulo = math.radians(grados)
+        punto_lat = lat + radio_km * math.sin(angulo) / 111.32
+        punto_lon = lon + radio_km * math.cos(angulo) / (111.32 * math.cos(math.radians(lat)))
+        assert geohash(punto_lat, punto_lon, 5) in tiles
+
+
+def test_tiles_cercanos_no_agrega_celdas_fuera_del_radio(tmp_path):
+    almacen = _almacen(tmp_path, lambda categoria, caja: [], precision=3)  # Celdas de ~156 km
+    sur, oeste, norte, este = caja_geohash("66j")
+    assert almacen.tiles_cercanos((sur + norte) / 2, (oeste + este) / 2, 20) == {"66j"}
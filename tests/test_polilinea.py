@@ -0,0 +1,10 @@
+import polilinea
+
+
+def test_simplificar_conserva_el_extremo_de_una_ida_y_vuelta():
+    # El punto lejano está sobre la recta que une los extremos, pero fuera del segmento
+    assert polilinea.simplificar([[0, 0], [1, 0], [0.1, 0]], 0.01) == [[0, 0], [1, 0], [0.1, 0]]
+
+
+def test_simplificar_descarta_puntos_cercanos_al_segmento():
+    assert polilinea.simplificar([[0, 0], [0.5, 0.001], [1, 0]], 0.01) == [[0, 0], [1, 0]]
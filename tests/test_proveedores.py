@@ -0,0 +1,105 @@
+import json
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from proveedores import CircuitBreaker, ClienteORS, PlazoAgotado, SesionProveedor
+
+
+class AdaptadorFalso(BaseAdapter):
+    """Responde siempre lo mismo y guarda las solicitudes recibidas."""
+
+    def __init__(self, estado, cuerpo=b"", headers=None):
+        super().__init__()
+        self.estado, self.cuerpo, self.headers = estado, cuerpo, headers or {}
+        self.solicitudes = []
+
+    def send(self, request, **kwargs):
+        self.solicitudes.append(request)
+        response = requests.Response()
+        response.status_code = self.estado
+        response._content = self.cuerpo
+        response.headers.update(self.headers)
+        response.request, response.url = request, request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def sesion_con(adaptador, **kwargs):
+    sesion = SesionProveedor("pruebas", tasa=1000, capacidad=1000, **kwargs)
+    sesion.mount("http://proveedor.test", adaptador)
+    return sesion
+
+
+def test_retry_after_mayor_que_el_plazo_no_espera():
+    adaptador = AdaptadorFalso(429, headers={"Retry-After": "120"})
+    sesion = sesion_con(adaptador, timeout=2)
+
+    inicio = time.monotonic()
+    response = sesion.get("http://proveedor.test/recurso")
+
+    assert response.status_code == 429
+    assert len(adaptador.solicitudes) == 1
+    assert time.monotonic() - inicio < 1
+
+
+def test_retry_after_dentro_del_plazo_reintenta():
+    adaptador = AdaptadorFalso(503, headers={"Retry-After": "0"})
+    sesion = sesion_con(adaptador, reintentos=2, timeout=2)
+
+    assert sesion.get("http://proveedor.test/recurso").status_code == 503
+    assert len(adaptador.solicitudes) == 3
+
+
+def test_cliente_ors_usa_la_sesion_del_proveedor():
+    geojson = {"features": [{"geometry": {"coordinates": [[0, 0], [1, 1]]}, "properties": {"summary": {}}}]}
+    adaptador = AdaptadorFalso(200, json.dumps(geojson).encode("utf-8"))
+    cliente = ClienteORS(sesion_con(adaptador), key="pruebas", base_url="http://proveedor.test")
+
+    respuesta = cliente.directions(coordinates=[[0, 0], [1, 1]], profile="driving-car", format="geojson")
+
+    assert respuesta == geojson
+    assert len(adaptador.solicitudes) == 1
+    assert adaptador.solicitudes[0].headers["Authorization"] == "pruebas"
+
+
+def test_limitador_agotado_falla_antes_del_plazo():
+    adaptador = AdaptadorFalso(200)
+    sesion = SesionProveedor("pruebas", tasa=0.1, capacidad=1, timeout=1)  # Un token cada 10 s
+    sesion.mount("http://proveedor.test", adaptador)
+    assert sesion.get("http://proveedor.test/recurso").status_code == 200
+
+    inicio = time.monotonic()
+    with pytest.raises(PlazoAgotado):
+        sesion.get("http://proveedor.test/recurso")
+    assert time.monotonic() - inicio < 0.5
+    assert len(adaptador.solicitudes) == 1
+
+
+def test_circuito_semiabierto_deja_pasar_una_sola_prueba():
+    breaker = CircuitBreaker(umbral=1, reapertura=0.05)
+    breaker.registrar_fallo()
+    assert not breaker.permitir()
+    time.sleep(0.06)
+
+    assert breaker.estado == "semiabierto"
+    assert breaker.permitir()
+    assert not breaker.permitir()  # La prueba sigue en curso
+
+    breaker.registrar_exito()
+    assert breaker.estado == "cerrado"
+    assert breaker.permitir() and breaker.permitir()
+
+
+def test_prueba_fallida_vuelve_a_abrir_el_circuito():
+    breaker = CircuitBreaker(umbral=1, reapertura=0.05)
+    breaker.registrar_fallo()
+    time.sleep(0.06)
+    assert breaker.permitir()
+
+    breaker.registrar_fallo()
+    assert breaker.estado == "abierto" and not breaker.permitir()
@@ -0,0 +1,55 @@
+import pytest
+
+from similitud import distancia_km
+
+
+@pytest.fixture
+def proveedores(aplicacion, monkeypatch):
+    """Geocodificación y direcciones falsas que cuentan las llamadas al backend de rutas."""
+    lugares = {
+        "Plaza A": [-70.60, -33.40],
+        "Plaza A bis": [-70.601, -33.4005],  # ~110 m de "Plaza A"
+        "Plaza B": [-70.40, -33.30],
+    }
+    llamadas = []
+
+    def direcciones(origen, destino, profile):
+        llamadas.append((origen, destino))
+        medio = [(origen[0] + destino[0]) / 2, (origen[1] + destino[1]) / 2 + 0.02]
+        return {"coordinates": [origen, medio, destino], "distancia": 30000.0}
+
+    monkeypatch.setattr(aplicacion.geocodificador, "geocodificar", lambda texto: lugares[texto])
+    monkeypatch.setattr(aplicacion.cache_rutas.backend, "direcciones", direcciones)
+    aplicacion.cache_rutas.limpiar()
+    return llamadas
+
+
+def test_reutiliza_ruta_similar_sin_guardarla_en_la_cache(aplicacion, usuario, proveedores):
+    with aplicacion.app.app_context():
+        aplicacion.calcular_y_guardar_ruta(usuario, "Plaza A", "Plaza B", 10, 60)
+        assert len(proveedores) == 1
+
+        route, coordinates, _ = aplicacion.calcular_y_guardar_ruta(usuario, "Plaza A bis", "Plaza B", 5, 60)
+        assert len(proveedores) == 1
+        # La distancia sale de la geometría reutilizada, no de la ruta original
+        assert route.distancia_total == pytest.approx(aplicacion.distancias_tramos(coordinates).sum())
+        # La aproximación no queda como resultado exacto para las coordenadas pedidas
+        assert aplicacion.cache_rutas.obtener([-70.601, -33.4005], [-70.40, -33.30]) is None
+
+        aplicacion.calcular_y_guardar_ruta(usuario, "Plaza A bis", "Plaza B", 5, 60, reutilizar=False)
+        assert len(proveedores) == 2
+
+
+def test_reutilizaciones_encadenadas_no_se_alejan_del_origen(aplicacion, usuario, proveedores, monkeypatch):
+    # Orígenes a ~250 m uno del siguiente: cada uno cae dentro de la tolerancia del anterior
+    origenes = {f"Origen {i}": [-71.0 + i * 0.0027, -34.0] for i in range(6)}
+    lugares = dict(origenes, Destino=[-70.8, -33.9])
+    monkeypatch.setattr(aplicacion.geocodificador, "geocodificar", lambda texto: lugares[texto])
+    tolerancia_km = aplicacion.ROUTE_REUSE_TOLERANCE_M / 1000
+
+    with aplicacion.app.app_context():
+        for nombre, origen in origenes.items():
+            _, coordinates, _ = aplicacion.calcular_y_guardar_ruta(usuario, nombre, "Destino", 10, 60)
+            assert distancia_km(coordinates[0], origen) <= tolerancia_km
+    # Cada ruta nueva reutiliza a lo sumo una ruta calculada, no otra reutilizada
+    assert len(proveedores) == 3
@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+import time
+
+from trabajos import ERROR_ABANDONADO, ColaTrabajos
+
+
+def envejecer(ruta_db, trabajo_id, segundos):
+    with sqlite3.connect(ruta_db) as conn:
+        conn.execute("UPDATE trabajos SET actualizado = actualizado - ? WHERE id = ?", (segundos, trabajo_id))
+
+
+def test_trabajo_sin_avances_se_marca_como_fallido(tmp_path):
+    ruta_db = str(tmp_path / "trabajos.db")
+    cola = ColaTrabajos(ruta_db, tiempo_maximo=60)
+    iniciado, liberar = threading.Event(), threading.Event()
+
+    def trabajo(reportar):
+        iniciado.set()
+        liberar.wait(5)
+
+    trabajo_id, nuevo = cola.encolar("ruta:a", 1, trabajo)
+    assert nuevo and iniciado.wait(5)
+    try:
+        envejecer(ruta_db, trabajo_id, 120)
+
+        trabajo = cola.obtener(trabajo_id)
+        assert trabajo["estado"] == "error" and trabajo["error"] == ERROR_ABANDONADO
+        # Un trabajo abandonado ya no agrupa las solicitudes con la misma clave
+        otro_id, nuevo = cola.encolar("ruta:a", 1, lambda reportar: None)
+        assert nuevo and otro_id != trabajo_id
+    finally:
+        liberar.set()
+        cola.executor.shutdown(wait=True)
+
+
+def test_al_iniciar_se_marcan_los_trabajos_abandonados(tmp_path):
+    ruta_db = str(tmp_path / "trabajos.db")
+    cola = ColaTrabajos(ruta_db, tiempo_maximo=60)
+    cola.executor.shutdown()  # Simula un worker que se detuvo antes de ejecutar sus trabajos
+    with sqlite3.connect(ruta_db) as conn:
+        conn.execute(
+            "INSERT INTO trabajos (id, clave, usuario_id, estado, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?)",
+            ("viejo", "ruta:b", 1, "pendiente", time.time() - 120, time.time() - 120),
+        )
+
+    ColaTrabajos(ruta_db, tiempo_maximo=60)
+
+    with sqlite3.connect(ruta_db) as conn:
+        assert conn.execute("SELECT estado, error FROM trabajos WHERE id = 'viejo'").fetchone() == (
+            "error", ERROR_ABANDONADO
+        )
@@ -0,0 +1,133 @@
+"""Cola de trabajos en segundo plano para el cálculo de rutas.
+
+Los trabajos se ejecutan en un pool de hilos local, pero su estado se guarda en SQLite
+para que cualquier proceso worker pueda responder a la consulta de estado. Las
+solicitudes duplicadas en curso (misma clave) se agrupan en un único trabajo. Un
+trabajo en curso sin avances por más de `tiempo_maximo` (p. ej. porque su worker se
+reinició) se marca como fallido.
+"""
+import json
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+EN_CURSO = ("pendiente", "ejecutando")
+_EN_CURSO_SQL = f"estado IN ({', '.join('?' * len(EN_CURSO))})"
+ERROR_ABANDONADO = "El trabajo dejó de informar avances; su proceso pudo haberse detenido."
+
+
+class ColaTrabajos:
+    """Encola funciones en un pool de hilos y registra su progreso en una tabla SQLite.
+
+    La función encolada recibe como primer argumento un callback `reportar(mensaje)` para
+    informar su progreso y debe devolver un resultado serializable a JSON.
+    """
+
+    def __init__(self, ruta_db, max_workers=2, retencion=24 * 3600, tiempo_maximo=600, envoltorio=None):
+        self.ruta = ruta_db
+        self.retencion = retencion
+        self.tiempo_maximo = tiempo_maximo  # Un trabajo sin avances por más tiempo se da por fallido
+        self.envoltorio = envoltorio
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trabajos")
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS trabajos ("
+                "id TEXT PRIMARY KEY, clave TEXT NOT NULL, usuario_id INTEGER, estado TEXT NOT NULL, "
+                "progreso TEXT, resultado TEXT, error TEXT, creado REAL NOT NULL, actualizado REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_trabajos_clave_estado ON trabajos (clave, estado)")
+            self._marcar_abandonados(conn, time.time())
+
+    @contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _marcar_abandonados(self, conn, ahora, trabajo_id=None):
+        """Marca como fallidos los trabajos en curso sin avances desde hace `tiempo_maximo` (o solo `trabajo_id`)."""
+        consulta = (
+            "UPDATE trabajos SET estado = 'error', progreso = 'Error', error = ?, actualizado = ? "
+            f"WHERE {_EN_CURSO_SQL} AND actualizado < ?"
+        )
+        parametros = [ERROR_ABANDONADO, ahora, *EN_CURSO, ahora - self.tiempo_maximo]
+        if trabajo_id is not None:
+            consulta += " AND id = ?"
+            parametros.append(trabajo_id)
+        conn.execute(consulta, parametros)
+
+    def encolar(self, clave, usuario_id, funcion, *args):
+        """Encola `funcion(reportar, *args)` y devuelve (id, nuevo).
+
+        Si ya hay un trabajo en curso con la misma clave se devuelve su id y `nuevo` es False.
+        """
+        ahora = time.time()
+        with self._conectar() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._marcar_abandonados(conn, ahora)
+                fila = conn.execute(
+                    f"SELECT id FROM trabajos WHERE clave = ? AND {_EN_CURSO_SQL}", (clave, *EN_CURSO)
+                ).fetchone()
+                if fila:
+                    conn.execute("COMMIT")
+                    return fila[0], False
+
+                trabajo_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO trabajos (id, clave, usuario_id, estado, progreso, creado, actualizado) "
+                    "VALUES (?, ?, ?, 'pendiente', 'En cola', ?, ?)",
+                    (trabajo_id, clave, usuario_id, ahora, ahora),
+                )
+                conn.execute("DELETE FROM trabajos WHERE actualizado < ?", (ahora - self.retencion,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        self.executor.submit(self._ejecutar, trabajo_id, funcion, args)
+        return trabajo_id, True
+
+    def _actualizar(self, trabajo_id, **campos):
+        campos["actualizado"] = time.time()
+        asignaciones = ", ".join(f"{campo} = ?" for campo in campos)
+        with self._conectar() as conn:
+            conn.execute(
+                f"UPDATE trabajos SET {asignaciones} WHERE id = ?", (*campos.values(), trabajo_id)
+            )
+
+    def _ejecutar(self, trabajo_id, funcion, args):
+        def reportar(mensaje):
+            self._actualizar(trabajo_id, progreso=mensaje)
+
+        self._actualizar(trabajo_id, estado="ejecutando", progreso="Iniciando")
+        try:
+            if self.envoltorio:
+                with self.envoltorio():
+                    resultado = funcion(reportar, *args)
+            else:
+                resultado = funcion(reportar, *args)
+        except Exception as e:
+            self._actualizar(trabajo_id, estado="error", progreso="Error", error=str(e))
+            return
+        self._actualizar(trabajo_id, estado="completado", progreso="Completado", resultado=json.dumps(resultado))
+
+    def obtener(self, trabajo_id):
+        """Devuelve el estado de un trabajo como diccionario, o None si no existe."""
+        ahora = time.time()
+        with self._conectar() as conn:
+            conn.row_factory = sqlite3.Row
+            fila = conn.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+            if fila is not None and fila["estado"] in EN_CURSO and fila["actualizado"] < ahora - self.tiempo_maximo:
+                self._marcar_abandonados(conn, ahora, trabajo_id)
+                fila = conn.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+        if fila is None:
+            return None
+        trabajo = dict(fila)
+        trabajo["resultado"] = json.loads(trabajo["resultado"]) if trabajo["resultado"] else None
+        return trabajo
@@ -0,0 +1,4 @@
+"""Punto de entrada WSGI para servidores de producción (ver gunicorn.conf.py)."""
+from app import create_app
+
+app = create_app()